@@ -37,7 +37,9 @@ cache = Cache()
 db = SQLAlchemy()
 
 celery = get_celery(__name__, 
-                    job_modules=['app.jobs', 'app.network.jobs', 'app.purchase.jobs'])
+                    job_modules=['app.jobs', 'app.network.jobs', 'app.purchase.jobs',
+                                 'app.shipping.methods.ems.jobs',
+                                 'app.shipping.methods.fedex.jobs'])
 migrate = Migrate()
 security = Security()
 signals = Namespace()
@@ -75,13 +77,13 @@ def create_app(config=None):
     @app.context_processor
     def inject_nav_currencies():
         from flask_security import current_user
-        from app.currencies.models import Currency
+        from app.currencies import reference
         try:
             if not current_user.is_authenticated:
                 return {}
-            currencies = Currency.query.filter_by(enabled=True).all()
-            base_currency =Currency.get_base_currency(app.config.get('TENANT_NAME', 'default'))
-            user_currency = db.session.get(Currency, current_user.currency_code) \
+            currencies = reference.get_enabled_currencies()
+            base_currency = reference.get_base_currency()
+            user_currency = reference.get_currency(current_user.currency_code) \
                 if current_user.currency_code else \
                 base_currency
             return {
@@ -8,7 +8,7 @@ bp_client_admin = Blueprint('currencies_client_admin', __name__, url_prefix='/ad
                             template_folder='templates')
 
 def register_blueprints(flask_app):
-    from . import routes    
+    from . import rates, reference, routes
     flask_app.register_blueprint(bp_api_admin)
     flask_app.register_blueprint(bp_api_user)
     flask_app.register_blueprint(bp_client_admin)
@@ -1,10 +1,11 @@
 ''' Currency '''
 from datetime import datetime
+from typing import Optional
 
-from sqlalchemy import Boolean, Column, Integer, Numeric, String, select
+from sqlalchemy import Boolean, Column, Integer, Numeric, String
 from sqlalchemy.orm import relationship
 
-from app import cache, db
+from app import db
 from .currency_history_entry import CurrencyHistoryEntry
 
 class Currency(db.Model): #type: ignore
@@ -23,11 +24,10 @@ class Currency(db.Model): #type: ignore
 
     @classmethod
     def get_base_currency(cls, tenant) -> 'Currency':
-        ''' Get base currency '''
-        # if cache.get(f'{tenant}-base_currency') is None:
-        return Currency.query.filter_by(base=True).first()
-            # cache.set(f'{tenant}-base_currency', base_currency, timeout=3600)
-        # return cache.get(f'{tenant}-base_currency')
+        ''' Get base currency. The currency is taken from the process-local
+        cache of currencies of the current tenant'''
+        from app.currencies import reference
+        return reference.attach(reference.get_base_currency())
 
     def __repr__(self):
         return "<Currency: {}>".format(self.code)
@@ -40,16 +40,15 @@ class Currency(db.Model): #type: ignore
             round(amount, self.decimal_places),
             self.suffix if self.suffix else "").replace(',', ' ')
 
-    def get_rate(self, date=datetime.now()) -> float:
-        from app.currencies.models.currency_history_entry import CurrencyHistoryEntry
-        latest_rate = db.session.execute(
-            select(CurrencyHistoryEntry)
-            .where(CurrencyHistoryEntry.code == self.code,
-                   CurrencyHistoryEntry.when_created <= date)
-            .order_by(CurrencyHistoryEntry.when_created.desc())
-        ).scalars().first()
+    def get_rate(self, date: Optional[datetime]=None) -> float:
+        '''Returns the rate, which was actual at the moment. The current rate
+        is returned if there is no rate history by the moment
+
+        :param datetime date: moment to get the rate for. Now if not set'''
+        from app.currencies import rates
+        latest_rate = rates.get_rate(self.code, date or datetime.now())
         if latest_rate is not None:
-            return float(latest_rate.rate)
+            return latest_rate
         return float(self.rate)
         
     def to_dict(self):
@@ -0,0 +1,48 @@
+'''
+Index of historical currency rates.
+Rate history is loaded into arrays of dates and rates sorted by date for each
+currency, so a rate for any date is found by binary search without querying
+the database. The index is kept in the process-local cache
+'''
+from __future__ import annotations
+from bisect import bisect_right
+from datetime import date, datetime, time
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+
+from app import db, local_cache
+
+from .models.currency_history_entry import CurrencyHistoryEntry
+
+class _RateHistory(NamedTuple):
+    dates: list[datetime]
+    rates: list[float]
+
+def get_rate(currency_code: str, when: datetime | date) -> Optional[float]:
+    '''Returns the rate of the currency, which was actual at the moment
+
+    :param str currency_code: code of the currency
+    :param datetime when: moment to get the rate for
+    :returns Optional[float]: the rate or `None` if there was no rate at the moment'''
+    if not isinstance(when, datetime):
+        when = datetime.combine(when, time.min)
+    history = local_cache.get('currency_rates').get(currency_code)
+    if history is None:
+        return None
+    position = bisect_right(history.dates, when)
+    return history.rates[position - 1] if position > 0 else None
+
+def _load_index() -> dict[str, _RateHistory]:
+    history: dict[str, _RateHistory] = {}
+    for code, when_created, rate in db.session.execute(
+            select(CurrencyHistoryEntry.code, CurrencyHistoryEntry.when_created,
+                   CurrencyHistoryEntry.rate)
+            .where(CurrencyHistoryEntry.when_created.is_not(None))
+            .order_by(CurrencyHistoryEntry.when_created, CurrencyHistoryEntry.id)):
+        entries = history.setdefault(code, _RateHistory([], []))
+        entries.dates.append(when_created)
+        entries.rates.append(float(rate))
+    return history
+
+local_cache.register('currency_rates', _load_index, CurrencyHistoryEntry)
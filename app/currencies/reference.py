@@ -0,0 +1,66 @@
+'''
+Reference data of currencies.
+Currencies are read into detached copies, so the base currency and the list
+of enabled ones are served without querying the database. The copies are
+kept in the process-local cache
+'''
+from __future__ import annotations
+from typing import NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import make_transient_to_detached
+
+from app import db, local_cache
+
+from .models.currency import Currency
+
+class _Currencies(NamedTuple):
+    by_code: dict[str, Currency]
+    base: Optional[Currency]
+
+def get_currency(code: str) -> Optional[Currency]:
+    '''Returns the currency, which is detached from any session.
+    Use `attach()` to get an instance to work with in the session
+
+    :param str code: code of the currency
+    :returns Optional[Currency]: the currency or `None` if there is no such currency'''
+    return _get_currencies().by_code.get(code)
+
+def get_base_currency() -> Optional[Currency]:
+    '''Returns the base currency, which is detached from any session'''
+    return _get_currencies().base
+
+def get_enabled_currencies() -> list[Currency]:
+    '''Returns enabled currencies, which are detached from any session'''
+    return [currency for currency in _get_currencies().by_code.values()
+            if currency.enabled]
+
+def attach(currency: Optional[Currency]) -> Optional[Currency]:
+    '''Returns the instance of the cached currency in the current session
+    without querying the database'''
+    if currency is None:
+        return None
+    return db.session.merge(currency, load=False)
+
+def invalidate() -> None:
+    '''Makes the currencies of the current tenant reload on the next use'''
+    local_cache.invalidate('currencies')
+
+def _copy(currency: Currency) -> Currency:
+    copy = Currency(**{column.key: getattr(currency, column.key)
+                       for column in Currency.__table__.columns})
+    make_transient_to_detached(copy)
+    return copy
+
+def _get_currencies() -> _Currencies:
+    return local_cache.get('currencies')
+
+def _load_currencies() -> _Currencies:
+    by_code = {
+        currency.code: _copy(currency)
+        for currency in db.session.execute(
+            select(Currency).order_by(Currency.code)).scalars()}
+    base = next((currency for currency in by_code.values() if currency.base), None)
+    return _Currencies(by_code, base)
+
+local_cache.register('currencies', _load_currencies, Currency)
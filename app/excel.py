@@ -0,0 +1,154 @@
+'''
+Streaming generation of Excel files from templates.
+A template is read once per process into header rows, column widths and cell
+styles. Files are written by write-only workbooks, which don't keep rows
+in memory, so memory consumption doesn't depend on the size of the file
+'''
+from __future__ import annotations
+from copy import copy
+from functools import lru_cache
+from tempfile import TemporaryFile
+from typing import IO, Any, NamedTuple, Optional
+
+import openpyxl
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet._write_only import WriteOnlyWorksheet
+
+class CellStyle(NamedTuple):
+    '''Style of a cell. Attributes, which are `None`, are left default'''
+    font: Any = None
+    fill: Any = None
+    border: Any = None
+    alignment: Any = None
+    number_format: Optional[str] = None
+    protection: Any = None
+
+    @classmethod
+    def of(cls, cell) -> CellStyle:
+        '''Returns style of the cell'''
+        return cls(copy(cell.font), copy(cell.fill), copy(cell.border),
+                   copy(cell.alignment), cell.number_format, copy(cell.protection))
+
+    def merge(self, other: CellStyle) -> CellStyle:
+        '''Returns the style with attributes, which are set in the other one,
+        replaced by them'''
+        return self._replace(**{name: value for name, value in other._asdict().items()
+                                if value is not None})
+
+    def apply(self, cell) -> None:
+        '''Sets the style to the cell'''
+        for name, value in self._asdict().items():
+            if value is not None:
+                setattr(cell, name, value)
+
+class ExcelTemplate:
+    '''First rows of the template's sheet with their values and styles,
+    column widths and merged cells'''
+
+    def __init__(self, path: str, sheet_name: Optional[str]=None, rows: int=1):
+        workbook = openpyxl.load_workbook(path)
+        sheet = workbook[sheet_name] if sheet_name else workbook.worksheets[0]
+        self.title = sheet.title
+        self.column_widths = {letter: dim.width for letter, dim
+                              in sheet.column_dimensions.items() if dim.width}
+        self.row_heights = {row: dim.height for row, dim
+                            in sheet.row_dimensions.items() if row <= rows and dim.height}
+        self.merged_cells = [str(cells) for cells in sheet.merged_cells.ranges
+                             if cells.max_row <= rows]
+        self.rows: list[list[tuple[Any, Optional[CellStyle]]]] = []
+        for row in sheet.iter_rows(min_row=1, max_row=rows):
+            cells = [(cell.value, CellStyle.of(cell) if cell.has_style else None)
+                     for cell in row]
+            while len(cells) > 0 and cells[-1] == (None, None):
+                cells.pop()
+            self.rows.append(cells)
+
+    def get_style(self, row: int, column: int) -> Optional[CellStyle]:
+        '''Returns style of the template's cell
+
+        :param int row: 1-based row number, up to the number of template rows
+        :param int column: 1-based column number'''
+        cells = self.rows[row - 1]
+        return cells[column - 1][1] if column <= len(cells) else None
+
+    def new_sheet(self, row_height: Optional[float]=None) -> tuple[Any, WriteOnlyWorksheet]:
+        '''Creates a write-only workbook with a sheet formatted as the template's one
+
+        :param float row_height: default height of the rows
+        :returns tuple[Workbook, WriteOnlyWorksheet]: workbook and its sheet'''
+        workbook = openpyxl.Workbook(write_only=True)
+        sheet = workbook.create_sheet(self.title)
+        for letter, width in self.column_widths.items():
+            sheet.column_dimensions[letter].width = width
+        for row, height in self.row_heights.items():
+            sheet.row_dimensions[row].height = height
+        if row_height is not None:
+            sheet.sheet_format.defaultRowHeight = row_height
+            sheet.sheet_format.customHeight = True
+        for cells in self.merged_cells:
+            sheet.merged_cells.add(cells)
+        return workbook, sheet
+
+    def write_header(self, sheet: WriteOnlyWorksheet, values: dict[str, Any],
+                     rows: Optional[int]=None) -> None:
+        '''Writes template rows to the sheet
+
+        :param WriteOnlyWorksheet sheet: sheet created by `new_sheet()`
+        :param dict[str, Any] values: values of the cells by coordinate,
+            which replace template values
+        :param int rows: number of the template rows to write. All if not set'''
+        for row_idx, cells in enumerate(self.rows[:rows], start=1):
+            sheet.append([
+                get_cell(sheet, values.get(f'{get_column_letter(col_idx)}{row_idx}', value),
+                         style)
+                for col_idx, (value, style) in enumerate(cells, start=1)])
+
+    def append_row(self, sheet: WriteOnlyWorksheet, values: list,
+                   style: Optional[CellStyle]=None) -> None:
+        '''Appends the row after the template rows. Cells are styled as ones
+        of the last template row
+
+        :param WriteOnlyWorksheet sheet: sheet created by `new_sheet()`
+        :param list values: values of the cells
+        :param CellStyle style: style, which set attributes replace the template ones'''
+        values = values + [None] * (len(self.rows[-1]) - len(values))
+        styles = [self.get_style(len(self.rows), column)
+                  for column in range(1, len(values) + 1)]
+        if style is not None:
+            styles = [(cell_style or CellStyle()).merge(style) for cell_style in styles]
+        sheet.append([get_cell(sheet, value, cell_style)
+                      for value, cell_style in zip(values, styles)])
+
+def get_cell(sheet: WriteOnlyWorksheet, value: Any,
+             style: Optional[CellStyle]=None) -> Any:
+    '''Returns a cell of the write-only sheet
+
+    :param WriteOnlyWorksheet sheet: sheet to create cell for
+    :param Any value: value of the cell
+    :param CellStyle style: style of the cell
+    :returns: styled cell or just the value if there is no style'''
+    if style is None:
+        return value
+    cell = WriteOnlyCell(sheet, value)
+    style.apply(cell)
+    return cell
+
+def save(workbook) -> IO[bytes]:
+    '''Saves the workbook to a temporary file
+
+    :returns IO[bytes]: the file positioned at the beginning'''
+    file = TemporaryFile()
+    workbook.save(file)
+    file.seek(0)
+    return file
+
+@lru_cache(maxsize=None)
+def get_template(path: str, sheet_name: Optional[str]=None, rows: int=1) -> ExcelTemplate:
+    '''Returns the template read once per process
+
+    :param str path: path of the template file
+    :param str sheet_name: name of the sheet. The first one is used if not set
+    :param int rows: number of the template rows to keep
+    :returns ExcelTemplate: the template'''
+    return ExcelTemplate(path, sheet_name, rows)
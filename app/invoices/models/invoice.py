@@ -4,11 +4,13 @@ Invoice model
 from datetime import datetime
 import logging
 
-from sqlalchemy import Column, DateTime, Integer, String, ForeignKey
+from more_itertools import chunked
+from sqlalchemy import Column, DateTime, Integer, String, ForeignKey, func, or_, select
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 from app import db
+from app.models.sequence import Sequence
 from app.shipping.models.shipping import Shipping
 from app.users.models.user import User
 
@@ -77,11 +79,11 @@ class Invoice(db.Model):  # type: ignore
     def __init__(self, **kwargs):
         today = datetime.now()
         today_prefix = self.__id_pattern.format(year=today.year, month=today.month)
-        last_invoice = db.session.query(Invoice.seq_num). \
-            filter(Invoice.id.like(today_prefix + '%')). \
-            order_by(Invoice.id.desc()). \
-            first()
-        self.seq_num = last_invoice[0] + 1 if last_invoice else 1
+        def get_last_seq_num():
+            return db.session.query(func.max(Invoice.seq_num)). \
+                filter(Invoice.id.like(today_prefix + '%')). \
+                scalar() or 0
+        self.seq_num = Sequence.allocate(today_prefix, get_initial_value=get_last_seq_num)[0]
         self.id = today_prefix + '{:04d}'.format(self.seq_num)
 
         attributes = [a[0] for a in type(self).__dict__.items() if isinstance(a[1], InstrumentedAttribute)]
@@ -108,6 +110,35 @@ class Invoice(db.Model):  # type: ignore
                 if column.key == 'orders' \
             else base_filter.filter(column.like(f'%{filter_value}%'))
 
+    def __get_customer(self):
+        return self.orders[0].customer_name if self.orders else None
+
+    def __get_payee(self):
+        return self.orders[0].get_payee() if self.orders else None
+
+    @classmethod
+    def backfill_missing_parties(cls) -> int:
+        '''Stores customer and payee of invoices, which don't have them stored yet.
+        Invoices are processed in batches, each batch is committed separately
+
+        :returns int: number of updated invoices'''
+        from app.orders.models.order import LIST_BATCH_SIZE
+        invoice_ids = db.session.execute(
+            select(Invoice.id)
+            .where(or_(Invoice.customer == None, Invoice.payee == None))
+            .order_by(Invoice.id)
+        ).scalars().all()
+        fixed = 0
+        for batch in chunked(invoice_ids, LIST_BATCH_SIZE):
+            for invoice in Invoice.query.filter(Invoice.id.in_(batch)):
+                customer, payee = invoice.__get_customer(), invoice.__get_payee()
+                if (not invoice.customer and customer) or (not invoice.payee and payee):
+                    invoice.customer = invoice.customer or customer
+                    invoice.payee = invoice.payee or payee
+                    fixed += 1
+            db.session.commit()
+        return fixed
+
     def to_dict(self, details=False):
         '''
         Returns dictionary of the invoice ready to be jsonified
@@ -127,21 +158,10 @@ class Invoice(db.Model):  # type: ignore
             else:
                 invoice_items_dict[invoice_item.product_id] = invoice_item.to_dict()
         # print(f"{self.id}: orders {','.join(map(lambda o: str(o.id), self.orders))}")
-        is_dirty = False
-        if not self.customer and self.orders:
-            self.customer = self.orders[0].customer_name
-            is_dirty = True
-        if not self.payee and self.orders:
-            self.payee = self.orders[0].get_payee()
-            if self.payee:
-                is_dirty = True
-        if is_dirty:
-            db.session.commit()
-        
         result = {
             'id': self.id,
-            'customer': self.customer,
-            'payee': self.payee,
+            'customer': self.customer or self.__get_customer(),
+            'payee': self.payee or self.__get_payee(),
             'address': self.orders[0].address if self.orders else None,
             'country': self.orders[0].country.name if self.orders else None,
             'phone': self.orders[0].phone if self.orders else None,
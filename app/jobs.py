@@ -13,6 +13,8 @@ from product_importer import get_atomy_products
 def setup_periodic_tasks(sender, **kwargs):
     sender.add_periodic_task(28800, import_products,
         name="Import products from Atomy every 8 hours")
+    sender.add_periodic_task(3600, backfill_totals,
+        name="Store missing totals of orders, payments and invoices every hour")
 
 @celery.task
 def import_products():
@@ -21,7 +23,6 @@ def import_products():
     
     logger = get_task_logger('import_products')
     logger.info("Starting products import")
-    products = Product.query.all()
     same = new = modified = ignored = 0
     vendor_products = get_atomy_products(
         current_app.config.get('PRODUCT_IMPORT_URL', URL_BASE), logger=logger)
@@ -33,10 +34,14 @@ def import_products():
     if len(vendor_products) == 0: # Something went wrong
         logger.warning("Something went wrong. Didn't get any products from vendor. Exiting...")
         return
+    products = Product.get_products_by_ids(
+        atomy_product['id'] for atomy_product in vendor_products)
+    # IDs of local products, which match vendor's ones
+    matched: set[str] = set()
     for atomy_product in tqdm(vendor_products):
         try:
-            product = next(p for p in products
-                           if p.id.lstrip('0') == atomy_product['id'].lstrip('0'))
+            product = next(p for p in products[Product.normalize_id(atomy_product['id'])]
+                           if p.id not in matched)
             if product.synchronize:
                 logger.debug('Synchronizing product %s', atomy_product['id'])
                 is_dirty = False
@@ -82,7 +87,7 @@ def import_products():
                 logger.debug('\t%s: IGNORED', product.id)
                 ignored += 1
 
-            products.remove(product)
+            matched.add(product.id)
         except StopIteration:
             logger.debug('%s: No local product found. ADDING', atomy_product['id'])
             path_image, image_name = save_image(atomy_product['image_url'])
@@ -100,10 +105,12 @@ def import_products():
                     file_name=image_name)
             )
             new += 1
+            matched.add(product.id)
             try:
                 db.session.add(product) #type: ignore
             except:
                 logger.exception("error")
+    products = [product for product in Product.query if product.id not in matched]
     logger.debug('%d local products left without matching vendor\'s ones. Will be disabled',
         len(products))
     for product in products:
@@ -120,6 +127,24 @@ def import_products():
     db.session.commit() #type: ignore
 
 
+@celery.task
+def backfill_totals():
+    '''Stores totals of orders, payments and invoices, which weren't stored yet.
+    Returns number of fixed rows of each kind'''
+    from app.invoices.models.invoice import Invoice
+    from app.orders.totals import backfill_missing_totals
+    from app.payments.models.payment import Payment
+
+    logger = get_task_logger('backfill_totals')
+    result = {
+        'orders': backfill_missing_totals(),
+        'payments': Payment.backfill_missing_amounts(),
+        'invoices': Invoice.backfill_missing_parties()
+    }
+    logger.info("Totals backfill result: orders: %d, payments: %d, invoices: %d",
+                result['orders'], result['payments'], result['invoices'])
+    return result
+
 def save_image(image_url):
     if image_url != '':
         from app.tools import get_products_path
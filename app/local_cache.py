@@ -0,0 +1,100 @@
+'''
+Process-local cache of data derived from the database.
+Each cached value is loaded once per tenant by its registered loader and served
+from memory. A value is reloaded when records of its models are changed by this
+process or, after `LOCAL_CACHE_CHECK_INTERVALS[<name>]` or
+`LOCAL_CACHE_CHECK_INTERVAL` seconds (60 by default), by another one
+'''
+from __future__ import annotations
+from threading import Lock
+from time import monotonic
+from typing import Any, Callable, NamedTuple, Optional
+
+from flask import current_app
+from sqlalchemy import event
+
+from app import db
+from app.tools import get_change_tag, watch_changes
+
+class _Entry(NamedTuple):
+    loader: Callable[[], Any]
+    models: tuple
+
+class _Loaded(NamedTuple):
+    tag: str
+    value: Any
+    # Time the value was checked for being up to date by `monotonic()`
+    checked_at: float
+
+_entries: dict[str, _Entry] = {}
+# Loaded values by tenant and name
+_loaded: dict[tuple[Optional[str], str], _Loaded] = {}
+_lock = Lock()
+# Key of the session info, which holds names of values changed in the transaction
+_VALUES_CHANGED = 'local_cache_changed'
+
+def register(name: str, loader: Callable[[], Any], *models) -> None:
+    '''Registers a value to be cached
+
+    :param str name: name of the value
+    :param loader: function, which loads the value from the database
+    :param models: model classes the value is made of'''
+    _entries[name] = _Entry(loader, models)
+    watch_changes(*models)
+
+def get(name: str) -> Any:
+    '''Returns the value of the current tenant. The value is checked
+    for being up to date once per check interval
+
+    :param str name: name of the registered value
+    :returns Any: the value'''
+    entry = _entries[name]
+    key = (current_app.config.get('TENANT_NAME'), name)
+    loaded = _loaded.get(key)
+    if loaded is not None and monotonic() - loaded.checked_at < get_check_interval(name):
+        return loaded.value
+    tag = get_change_tag(*entry.models)
+    value = entry.loader() if loaded is None or loaded.tag != tag else loaded.value
+    with _lock:
+        _loaded[key] = _Loaded(tag, value, monotonic())
+    return value
+
+def get_check_interval(name: str) -> int:
+    '''Returns seconds the value is served without checking for changes
+    made by other processes'''
+    intervals = current_app.config.get('LOCAL_CACHE_CHECK_INTERVALS') or {}
+    return intervals.get(name, current_app.config.get('LOCAL_CACHE_CHECK_INTERVAL', 60))
+
+def invalidate(name: str) -> None:
+    '''Makes the value of the current tenant reload on the next use'''
+    with _lock:
+        _loaded.pop((current_app.config.get('TENANT_NAME'), name), None)
+
+def clear() -> None:
+    '''Makes all values of all tenants reload on the next use'''
+    with _lock:
+        _loaded.clear()
+
+@event.listens_for(db.session, 'after_flush')
+def _on_after_flush(session, _flush_context):
+    for instance in (*session.new, *session.dirty, *session.deleted):
+        for name, entry in _entries.items():
+            if isinstance(instance, entry.models):
+                session.info.setdefault(_VALUES_CHANGED, set()).add(name)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _on_orm_execute(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+       and orm_execute_state.bind_mapper is not None:
+        for name, entry in _entries.items():
+            if issubclass(orm_execute_state.bind_mapper.class_, entry.models):
+                orm_execute_state.session.info.setdefault(_VALUES_CHANGED, set()).add(name)
+
+@event.listens_for(db.session, 'after_commit')
+def _on_after_commit(session):
+    for name in session.info.pop(_VALUES_CHANGED, set()):
+        invalidate(name)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _on_after_soft_rollback(session, _previous_transaction):
+    session.info.pop(_VALUES_CHANGED, None)
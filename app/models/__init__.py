@@ -4,3 +4,4 @@ Each model is in its own file
 '''
 from app.models.base import BaseModel
 from app.models.country import Country
+from app.models.sequence import Sequence
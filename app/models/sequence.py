@@ -0,0 +1,78 @@
+'''
+Named counters for generating sequential IDs
+'''
+from threading import Lock
+from typing import Callable
+
+from flask import current_app
+from sqlalchemy import Column, Integer, String, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from app import db
+
+# Numbers reserved by the process, which weren't handed out yet
+_reserved: dict[tuple, range] = {}
+_reserved_lock = Lock()
+
+class Sequence(db.Model): # type: ignore
+    '''Last allocated number of the named sequence'''
+    __tablename__ = 'sequences'
+
+    name = Column(String(32), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+    @classmethod
+    def allocate(cls, name: str, count: int=1,
+                 get_initial_value: Callable[[], int]=lambda: 0,
+                 reserve: bool=True) -> range:
+        '''Allocates consecutive numbers of the sequence.
+        Numbers are allocated by atomic increment of the counter in its own
+        transaction so the counter isn't locked till the end of the caller's one.
+        Numbers aren't returned back if the caller's transaction is rolled back.
+        If `SEQUENCE_BLOCK_SIZE` is greater than 1 the process reserves that
+        many numbers at once and hands them out without accessing the database
+
+        :param str name: name of the sequence
+        :param int count: amount of numbers to allocate
+        :param Callable get_initial_value: returns last number used before
+            the counter was created. Is called once per sequence
+        :param bool reserve: whether numbers may be reserved. Sequences,
+            which are rarely used, e.g. ones of a single order, shouldn't be
+        :returns range: allocated numbers'''
+        key = (current_app.config.get('TENANT_NAME'), name)
+        block_size = max(count, int(current_app.config.get('SEQUENCE_BLOCK_SIZE', 1))) \
+            if reserve else count
+        with _reserved_lock:
+            reserved = _reserved.pop(key, range(0))
+            if len(reserved) < count:
+                last_value = cls.__increment(name, block_size, get_initial_value)
+                reserved = range(last_value - block_size + 1, last_value + 1)
+            if len(reserved) > count:
+                _reserved[key] = reserved[count:]
+            return reserved[:count]
+
+    @classmethod
+    def __increment(cls, name: str, count: int,
+                    get_initial_value: Callable[[], int]) -> int:
+        '''Increments the counter and returns its new value'''
+        # SQLite locks the whole database on write so there is nothing
+        # to gain from a separate transaction
+        if db.engine.dialect.name == 'sqlite':
+            return cls.__increment_in(db.session.connection(), name, count, get_initial_value)
+        with db.engine.begin() as connection:
+            return cls.__increment_in(connection, name, count, get_initial_value)
+
+    @classmethod
+    def __increment_in(cls, connection, name: str, count: int,
+                       get_initial_value: Callable[[], int]) -> int:
+        increment = update(Sequence).where(Sequence.name == name) \
+            .values(value=Sequence.value + count)
+        if connection.execute(increment).rowcount == 0:
+            try:
+                with connection.begin_nested():
+                    connection.execute(insert(Sequence).values(
+                        name=name, value=get_initial_value() + count))
+            except IntegrityError: # The counter was created concurrently
+                connection.execute(increment)
+        return connection.execute(
+            select(Sequence.value).where(Sequence.name == name)).scalar_one()
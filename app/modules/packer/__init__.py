@@ -3,8 +3,8 @@ from importlib import import_module
 import os, os.path
 from flask import Blueprint, Flask
 
-from app.orders.signals import sale_order_model_preparing
-from app.modules.packer.signal_handlers import on_sale_order_model_preparing
+from app.orders.signals import sale_order_list_model_preparing
+from app.modules.packer.signal_handlers import on_sale_order_list_model_preparing
 
 # from .signal_handlers import
 
@@ -36,7 +36,7 @@ def init(app: Flask):
 
 
 def _register_signals():
-    sale_order_model_preparing.connect(on_sale_order_model_preparing)
+    sale_order_list_model_preparing.connect(on_sale_order_list_model_preparing)
 
 
 def _import_models():
@@ -20,6 +20,9 @@ class OrderPacker(db.Model, BaseModel):
             'packer': self.packer
         }
 
-    def get_order_packer_for_sale_order(sender, details=False):
-        order_packer = db.session.get(OrderPacker, sender.id)
-        return order_packer.to_dict() if order_packer is not None else {}
+    @staticmethod
+    def get_order_packers_for_sale_orders(orders) -> dict[str, dict]:
+        '''Returns packers of the sale orders by order ID'''
+        return {order_packer.order_id: order_packer.to_dict()
+                for order_packer in OrderPacker.query.filter(
+                    OrderPacker.order_id.in_([order.id for order in orders]))}
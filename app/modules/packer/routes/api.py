@@ -8,6 +8,7 @@ from sqlalchemy import not_
 from app import db
 from app.modules.packer.models.order_packer import OrderPacker
 from app.modules.packer.models.packer import Packer
+from app.orders import list_view
 from app.orders.models.order import Order
 from app.tools import modify_object, prepare_datatables_query
 
@@ -62,6 +63,7 @@ def admin_save_order_packer(order_id):
             order_packer = OrderPacker(order_id=order_id, when_created=datetime.now())
             db.session.add(order_packer)
         modify_object(order_packer, payload, ["packer"])
+    list_view.mark_for_refresh(order_id)
     db.session.commit()
     return jsonify({"data": [order_packer.to_dict()]})
 
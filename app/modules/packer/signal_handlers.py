@@ -1,3 +1,3 @@
-def on_sale_order_model_preparing(sender, **_extra):
+def on_sale_order_list_model_preparing(sender, **_extra):
     from app.modules.packer.models import OrderPacker
-    return OrderPacker.get_order_packer_for_sale_order(sender, details=_extra['details'])
+    return OrderPacker.get_order_packers_for_sale_orders(sender)
@@ -4,7 +4,7 @@ import os, os.path
 from flask import Blueprint, Flask
 
 from .signal_handlers import on_admin_order_products_rendering, \
-    on_order_product_model_preparing, on_order_product_saving, \
+    on_order_product_list_model_preparing, on_order_product_saving, \
     on_purchase_order_delivered, on_sale_order_shipped, \
     on_create_purchase_order_rendering, on_purchase_order_model_preparing, \
     on_purchase_order_deleting, on_purchase_order_saving
@@ -44,11 +44,11 @@ def _register_routes(app):
 
 def _register_signals():
     from app.orders.signals import sale_order_shipped, \
-        admin_order_products_rendering, order_product_model_preparing, \
+        admin_order_products_rendering, order_product_list_model_preparing, \
         order_product_saving
     sale_order_shipped.connect(on_sale_order_shipped)
     admin_order_products_rendering.connect(on_admin_order_products_rendering)
-    order_product_model_preparing.connect(on_order_product_model_preparing)
+    order_product_list_model_preparing.connect(on_order_product_list_model_preparing)
     order_product_saving.connect(on_order_product_saving)
     from app.purchase.signals import purchase_order_delivered, \
         create_purchase_order_rendering, purchase_order_model_preparing, \
@@ -25,11 +25,15 @@ class OrderProductWarehouse(db.Model, BaseModel):
         }
 
     @classmethod
-    def get_warehouse_for_order_product(cls, order_product):
-        op_warehouse = cls.query.filter_by(order_product_id=order_product.id).first()
-        return \
-            op_warehouse.to_dict() if op_warehouse is not None \
+    def get_warehouses_for_order_products(cls, order_products) -> dict[int, dict]:
+        '''Returns warehouses of the order products by order product ID'''
+        op_warehouses = {
+            op_warehouse.order_product_id: op_warehouse
+            for op_warehouse in cls.query.filter(
+                cls.order_product_id.in_([op.id for op in order_products]))}
+        return {
+            op.id: op_warehouses[op.id].to_dict() if op.id in op_warehouses
             else {
                 'warehouse': None,
                 'warehouse_id': None
-            }
+            } for op in order_products}
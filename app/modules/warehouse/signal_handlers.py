@@ -36,9 +36,9 @@ def on_admin_order_products_rendering(_sender, **_extra):
         ]
     }
 
-def on_order_product_model_preparing(sender, **_extra):
+def on_order_product_list_model_preparing(sender, **_extra):
     from app.modules.warehouse.models.order_product_warehouse import OrderProductWarehouse
-    return OrderProductWarehouse.get_warehouse_for_order_product(sender)
+    return OrderProductWarehouse.get_warehouses_for_order_products(sender)
 
 def on_purchase_order_model_preparing(sender, **_extra):
     from app.modules.warehouse.models.purchase_order_warehouse import PurchaseOrderWarehouse
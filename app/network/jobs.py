@@ -1,7 +1,8 @@
 from celery.utils.log import get_task_logger
-from sqlalchemy import text
+from sqlalchemy import select, text
 from app import celery, db
 from app.settings.models.setting import Setting
+from app.tools import mark_changed
 
 @celery.task
 def copy_subtree(root_id=None):
@@ -42,7 +43,20 @@ def copy_subtree(root_id=None):
             ) SELECT * FROM cte
             '''), {'root_id': root_id})
     if result.rowcount:
+        mark_changed('Node')
+        _mark_outsiders_for_refresh()
         db.session.commit()
         logger.info("Copied %s rows", result.rowcount)
     else:
         logger.warning(result)
+
+def _mark_outsiders_for_refresh():
+    '''Marks list entries of orders, which subcustomers are looked up
+    in the network, for refresh'''
+    from app.orders import list_view
+    from app.orders.models.subcustomer import Subcustomer
+    from app.orders.models.suborder import Suborder
+    for order_id in db.session.execute(
+            select(Suborder.order_id).join(Subcustomer, Suborder.subcustomer)
+            .where(Subcustomer.in_network == None).distinct()).scalars():
+        list_view.mark_for_refresh(order_id)
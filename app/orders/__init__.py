@@ -8,8 +8,12 @@ bp_client_admin = Blueprint('orders_client_admin', __name__, url_prefix='/admin/
                             template_folder='templates')
 
 def register_blueprints(flask_app):
-    from . import routes
+    from . import routes, totals
+    from .list_view import rebuild_command
+    from .search import rebuild_command as rebuild_search_command
     flask_app.register_blueprint(bp_api_admin)
     flask_app.register_blueprint(bp_api_user)
     flask_app.register_blueprint(bp_client_admin)
     flask_app.register_blueprint(bp_client_user)
+    flask_app.cli.add_command(rebuild_command)
+    flask_app.cli.add_command(rebuild_search_command)
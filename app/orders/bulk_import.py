@@ -0,0 +1,260 @@
+'''
+Bulk creation of sale order contents.
+All subcustomers and products referred by the order lines are resolved
+with a few queries, suborder numbers are allocated at once and rows are
+inserted in batches
+'''
+from __future__ import annotations
+import csv
+from datetime import datetime
+from io import BytesIO, StringIO
+from typing import IO, Any, Optional
+
+import openpyxl
+from more_itertools import chunked
+
+from common.exceptions import ProductNotFoundError, SubcustomerParseError
+
+from app import db
+from app.products.models.product import Product
+
+from .models.order import LIST_BATCH_SIZE, Order
+from .models.order_product import OrderProduct, OrderProductStatus
+from .models.subcustomer import Subcustomer
+from .models.suborder import Suborder
+from .utils import parse_subcustomer
+
+# Maximal amount of products in one suborder
+SUBORDER_SIZE = 10
+
+# Countries codes of the order form spreadsheet
+_FORM_COUNTRIES = {
+    0: 'korea', 1: 'ru', 2: 'ua', 3: 'in', 4: 'au', 5: 'br', 6: 'ca', 7: 'cn',
+    8: 'fr', 9: 'de', 10: 'hk', 11: 'id', 12: 'jp', 13: 'my', 14: 'nz', 15: 'ph',
+    16: 'sg', 17: 'es', 18: 'tw', 19: 'th', 20: 'gb', 21: 'us', 22: 'vn',
+    23: 'zone1', 24: 'zone2', 25: 'zone3', 26: 'zone4', 27: 'kz', 28: 'uz', 29: 'kz'
+}
+_FORM_SHEET = 'Бланк'
+_FORM_FIRST_LINE = 12
+_FORM_LAST_LINE = 2000
+
+def add_suborders(order: Order, suborders: list[dict[str, Any]],
+                  skip_invalid_subcustomers: bool=True) -> list[dict[str, Any]]:
+    '''Adds suborders to the order. Items of each suborder are merged by product
+    and split into suborders of up to `SUBORDER_SIZE` products.
+    Lines, which can't be added, are skipped
+
+    :param Order order: order to add suborders to
+    :param list[dict] suborders: suborders in format of the order payload.
+        Items may have `line` attribute, which is referred in errors
+    :param bool skip_invalid_subcustomers: whether suborders of subcustomers, which
+        can't be parsed, are skipped. Otherwise `SubcustomerParseError` is raised
+    :returns list[dict]: errors of the skipped lines'''
+    errors: list[dict[str, Any]] = []
+    subcustomers = {s.username: s for s in Subcustomer.query.filter(Subcustomer.username.in_(
+        {s['subcustomer'].split(',', 1)[0].strip() for s in suborders}))}
+    products = Product.get_products_by_ids(
+        {str(item['item_code']) for suborder_data in suborders
+         for item in suborder_data['items'] if item.get('item_code')})
+    contents = []
+    for suborder_data in suborders:
+        items = _get_suborder_products(suborder_data['items'], products, errors)
+        try:
+            subcustomer, is_new = parse_subcustomer(suborder_data['subcustomer'], subcustomers)
+        except SubcustomerParseError as ex:
+            if not skip_invalid_subcustomers:
+                raise
+            errors += [{'line': item.get('line'), 'item_code': item.get('item_code'),
+                        'message': f"Subcustomer <{suborder_data['subcustomer']}>: {ex}"}
+                       for item in suborder_data['items']]
+            continue
+        if is_new:
+            subcustomers[subcustomer.username] = subcustomer
+            db.session.add(subcustomer)
+        if suborder_data.get('subcustomer_center_code'):
+            subcustomer.center_code = suborder_data['subcustomer_center_code']
+        if len(items) == 0:
+            errors.append({'line': None, 'item_code': None,
+                           'message': f"Suborder for <{subcustomer.username}> is empty. Skipped"})
+            continue
+        contents += [(subcustomer, suborder_data, list(chunk))
+                     for chunk in chunked(items.items(), SUBORDER_SIZE)]
+
+    seq_nums = iter(Suborder.allocate_seq_nums(order.id, len(contents)))
+    rows = 0
+    for subcustomer, suborder_data, items in contents:
+        suborder = Suborder(
+            order=order,
+            seq_num=next(seq_nums),
+            subcustomer=subcustomer,
+            buyout_date=datetime.strptime(suborder_data['buyout_date'], '%Y-%m-%d') \
+                if suborder_data.get('buyout_date') else None,
+            local_shipping=0,
+            when_created=datetime.now())
+        if suborder.buyout_date:
+            if not order.purchase_date or order.purchase_date > suborder.buyout_date:
+                order.set_purchase_date(suborder.buyout_date)
+        db.session.add(suborder)
+        for product, quantity in items:
+            db.session.add(OrderProduct(
+                suborder=suborder, product=product, price=product.price,
+                quantity=quantity, status=OrderProductStatus.pending))
+            order.total_weight += product.weight * quantity
+            order.subtotal_base_currency += product.price * quantity
+        rows += len(items) + 1
+        if rows >= LIST_BATCH_SIZE:
+            db.session.flush()
+            rows = 0
+    db.session.flush()
+    return errors
+
+def _get_suborder_products(items: list[dict[str, Any]], products: dict[str, list[Product]],
+                           errors: list[dict[str, Any]]) -> dict[Product, int]:
+    '''Returns quantities of the suborder items by product.
+    Errors of the skipped items keep arguments of the exception in `args`'''
+    result: dict[Product, int] = {}
+    for item in items:
+        if not item.get('item_code'):
+            continue
+        item_code = str(item['item_code'])
+        found = products.get(Product.normalize_id(item_code), [])
+        try:
+            if len(found) == 0:
+                raise ProductNotFoundError(item_code)
+            if len(found) > 1:
+                raise Exception(f"More than one product was found by ID <{item_code}>")
+            try:
+                quantity = int(item['quantity'])
+            except (KeyError, TypeError, ValueError) as ex:
+                raise ValueError(f"Quantity <{item.get('quantity')}> is not an integer") from ex
+        except Exception as ex:
+            errors.append({'line': item.get('line'), 'item_code': item_code,
+                           'message': str(ex), 'args': ex.args})
+            continue
+        result[found[0]] = result.get(found[0], 0) + quantity
+    return result
+
+def get_suborders(lines: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    '''Groups order lines into suborders of the order payload.
+    Consecutive lines of the same subcustomer make one suborder
+
+    :param list[dict] lines: lines with `subcustomer`, `item_code` and `quantity`
+        attributes and optional `buyout_date` and `subcustomer_center_code`
+    :returns list[dict]: suborders in format of the order payload'''
+    suborders: list[dict[str, Any]] = []
+    for number, line in enumerate(lines, start=1):
+        subcustomer = line.get('subcustomer') or ''
+        if len(suborders) == 0 or \
+           suborders[-1]['subcustomer'].split(',', 1)[0].strip() != \
+               subcustomer.split(',', 1)[0].strip():
+            suborders.append({
+                'subcustomer': subcustomer,
+                'subcustomer_center_code': line.get('subcustomer_center_code'),
+                'buyout_date': line.get('buyout_date'),
+                'items': []
+            })
+        suborders[-1]['items'].append({
+            'line': line.get('line', number),
+            'item_code': line.get('item_code'),
+            'quantity': line.get('quantity')
+        })
+    return suborders
+
+def get_products(lines: list[dict[str, Any]]) -> dict[str, dict[str, Any]]:
+    '''Returns products of the order lines found with one lookup
+
+    :param list[dict] lines: lines with `item_code` attribute
+    :returns dict[str, dict]: products by item code. Item codes, which
+        don't identify exactly one product, are omitted'''
+    item_codes = {str(line['item_code']) for line in lines if line.get('item_code')}
+    products = Product.get_products_by_ids(item_codes)
+    result = {}
+    for item_code in item_codes:
+        found = products[Product.normalize_id(item_code)]
+        if len(found) == 1:
+            result[item_code] = found[0].to_dict(details=False)
+    return result
+
+def read_order_file(file: IO[bytes], filename: str) -> dict[str, Any]:
+    '''Reads order from the uploaded file. The file is either order form
+    spreadsheet or CSV (or spreadsheet) with columns
+    <subcustomer>, <product ID>, <quantity>. Rows without subcustomer belong
+    to the subcustomer of the previous row. The header row is optional
+
+    :param IO[bytes] file: file contents
+    :param str filename: name of the file
+    :returns dict: order header attributes found in the file and order lines'''
+    if filename.lower().endswith('.csv'):
+        content = file.read()
+        rows = list(csv.reader(StringIO(content.decode('utf-8-sig'))))
+        return {'lines': _get_lines(rows)}
+    workbook = openpyxl.load_workbook(BytesIO(file.read()), read_only=True, data_only=True)
+    if _FORM_SHEET in workbook.sheetnames:
+        return _read_order_form(workbook[_FORM_SHEET])
+    return {'lines': _get_lines(workbook.active.iter_rows(values_only=True))}
+
+def _get_lines(rows) -> list[dict[str, Any]]:
+    lines = []
+    subcustomer = None
+    for number, row in enumerate(rows, start=1):
+        row = [str(value).strip() if value is not None else '' for value in row]
+        row += [''] * (3 - len(row))
+        if not any(row[:3]):
+            continue
+        if number == 1 and not _is_number(row[2]):
+            continue # Header
+        subcustomer = row[0] or subcustomer
+        lines.append({'line': number, 'subcustomer': subcustomer,
+                      'item_code': row[1], 'quantity': row[2]})
+    return lines
+
+def _read_order_form(sheet) -> dict[str, Any]:
+    '''Reads the order form spreadsheet the same way the order page does'''
+    cells = {}
+    for row in sheet.iter_rows(min_row=1, max_row=_FORM_LAST_LINE, max_col=12):
+        for cell in row:
+            if cell.value is not None:
+                cells[f'{cell.column_letter}{cell.row}'] = cell.value
+    country_code = cells.get('L2')
+    result: dict[str, Any] = {
+        'customer_name': cells.get('B5'),
+        'address': cells.get('B6'),
+        'phone': cells.get('B7'),
+        'country': _FORM_COUNTRIES.get(country_code),
+        'shipping': _get_form_shipping(country_code, cells.get('L1')),
+        'lines': []
+    }
+    subcustomer: Optional[str] = None
+    for number in range(_FORM_FIRST_LINE, _FORM_LAST_LINE + 1):
+        first = cells.get(f'A{number}')
+        if first is None:
+            continue
+        is_seq_num = _is_number(first) and float(first).is_integer()
+        # Start of a subcustomer without subcustomer data means end of the order
+        if is_seq_num and cells.get(f'B{number}') is None:
+            break
+        if is_seq_num and cells.get(f'D{number}') is None:
+            subcustomer = str(cells[f'B{number}'])
+            continue
+        quantity = cells.get(f'D{number}')
+        result['lines'].append({
+            'line': number,
+            'subcustomer': subcustomer,
+            'item_code': str(first),
+            'quantity': int(quantity) if _is_number(quantity) else 0
+        })
+    return result
+
+def _get_form_shipping(country_code, shipping) -> Optional[int]:
+    if country_code == 0:
+        return 4 # No shipping
+    if country_code in (27, 28):
+        return 3
+    return shipping
+
+def _is_number(value) -> bool:
+    try:
+        float(value)
+        return True
+    except (TypeError, ValueError):
+        return False
@@ -0,0 +1,180 @@
+'''
+Denormalized read model of the sale orders list.
+Entries of `order_list_view` are refreshed once per unit of work, when the session
+is committed, for all orders changed in it. Changes are tracked by sale order
+and purchase order signals and by flushed changes of orders, their boxes,
+suborders, purchase orders and payments as well as of invoices, users,
+subcustomers and network nodes the entries show
+'''
+from __future__ import annotations
+from itertools import chain
+from typing import Iterable
+
+import click
+from flask.cli import with_appcontext
+from more_itertools import chunked
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.invoices.models.invoice import Invoice
+from app.network.models.node import Node
+from app.payments.models.payment import Payment
+from app.purchase.models.purchase_order import PurchaseOrder
+from app.purchase.signals import purchase_order_deleting, purchase_order_delivered, \
+    purchase_order_saving
+from app.shipping.models.shipping import Shipping
+from app.users.models.user import User
+
+from .models.order import LIST_BATCH_SIZE, Order, OrderBox
+from .models.order_list_entry import OrderListEntry
+from .models.order_status import OrderStatus
+from .models.subcustomer import Subcustomer
+from .models.suborder import Suborder
+from .signals import sale_order_created, sale_order_packed, sale_order_shipped
+from .totals import update_marked_totals
+
+# Key of the session info, which holds IDs of orders to refresh list entries for
+_ORDERS_TO_REFRESH = 'orders_to_refresh_list_view'
+
+def mark_for_refresh(order_id: str) -> None:
+    '''Marks the order's list entry for refresh. Entries of all marked orders
+    are refreshed once when the session is committed
+
+    :param str order_id: ID of the order to refresh the list entry for'''
+    db.session.info.setdefault(_ORDERS_TO_REFRESH, set()).add(order_id)
+
+def refresh(order_ids: Iterable[str]) -> None:
+    '''Brings list entries of the orders in line with the orders.
+    Entries of deleted and draft orders are removed
+
+    :param Iterable[str] order_ids: IDs of the orders to refresh list entries for'''
+    db.session.flush()
+    for batch in chunked({order_id for order_id in order_ids if order_id is not None},
+                         LIST_BATCH_SIZE):
+        orders = db.session.execute(
+            select(Order)
+            .where(Order.id.in_(batch), Order.status != OrderStatus.draft)
+            .options(
+                selectinload(Order.user),
+                selectinload(Order.country),
+                selectinload(Order.shipping).selectinload(Shipping.params),
+                selectinload(Order.boxes),
+                selectinload(Order.payments), # type: ignore
+                selectinload(Order.payment_method),
+                selectinload(Order.invoice),
+                selectinload(Order.suborders).selectinload(Suborder.subcustomer))
+            # Flushed values of the orders may be not in the form they are loaded in
+            .execution_options(populate_existing=True)
+        ).scalars().all()
+        entries = {entry.id: entry for entry in db.session.execute(
+            select(OrderListEntry).where(OrderListEntry.id.in_(batch))).scalars()}
+        extras = Order._get_list_extras(orders)
+        extensions = Order.get_model_extensions(orders)
+        for order in orders:
+            entry = entries.pop(order.id, None)
+            if entry is None:
+                entry = OrderListEntry()
+                entry.set_order(order, *extras[order.id], extensions[order.id])
+                db.session.add(entry)
+            else:
+                entry.set_order(order, *extras[order.id], extensions[order.id])
+        for entry in entries.values():
+            db.session.delete(entry)
+
+def refresh_marked() -> None:
+    '''Refreshes list entries of all orders marked for refresh right away'''
+    if db.session.info.get(_ORDERS_TO_REFRESH):
+        # Flushed changes may mark more orders
+        db.session.flush()
+        refresh(db.session.info.pop(_ORDERS_TO_REFRESH, set()))
+
+def rebuild() -> int:
+    '''Refreshes list entries of all orders. Each batch is committed separately
+
+    :returns int: number of processed orders'''
+    order_ids = set(db.session.execute(select(Order.id)).scalars()) \
+        | set(db.session.execute(select(OrderListEntry.id)).scalars())
+    for batch in chunked(sorted(order_ids), LIST_BATCH_SIZE):
+        refresh(batch)
+        db.session.commit()
+    return len(order_ids)
+
+@click.command('rebuild-order-list-view')
+@with_appcontext
+def rebuild_command():
+    '''Rebuilds the denormalized orders list'''
+    click.echo(f"{rebuild()} orders are processed")
+
+def _get_order_ids(instance) -> list[str]:
+    '''Returns IDs of the orders, which list entries are affected by the instance'''
+    if isinstance(instance, Order):
+        return [instance.id]
+    if isinstance(instance, (OrderBox, Suborder)):
+        return [instance.order_id]
+    if isinstance(instance, PurchaseOrder):
+        return [instance.suborder.order_id] if instance.suborder else []
+    if isinstance(instance, Payment):
+        return [order.id for order in chain(
+            instance.orders, inspect(instance).attrs.orders.history.deleted or [])]
+    if isinstance(instance, Invoice) and _has_changes(instance, 'export_id'):
+        return _select_order_ids(select(Order.id).where(Order.invoice_id == instance.id))
+    if isinstance(instance, User) and _has_changes(instance, 'username'):
+        return _select_order_ids(select(Order.id).where(Order.user_id == instance.id))
+    if isinstance(instance, Subcustomer) \
+            and _has_changes(instance, 'username', 'name', 'in_network'):
+        return _select_order_ids(
+            select(Suborder.order_id).where(Suborder.subcustomer_id == instance.id))
+    if isinstance(instance, Node):
+        # Subcustomers, which membership isn't known, are looked up in the network
+        return _select_order_ids(
+            select(Suborder.order_id).join(Subcustomer, Suborder.subcustomer)
+            .where(Subcustomer.username == instance.id, Subcustomer.in_network == None))
+    return []
+
+def _has_changes(instance, *attributes: str) -> bool:
+    '''Returns whether any of the attributes of the stored instance is changed'''
+    state = inspect(instance)
+    return state.persistent and any(
+        state.attrs[attribute].history.has_changes() for attribute in attributes)
+
+def _select_order_ids(query) -> list[str]:
+    with db.session.no_autoflush:
+        return list(db.session.execute(query.distinct()).scalars())
+
+def _on_sale_order_changed(sender, **_extra):
+    mark_for_refresh(sender.id)
+
+def _on_purchase_order_changed(sender, **_extra):
+    if sender.suborder is not None:
+        mark_for_refresh(sender.suborder.order_id)
+
+sale_order_created.connect(_on_sale_order_changed)
+sale_order_packed.connect(_on_sale_order_changed)
+sale_order_shipped.connect(_on_sale_order_changed)
+purchase_order_saving.connect(_on_purchase_order_changed)
+purchase_order_deleting.connect(_on_purchase_order_changed)
+purchase_order_delivered.connect(_on_purchase_order_changed)
+
+def _mark_pending(session) -> None:
+    '''Marks orders affected by pending changes of the session for refresh'''
+    for instance in chain(session.new, session.deleted,
+                          filter(session.is_modified, session.dirty)):
+        for order_id in _get_order_ids(instance):
+            session.info.setdefault(_ORDERS_TO_REFRESH, set()).add(order_id)
+
+@event.listens_for(db.session, 'before_flush')
+def _on_before_flush(session, _flush_context, _instances):
+    _mark_pending(session)
+
+@event.listens_for(db.session, 'before_commit')
+def _on_before_commit(session):
+    update_marked_totals()
+    # The commit flushes pending changes only after this hook, so orders
+    # affected by them are marked here
+    _mark_pending(session)
+    refresh_marked()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _on_after_soft_rollback(session, _previous_transaction):
+    session.info.pop(_ORDERS_TO_REFRESH, None)
@@ -5,29 +5,31 @@ from decimal import Decimal
 import logging
 from functools import reduce
 import os.path
-from tempfile import _TemporaryFileWrapper, NamedTemporaryFile
-from typing import Optional
-import openpyxl
+from tempfile import _TemporaryFileWrapper
+from typing import IO, Any, Optional
+from more_itertools import chunked
 from openpyxl.styles import PatternFill
 
 from sqlalchemy import Boolean, Column, Enum, DateTime, Numeric, ForeignKey, Integer, \
-    String, func, or_, select
+    String, func, select
 from sqlalchemy.ext.associationproxy import association_proxy
-from sqlalchemy.orm import backref, relationship
+from sqlalchemy.orm import backref, relationship, selectinload
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 from sqlalchemy.orm import attribute_keyed_dict
 
-from app import db
+from app import db, excel
 from app.currencies.models.currency import Currency
 import app.invoices.models as i
 import app.orders.models.suborder as so
 import app.payments.models.payment_method as pm
 from app.models.base import BaseModel
 from app.models.country import Country
-from app.orders.signals import sale_order_model_preparing
+from app.models.sequence import Sequence
+from app.orders.signals import sale_order_list_model_preparing, sale_order_model_preparing
 import app.purchase.models as p
 from app.settings.models.setting import Setting
 from app.shipping.models.shipping import Shipping
+from app.tools import get_model_extensions
 from app.users.models.user import User
 from common.exceptions import OrderError, UnfinishedOrderError
 
@@ -35,6 +37,8 @@ from .order_product import OrderProduct
 from .order_status import OrderStatus
 
 ORDER_ID = 'orders.id'
+# Maximal amount of orders, which related entities are loaded by one query
+LIST_BATCH_SIZE = 500
 
 class OrderBox(db.Model, BaseModel): # type: ignore
     ''' Specific box used in order '''
@@ -173,17 +177,18 @@ class Order(db.Model, BaseModel): # type: ignore
         ''' Generates new seq_num and ID for the order '''
         today = datetime.now()
         today_prefix = Order.__id_pattern.format(year=today.year, month=today.month)
-        last_order = db.session.query(Order.seq_num). \
-            filter(Order.id.like(today_prefix + '%')). \
-            order_by(Order.seq_num.desc()). \
-            first()
-        seq_num = last_order[0] + 1 if last_order else 1
+        def get_last_seq_num():
+            return db.session.query(func.max(Order.seq_num)). \
+                filter(Order.id.like(today_prefix + '%')). \
+                scalar() or 0
+        seq_num = Sequence.allocate(today_prefix, get_initial_value=get_last_seq_num)[0]
         id = today_prefix + '{:04d}'.format(seq_num)
         return seq_num, id
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
-        self.seq_num, self.id = self.get_new_id()
+        if kwargs.get('id') is None:
+            self.seq_num, self.id = self.get_new_id()
 
         self.total_weight = 0
         self.total_base_currency = 0
@@ -232,10 +237,13 @@ class Order(db.Model, BaseModel): # type: ignore
         db.session.add(transaction)
 
     def delete(self):
-        for suborder in self.suborders:
-            suborder.delete()
-        OrderParam.query.filter_by(order_id=self.id).delete()
-        super().delete()
+        # Deletions are flushed at once, otherwise cascades of the order
+        # delete already flushed suborders and order products again
+        with db.session.no_autoflush:
+            for suborder in self.suborders:
+                suborder.delete()
+            OrderParam.query.filter_by(order_id=self.id).delete()
+            super().delete()
 
     @classmethod
     def get_filter(cls, base_filter, column = None, filter_value = None):
@@ -248,15 +256,8 @@ class Order(db.Model, BaseModel): # type: ignore
         part_filter = f'%{filter_value}%'
         filter_values = filter_value.split(',')
         if column is None:
-            return \
-                base_filter.filter(or_(
-                    cls.id.like(part_filter),
-                    cls.customer_name.like(part_filter),
-                    cls.user.has(User.username.like(part_filter)),
-                    cls.comment.like(part_filter),
-                    cls.status.like(part_filter),
-                    cls.tracking_id.like(part_filter)
-                ))
+            from .search_entry import OrderSearchEntry
+            return base_filter.filter(cls.id.in_(OrderSearchEntry.match(filter_value)))
         if isinstance(column, str):
             if column == 'when_po_posted':
                 return base_filter.filter(
@@ -332,6 +333,140 @@ class Order(db.Model, BaseModel): # type: ignore
 
     def to_dict(self, details=False, partial=None):
         ''' Returns dictionary representation of the object ready to be JSONified '''
+        from app.purchase.models.purchase_order import PurchaseOrder
+        from app.orders.totals import get_missing_totals
+        from .suborder import Suborder
+        need_to_check_outsiders = Setting.get('check_outsiders') == '1'
+        posted_pos_count, when_po_posted = db.session.execute(
+            select(func.count(PurchaseOrder.id), func.max(PurchaseOrder.when_posted))
+            .join(Suborder, PurchaseOrder.suborder_id == Suborder.id)
+            .where(Suborder.order_id == self.id, PurchaseOrder.when_posted != None)
+        ).one()
+        if posted_pos_count != len(self.suborders):
+            when_po_posted = None
+        outsiders = [so.subcustomer.username + ":" + so.subcustomer.name
+                     for so in self.suborders
+                     if not so.is_for_internal()] \
+                    if need_to_check_outsiders \
+                    else []
+        return self._to_dict(when_po_posted, outsiders, details, partial,
+                             totals=get_missing_totals([self]).get(self.id))
+
+    @classmethod
+    def to_dict_list(cls, orders, details=False) -> list[dict]:
+        '''Returns dictionary representations of the orders ready to be JSONified.
+        The output is the same as of `to_dict()` for each order but all related
+        entities are loaded with a fixed number of set-based queries so the amount
+        of queries doesn't depend on the number of orders'''
+        orders = list(orders)
+        if len(orders) == 0:
+            return []
+        if len(orders) > LIST_BATCH_SIZE:
+            return [entry for batch in chunked(orders, LIST_BATCH_SIZE)
+                          for entry in cls.to_dict_list(batch, details)]
+        order_ids = [order.id for order in orders]
+        db.session.execute(
+            select(Order).where(Order.id.in_(order_ids)).options(*cls._get_list_load_options())
+        ).scalars().all()
+        from app.orders.totals import get_missing_totals
+        missing_totals = get_missing_totals(orders)
+        extras = cls._get_list_extras(orders)
+        extensions = cls.get_model_extensions(orders, details)
+        return [order._to_dict(*extras[order.id], details, extension=extensions[order.id],
+                               totals=missing_totals.get(order.id))
+                for order in orders]
+
+    @staticmethod
+    def get_model_extensions(orders: list[Order], details: bool=False) -> dict[str, dict]:
+        '''Returns module specific parts of dictionary representations of the orders
+
+        :param list[Order] orders: orders to get module specific parts for
+        :param bool details: whether details of the orders are requested
+        :returns dict[str, dict]: module specific parts by order ID'''
+        return get_model_extensions(sale_order_list_model_preparing,
+                                    sale_order_model_preparing, orders, details=details)
+
+    @staticmethod
+    def _get_list_extras(orders: list[Order]) -> dict[str, tuple[Optional[datetime], list[str]]]:
+        '''Returns the time all purchase orders were posted and outsiders
+        of each order. Both are fetched for all orders at once
+
+        :param list[Order] orders: orders to get the values for
+        :returns dict[str, tuple]: (when_po_posted, outsiders) by order ID'''
+        from app.network.models.node import Node
+        from app.purchase.models.purchase_order import PurchaseOrder
+        from .suborder import Suborder
+        order_ids = [order.id for order in orders]
+        need_to_check_outsiders = Setting.get('check_outsiders') == '1'
+        posted_pos = {
+            order_id: (po_count, when_posted)
+            for order_id, po_count, when_posted in db.session.execute(
+                select(Suborder.order_id,
+                       func.count(PurchaseOrder.id),
+                       func.max(PurchaseOrder.when_posted))
+                .join(Suborder, PurchaseOrder.suborder_id == Suborder.id)
+                .where(Suborder.order_id.in_(order_ids),
+                       PurchaseOrder.when_posted != None)
+                .group_by(Suborder.order_id)
+            )
+        }
+        network_members = set()
+        if need_to_check_outsiders:
+            unknown_usernames = {so.subcustomer.username
+                                 for order in orders for so in order.suborders
+                                 if so.subcustomer.in_network is None}
+            if len(unknown_usernames) > 0:
+                network_members = set(db.session.execute(
+                    select(Node.id).where(Node.id.in_(unknown_usernames))
+                ).scalars())
+
+        result = {}
+        for order in orders:
+            posted_pos_count, when_po_posted = posted_pos.get(order.id, (0, None))
+            if posted_pos_count != len(order.suborders):
+                when_po_posted = None
+            outsiders = [so.subcustomer.username + ":" + so.subcustomer.name
+                         for so in order.suborders
+                         if not (so.subcustomer.in_network
+                                 if so.subcustomer.in_network is not None
+                                 else so.subcustomer.username in network_members)] \
+                        if need_to_check_outsiders \
+                        else []
+            result[order.id] = (when_po_posted, outsiders)
+        return result
+
+    @staticmethod
+    def _get_list_load_options() -> list:
+        '''Returns loader options for all relations used by the order's dictionary
+        representation'''
+        from app.invoices.models.invoice_item import InvoiceItem
+        from .suborder import Suborder
+        return [
+            selectinload(Order.user),
+            selectinload(Order.country),
+            selectinload(Order.shipping).selectinload(Shipping.params),
+            selectinload(Order.boxes),
+            selectinload(Order.payments), # type: ignore
+            selectinload(Order.payment_method),
+            selectinload(Order.order_params), # type: ignore
+            selectinload(Order.suborders).selectinload(Suborder.subcustomer),
+            selectinload(Order.invoice).options(
+                selectinload(i.Invoice._invoice_items).selectinload(InvoiceItem.product),
+                selectinload(i.Invoice.orders).options(
+                    selectinload(Order.country),
+                    selectinload(Order.shipping),
+                    selectinload(Order.suborders)
+                        .selectinload(Suborder.order_products)
+                        .selectinload(OrderProduct.product)
+                )
+            )
+        ]
+
+    def _to_dict(self, when_po_posted, outsiders, details=False, partial=None, extension=None,
+                 totals=None):
+        '''Builds dictionary representation of the object out of its attributes
+        and provided values, which require additional queries.
+        Totals, which aren't stored yet, are taken from `totals`'''
         def list_to_dict(key_list, value):
             if len(key_list) == 0:
                 return value
@@ -350,42 +485,21 @@ class Order(db.Model, BaseModel): # type: ignore
                 else:
                     a[key] = b[key]
             return a
-        logger = logging.getLogger('Order.to_dict')
         from app.payments.models.payment import PaymentStatus
-        from app.purchase.models.purchase_order import PurchaseOrder
-        from .suborder import Suborder
-        is_order_updated = False
-        if not self.total_base_currency:
-            logger.debug("%s totals are undefined. Updating...", self.id)
-            self.update_total()
-            is_order_updated = True
-        if not self.total_user_currency and self.user_currency_code:
-            logger.debug("%s total in user currency (%s) is undefined. Updating...",
-                         self.id, self.user_currency_code)
-            user_currency = db.session.get(Currency, self.user_currency_code)
-            if user_currency and not user_currency.base:
-                self.total_user_currency = self.total_base_currency * user_currency.rate
-                is_order_updated = True
-        if is_order_updated:
-            db.session.commit()
-        check_outsiders_setting = db.session.get(Setting, 'check_outsiders')
-        need_to_check_outsiders = check_outsiders_setting.value == '1' \
-            if check_outsiders_setting is not None else False
-        posted_pos = (
-            PurchaseOrder.query.join(Suborder)
-                .filter(Suborder.order_id == self.id)
-                .filter(PurchaseOrder.when_posted != None)
-        )
-        when_po_posted = db.session.execute(
-            select(func.max(PurchaseOrder.when_posted)).select_from(posted_pos.subquery())
-        ).scalar() \
-            if posted_pos.count() == len(self.suborders) \
-            else None
 
         # Issuing a signal to get module specific part of the order
-        res = sale_order_model_preparing.send(self, details=details)
-        ext_model = reduce(lambda acc, i: {**acc, **i}, [i[1] for i in res], {})
+        ext_model = extension if extension is not None \
+            else self.get_model_extensions([self], details)[self.id]
 
+        totals = {
+            'subtotal_base_currency': self.subtotal_base_currency,
+            'total_weight': self.total_weight,
+            'shipping_box_weight': self.shipping_box_weight,
+            'shipping_base_currency': self.shipping_base_currency,
+            'total_base_currency': self.total_base_currency,
+            'total_user_currency': self.total_user_currency,
+            **(totals or {})
+        }
         result = {
             'id': self.id,
             'user': self.user.username if self.user else None,
@@ -399,18 +513,21 @@ class Order(db.Model, BaseModel): # type: ignore
             'comment': self.comment,
             'invoice_id': self.invoice_id,
             'invoice': self.invoice.to_dict() if self.invoice is not None else None,
-            'subtotal_base_currency': self.subtotal_base_currency,
-            'subtotal_krw': self.subtotal_base_currency,
-            'total_weight': self.total_weight,
-            'shipping_box_weight': self.shipping_box_weight,
-            'shipping_base_currency': self.shipping_base_currency,
-            'shipping_krw': self.shipping_base_currency,
-            'total': self.total_base_currency,
-            'total_base_currency': self.total_base_currency,
-            'total_krw': self.total_base_currency,
-            'total_user_currency': float(self.total_user_currency) if self.total_user_currency else None,
-            'total_cur1': float(self.total_user_currency) if self.total_user_currency else None,
-            'total_cur2': float(self.total_user_currency) if self.total_user_currency else None,
+            'subtotal_base_currency': totals['subtotal_base_currency'],
+            'subtotal_krw': totals['subtotal_base_currency'],
+            'total_weight': totals['total_weight'],
+            'shipping_box_weight': totals['shipping_box_weight'],
+            'shipping_base_currency': totals['shipping_base_currency'],
+            'shipping_krw': totals['shipping_base_currency'],
+            'total': totals['total_base_currency'],
+            'total_base_currency': totals['total_base_currency'],
+            'total_krw': totals['total_base_currency'],
+            'total_user_currency': float(totals['total_user_currency']) \
+                if totals['total_user_currency'] else None,
+            'total_cur1': float(totals['total_user_currency']) \
+                if totals['total_user_currency'] else None,
+            'total_cur2': float(totals['total_user_currency']) \
+                if totals['total_user_currency'] else None,
             'user_currency_code': self.user_currency_code,
             'shipping': self.shipping.to_dict() if self.shipping else None,
             'boxes': [box.to_dict() for box in self.boxes],
@@ -421,11 +538,7 @@ class Order(db.Model, BaseModel): # type: ignore
                 and len([p for p in self.payments if p.status == PaymentStatus.pending]) > 0,
             'tracking_id': self.tracking_id if self.tracking_id else None,
             'tracking_url': self.tracking_url if self.tracking_url else None,
-            'outsiders': [so.subcustomer.username + ":" + so.subcustomer.name
-                          for so in self.suborders
-                          if not so.is_for_internal()] \
-                         if need_to_check_outsiders \
-                         else [],
+            'outsiders': outsiders,
             'params': reduce(
                 lambda acc, pair: 
                     merge(acc, list_to_dict(pair[0].split('.'), pair[1])),
@@ -443,7 +556,7 @@ class Order(db.Model, BaseModel): # type: ignore
         if details:
             result = {**result,
                 'suborders': [so.to_dict() for so in self.suborders],
-                'order_products': [op.to_dict() for op in self.order_products],
+                'order_products': OrderProduct.to_dict_list(self.order_products),
                 'attached_orders': [o.to_dict() for o in self.attached_orders],
                 'purchase_orders': [po.to_dict() for po in self.purchase_orders]
             }
@@ -453,7 +566,6 @@ class Order(db.Model, BaseModel): # type: ignore
 
     def update_total(self):
         ''' Updates totals of the order '''
-        from app.shipping.models.shipping import PostponeShipping, Shipping, NoShipping
         logger = logging.getLogger(self.id)
         logger.debug("Updating total")
         logger.debug("There are %s suborders", len(self.suborders))
@@ -466,56 +578,82 @@ class Order(db.Model, BaseModel): # type: ignore
 
         order_weight = reduce(lambda acc, sub: acc + sub.get_total_weight(),
                               self.suborders, 0)
+        subtotal_base_currency = reduce(
+            lambda acc, sub: acc + sub.get_subtotal() + sub.local_shipping, self.suborders, 0)
+        self._apply_totals(order_weight, subtotal_base_currency)
+
+    def _apply_totals(self, order_weight: int, subtotal_base_currency: int) -> None:
+        '''Sets weight, shipping and totals of the order out of weight and
+        subtotal (including local shipping) of its suborders'''
+        if self.shipping is None:
+            self.shipping = self._get_default_shipping()
+        for attr, value in self._calculate_totals(order_weight, subtotal_base_currency).items():
+            setattr(self, attr, value)
+
+    def _get_default_shipping(self):
+        '''Returns shipping method to calculate totals with when the order has none'''
+        from app.shipping.models.shipping import Shipping, NoShipping
+        if self.shipping_method_id is not None:
+            return db.session.get(Shipping, self.shipping_method_id)
+        shipping = NoShipping.query.first()
+        return shipping if shipping is not None else NoShipping()
+
+    def _calculate_totals(self, order_weight: int, subtotal_base_currency: int) -> dict[str, Any]:
+        '''Calculates weight, shipping and totals of the order out of weight and
+        subtotal (including local shipping) of its suborders without changing the order
+
+        :returns dict[str, Any]: values of the order's attributes'''
+        from app.shipping.models.shipping import PostponeShipping, NoShipping
+        logger = logging.getLogger(self.id)
         logger.debug("Total order weight: %s", order_weight)
         attached_orders_weight = reduce(lambda acc, ao: acc + ao.total_weight,
                                         self.attached_orders, 0)
         logger.debug("Attached orders weight: %s", attached_orders_weight)
-        if self.shipping is None:
-            if self.shipping_method_id is not None:
-                self.shipping = db.session.get(Shipping, self.shipping_method_id)
-            else:
-                self.shipping = NoShipping.query.first()
-                if self.shipping is None:
-                    self.shipping = NoShipping()
-        logger.debug("Shipping: %s", self.shipping)
+        shipping = self.shipping if self.shipping is not None \
+            else self._get_default_shipping()
+        logger.debug("Shipping: %s", shipping)
         if not self.total_weight_set_manually:
-            self.total_weight = order_weight + attached_orders_weight
-            self.shipping_box_weight = reduce(lambda acc, b: acc + b.weight,
-                                            self.boxes, 0) \
+            total_weight = order_weight + attached_orders_weight
+            shipping_box_weight = reduce(lambda acc, b: acc + b.weight, self.boxes, 0) \
                 if len(self.boxes) > 0 \
-                else self.shipping.get_box_weight(self.total_weight) \
-                    if not isinstance(self.shipping, (NoShipping, PostponeShipping)) \
+                else shipping.get_box_weight(total_weight) \
+                    if not isinstance(shipping, (NoShipping, PostponeShipping)) \
                     else 0
-            logger.debug("Total weight (calculated): %s", self.total_weight)
-            logger.debug("Box weight: %s", self.shipping_box_weight)
+            logger.debug("Total weight (calculated): %s", total_weight)
+            logger.debug("Box weight: %s", shipping_box_weight)
             logger.debug("Total weight (calculated) with box: %s",
-                         self.total_weight + self.shipping_box_weight)
+                         total_weight + shipping_box_weight)
         else:
-            self.shipping_box_weight = 0
-            logger.debug("Total weight (set manually): %s", self.total_weight)
-        # self.subtotal_krw = reduce(lambda acc, op: acc + op.price * op.quantity,
-        #                            self.order_products, 0)
-        self.subtotal_base_currency = reduce(
-            lambda acc, sub: acc + sub.get_subtotal() + sub.local_shipping, self.suborders, 0)
-        logger.debug("Subtotal: %s", self.subtotal_base_currency)
+            total_weight = self.total_weight
+            shipping_box_weight = 0
+            logger.debug("Total weight (set manually): %s", total_weight)
+        logger.debug("Subtotal: %s", subtotal_base_currency)
 
         user_currency = db.session.get(Currency, self.user_currency_code) if self.user_currency_code else None
         user_rate = float(user_currency.rate) if user_currency and not user_currency.base else None
 
-        self.subtotal_user_currency = self.subtotal_base_currency * user_rate if user_rate is not None else 0
+        subtotal_user_currency = subtotal_base_currency * user_rate if user_rate is not None else 0
 
-        self.shipping_base_currency = int(Decimal(self.shipping.get_shipping_cost(
+        shipping_base_currency = int(Decimal(shipping.get_shipping_cost(
             self.country.id if self.country else None,
-            self.total_weight + self.shipping_box_weight)))
-        logger.debug("Shipping (base): %s", self.shipping_base_currency)
-        self.shipping_user_currency = self.shipping_base_currency * user_rate if user_rate is not None else 0
+            total_weight + shipping_box_weight)))
+        logger.debug("Shipping (base): %s", shipping_base_currency)
+        shipping_user_currency = shipping_base_currency * user_rate if user_rate is not None else 0
         logger.debug("Service fee: %s", self.service_fee)
-        self.total_base_currency = self.subtotal_base_currency + self.shipping_base_currency + self.service_fee
-        logger.debug("Total (base): %s", self.total_base_currency)
-        self.total_user_currency = self.subtotal_user_currency + self.shipping_user_currency
-
+        total_base_currency = subtotal_base_currency + shipping_base_currency + self.service_fee
+        logger.debug("Total (base): %s", total_base_currency)
+        return {
+            'total_weight': total_weight,
+            'shipping_box_weight': shipping_box_weight,
+            'subtotal_base_currency': subtotal_base_currency,
+            'subtotal_user_currency': subtotal_user_currency,
+            'shipping_base_currency': shipping_base_currency,
+            'shipping_user_currency': shipping_user_currency,
+            'total_base_currency': total_base_currency,
+            'total_user_currency': subtotal_user_currency + shipping_user_currency
+        }
 
-    def get_order_excel(self) -> _TemporaryFileWrapper:
+    def get_order_excel(self) -> IO[bytes]:
         '''Generates an invoice in excel format. Returns a temporary file object'''
         logger = logging.getLogger('Order.get_order_excel')
         if len(self.order_products) == 0:
@@ -523,92 +661,92 @@ class Order(db.Model, BaseModel): # type: ignore
         if not self.total_base_currency:
             logger.debug("%s totals are undefined. Updating...", self.id)
             self.update_total()
-        package_path = os.path.dirname(__file__) + '/..'
-        suborder_fill = PatternFill(
-            start_color='00FFFF00', end_color='00FFFF00', fill_type='solid')
-        order_wb = openpyxl.open(f'{package_path}/templates/order_template.xlsx')
-        ws = order_wb.worksheets[0]
+        template = excel.get_template(
+            os.path.dirname(__file__) + '/../templates/order_template.xlsx', rows=11)
+        order_wb, ws = template.new_sheet()
 
         # Set order header
-        ws.cell(2, 2, "\n".join([self.id] + [ao.id for ao in self.attached_orders]))
-        ws.cell(2, 3, self.when_created.strftime('%Y-%m-%d'))
-        ws.cell(4, 2, self.customer_name)
-        ws.cell(5, 2, str(self.address) + '\n' + str(self.city_eng) + '\n' + str(self.zip))
-        ws.cell(6, 2, self.phone)
-        # Set currency rates
-        ws.cell(8, 5, float(1 / db.session.get(Currency, 'EUR').rate))
-        ws.cell(9, 5, float(1 / db.session.get(Currency, 'USD').rate))
-
-        ws.cell(6, 6, self.subtotal_base_currency)
-        ws.cell(6, 7, self.total_weight + self.shipping_box_weight)
-        ws.cell(6, 8, self.shipping_base_currency)
-        ws.cell(6, 9, self.total_base_currency)
-        ws.cell(6, 13, reduce(lambda acc, op: acc + op.product.points,
-                              self.order_products, 0))
-        # Set shipping
-        ws.cell(1, 6, self.shipping.name)
-        ws.cell(1, 7, self.tracking_id)
-        ws.cell(2, 6, self.country.name)
-        # Set packaging
-        ws.cell(11, 7, self.shipping_box_weight)
+        template.write_header(ws, {
+            'B2': "\n".join([self.id] + [ao.id for ao in self.attached_orders]),
+            'C2': self.when_created.strftime('%Y-%m-%d'),
+            'B4': self.customer_name,
+            'B5': str(self.address) + '\n' + str(self.city_eng) + '\n' + str(self.zip),
+            'B6': self.phone,
+            # Set currency rates
+            'E8': float(1 / db.session.get(Currency, 'EUR').rate),
+            'E9': float(1 / db.session.get(Currency, 'USD').rate),
+            'F6': self.subtotal_base_currency,
+            'G6': self.total_weight + self.shipping_box_weight,
+            'H6': self.shipping_base_currency,
+            'I6': self.total_base_currency,
+            'M6': reduce(lambda acc, op: acc + op.product.points, self.order_products, 0),
+            # Set shipping
+            'F1': self.shipping.name,
+            'G1': self.tracking_id,
+            'F2': self.country.name,
+            # Set packaging
+            'G11': self.shipping_box_weight
+        })
+
+        # Rows are written once so shipping of order products is calculated beforehand
+        suborders = []
+        for suborder in self.suborders:
+            order_products = suborder.get_order_products()
+            if len(order_products) > 0:
+                suborders.append((suborder, order_products,
+                                  [self._get_shipping_per_product(op) for op in order_products]))
+        #TODO: Modify compensation to take into account attached orders
+        # # Compensate rounding error
+        if len(suborders) > 0 \
+            and self.attached_order is None and len(self.attached_orders) == 0:
+            suborders[-1][2][-1] += self.shipping_base_currency - \
+                sum(sum(op_shipping) for _, _, op_shipping in suborders)
 
         # Set order product lines
-        op_shipping = {}
+        suborder_style = excel.CellStyle(fill=PatternFill(
+            start_color='00FFFF00', end_color='00FFFF00', fill_type='solid'))
         row = 11
-        for suborder in self.suborders:
-            if len(suborder.get_order_products()) == 0:
-                continue
+        for suborder, order_products, op_shipping in suborders:
             row += 1
-            suborder_row = row
-            ws.merge_cells(f"B{row}:C{row}")
-            for cell in ws[f'A{row}:M{row}'][0]:
-                cell.fill = suborder_fill
-            ws.cell(row, 2, f'{suborder.subcustomer.username}: {suborder.subcustomer.name}')
-            ws.cell(row, 6, suborder.get_subtotal())
-            ws.cell(row, 7, suborder.get_total_weight())
-            # ws.cell(row, 8, suborder_shipping)
-            ws.cell(row, 9, f'=F{row} + H{row}')
-            ws.cell(row, 10, f'=I{row} / $E$8')
-            ws.cell(row, 11, f'=I{row} / $E$9')
-            ws.cell(row, 13, suborder.get_total_points())
-            for op in suborder.get_order_products():
+            last_row = row + len(order_products) + (1 if suborder.local_shipping != 0 else 0)
+            ws.merged_cells.add(f"B{row}:C{row}")
+            template.append_row(ws, [
+                None,
+                f'{suborder.subcustomer.username}: {suborder.subcustomer.name}',
+                None,
+                None,
+                None,
+                suborder.get_subtotal(),
+                suborder.get_total_weight(),
+                f'=SUM(H{row + 1}:H{last_row})',
+                f'=F{row} + H{row}',
+                f'=I{row} / $E$8',
+                f'=I{row} / $E$9',
+                None,
+                suborder.get_total_points()
+            ], suborder_style)
+            for op, shipping in zip(order_products, op_shipping):
                 row += 1
-                op_shipping[row] = self._get_shipping_per_product(op)
-                ws.cell(row, 1, op.product_id)
-                ws.cell(row, 2, op.product.name_english)
-                ws.cell(row, 3, op.product.name_russian)
-                ws.cell(row, 4, op.quantity)
-                ws.cell(row, 5, op.price)
-                ws.cell(row, 6, op.price * op.quantity)
-                ws.cell(row, 7, op.product.weight * op.quantity)
-                ws.cell(row, 8, op_shipping[row])
-                ws.cell(row, 9, ws.cell(row, 6).value + ws.cell(row, 8).value) # type: ignore
-                ws.cell(row, 10, f'=I{row} / $E$8')
-                ws.cell(row, 11, f'=I{row} / $E$9')
-                ws.cell(row, 12, op.product.points)
-                ws.cell(row, 13, op.product.points * op.quantity)
+                template.append_row(ws, [
+                    op.product_id,
+                    op.product.name_english,
+                    op.product.name_russian,
+                    op.quantity,
+                    op.price,
+                    op.price * op.quantity,
+                    op.product.weight * op.quantity,
+                    shipping,
+                    op.price * op.quantity + shipping,
+                    f'=I{row} / $E$8',
+                    f'=I{row} / $E$9',
+                    op.product.points,
+                    op.product.points * op.quantity
+                ])
             if suborder.local_shipping != 0:
                 row += 1
-                ws.cell(row, 2, "Local shipping")
-                ws.cell(row, 4, 1)
-                ws.cell(row, 5, 2500)
-                ws.cell(row, 6, 2500)
-            ws.cell(suborder_row, 8, f'=SUM(H{suborder_row + 1}:H{row})')
-        #TODO: Modify compensation to take into account attached orders
-        # # Compensate rounding error
-        if len(op_shipping) > 0 \
-            and self.attached_order is None and len(self.attached_orders) == 0:
-            diff = self.shipping_base_currency - \
-                reduce(lambda acc, op_ship: acc + op_ship[1], op_shipping.items(), 0)
-            if op_shipping.get(row) is None:
-                row -= 1
-            ws.cell(row, 8).value += diff
-            ws.cell(row, 9).value += diff
-        
-        file = NamedTemporaryFile()
-        order_wb.save(file.name)
-        file.seek(0)
-        return file
+                template.append_row(ws, [None, "Local shipping", None, 1, 2500, 2500])
+
+        return excel.save(order_wb)
 
     def get_customs_label(self) -> tuple[_TemporaryFileWrapper, str]:
         '''Generates a customs label. Returns a temporary file object
@@ -0,0 +1,140 @@
+'''
+Denormalized representation of the sale order for the orders list
+'''
+from __future__ import annotations
+from datetime import datetime
+from typing import Any, Optional
+
+from sqlalchemy import JSON, Boolean, Column, DateTime, Enum, ForeignKey, Integer, \
+    String, func
+
+from app import db
+from app.models.base import BaseModel
+
+from .order_status import OrderStatus
+from .search_entry import OrderSearchEntry
+
+class OrderListEntry(db.Model, BaseModel): # type: ignore
+    '''One row of the orders list. Holds everything the orders list shows
+    so the list can be filtered, sorted and paged without joining other tables.
+    Entries are maintained by `app.orders.list_view`'''
+    __tablename__ = 'order_list_view'
+
+    id = Column(String(16), ForeignKey('orders.id', ondelete='CASCADE'), primary_key=True)
+    user_id = Column(Integer, index=True)
+    user = Column(String(32))
+    customer_name = Column(String(64))
+    comment = Column(String(65536))
+    tracking_id = Column(String(64))
+    status = Column(Enum(OrderStatus), index=True)
+    country_id = Column(String(2))
+    shipping_method_id = Column(Integer)
+    payment_method_id = Column(Integer)
+    invoice_export_id = Column(String(32))
+    subtotal_krw = Column(Integer)
+    shipping_krw = Column(Integer)
+    total_krw = Column(Integer)
+    payment_pending = Column(Boolean, default=False)
+    purchase_date = Column(DateTime)
+    purchase_date_sort = Column(DateTime, index=True)
+    when_po_posted = Column(DateTime)
+    when_created = Column(DateTime, index=True)
+    when_changed = Column(DateTime)
+    data = Column(JSON)
+
+    def set_order(self, order, when_po_posted: Optional[datetime],
+                  outsiders: list[str], extension: dict[str, Any]) -> None:
+        '''Fills the entry with the values of the order
+
+        :param Order order: order to fill the entry with
+        :param datetime when_po_posted: time all purchase orders of the order were posted
+        :param list[str] outsiders: subcustomers of the order, which aren't in the network
+        :param dict extension: module specific part of the order's representation'''
+        from app.payments.models.payment import PaymentStatus
+        self.id = order.id
+        self.user_id = order.user_id
+        self.user = order.user.username if order.user else None
+        self.customer_name = order.customer_name
+        self.comment = order.comment
+        self.tracking_id = order.tracking_id
+        self.status = order.status
+        self.country_id = order.country_id
+        self.shipping_method_id = order.shipping_method_id
+        self.payment_method_id = order.payment_method_id
+        self.invoice_export_id = order.invoice.export_id if order.invoice else None
+        self.subtotal_krw = order.subtotal_base_currency
+        self.shipping_krw = order.shipping_base_currency
+        self.total_krw = order.total_base_currency
+        self.payment_pending = order.status == OrderStatus.pending \
+            and len([p for p in order.payments if p.status == PaymentStatus.pending]) > 0
+        self.purchase_date = order.purchase_date
+        self.purchase_date_sort = order.purchase_date_sort
+        self.when_po_posted = when_po_posted
+        self.when_created = order.when_created
+        self.when_changed = order.when_changed
+        self.data = {
+            'id': order.id,
+            'user': self.user,
+            'customer_name': order.customer_name,
+            'comment': order.comment,
+            'country': order.country.to_dict() if order.country else None,
+            'invoice_id': order.invoice_id,
+            'invoice': {
+                'id': order.invoice.id,
+                'export_id': order.invoice.export_id
+            } if order.invoice else None,
+            'subtotal_base_currency': order.subtotal_base_currency,
+            'subtotal_krw': order.subtotal_base_currency,
+            'total_weight': order.total_weight,
+            'shipping_box_weight': order.shipping_box_weight,
+            'shipping_base_currency': order.shipping_base_currency,
+            'shipping_krw': order.shipping_base_currency,
+            'total_base_currency': order.total_base_currency,
+            'total_krw': order.total_base_currency,
+            'shipping': order.shipping.to_dict() if order.shipping else None,
+            'boxes': [box.to_dict() for box in order.boxes],
+            'status': order.status.name if order.status else None,
+            'payment_method': order.payment_method.name \
+                if order.payment_method else None,
+            'payment_pending': self.payment_pending,
+            'tracking_id': order.tracking_id if order.tracking_id else None,
+            'tracking_url': order.tracking_url if order.tracking_url else None,
+            'outsiders': outsiders,
+            'purchase_date': order.purchase_date.strftime('%Y-%m-%d %H:%M:%S') \
+                if order.purchase_date else None,
+            'when_po_posted': when_po_posted.strftime('%Y-%m-%d %H:%M:%S') \
+                if when_po_posted else None,
+            'when_created': order.when_created.strftime('%Y-%m-%d %H:%M:%S') \
+                if order.when_created else None,
+            'when_changed': order.when_changed.strftime('%Y-%m-%d %H:%M:%S') \
+                if order.when_changed else None,
+            **extension
+        }
+
+    @classmethod
+    def get_filter(cls, base_filter, column = None, filter_value = None):
+        if filter_value is None:
+            return base_filter
+        part_filter = f'%{filter_value}%'
+        filter_values = filter_value.split(',')
+        if column is None:
+            return base_filter.filter(cls.id.in_(OrderSearchEntry.match(filter_value)))
+        if isinstance(column, str):
+            return \
+                base_filter.filter(cls.country_id.in_(filter_values)) \
+                    if column == 'country' else \
+                base_filter.filter(cls.payment_method_id.in_(filter_values)) \
+                    if column == 'payment_method' else \
+                base_filter.filter(cls.shipping_method_id.in_(filter_values)) \
+                    if column == 'shipping' else \
+                base_filter
+        return \
+            base_filter.filter(func.date(column) == filter_value) \
+                if column.key == 'when_po_posted' else \
+            base_filter.filter(column.in_([OrderStatus[status]
+                               for status in filter_values])) \
+                if column.key == 'status' \
+            else base_filter.filter(column.like(part_filter))
+
+    def to_dict(self):
+        return self.data
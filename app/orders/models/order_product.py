@@ -2,7 +2,6 @@
 from __future__ import annotations
 from datetime import datetime
 import enum
-from functools import reduce
 
 from flask_security import current_user
 
@@ -12,9 +11,11 @@ from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 from app import db
 from app.models.base import BaseModel
-from app.orders.signals import order_product_model_preparing
+from app.orders.signals import order_product_list_model_preparing, \
+    order_product_model_preparing
 from app.products.models.product import Product
 from app.shipping.models.shipping import PostponeShipping
+from app.tools import get_model_extensions
 
 from .order_status import OrderStatus
 
@@ -91,8 +92,12 @@ class OrderProduct(db.Model, BaseModel): # type: ignore
 
     @classmethod
     def get_filter(cls, base_filter, column=None, filter_value=None):
-        if column is None or filter_value is None:
+        if filter_value is None:
             return base_filter
+        if column is None:
+            from .search_entry import OrderProductSearchEntry
+            return base_filter.filter(
+                cls.id.in_(OrderProductSearchEntry.match(filter_value)))
         from .order import Order
         from .subcustomer import Subcustomer
         from .suborder import Suborder
@@ -175,7 +180,8 @@ class OrderProduct(db.Model, BaseModel): # type: ignore
             public_comment=self.public_comment
         )
         db.session.add(postponed_order_product)
-        postponed_order.update_total()
+        from app.orders.totals import mark_for_update
+        mark_for_update(postponed_order)
         self.delete()
         return postponed_order_product
     
@@ -191,11 +197,27 @@ class OrderProduct(db.Model, BaseModel): # type: ignore
             when_created=datetime.now()
         ))
         if status == OrderProductStatus.unavailable:
-            self.suborder.order.update_total()
+            from app.orders.totals import mark_for_update
+            mark_for_update(self.suborder.order)
 
-    def to_dict(self):
-        res = order_product_model_preparing.send(self)
-        ext_model = reduce(lambda acc, i: {**acc, **i}, [i[1] for i in res], {})
+    @classmethod
+    def to_dict_list(cls, order_products) -> list[dict]:
+        '''Returns dictionary representations of the order products.
+        Module specific parts are collected for all order products at once'''
+        order_products = list(order_products)
+        extensions = cls.get_model_extensions(order_products)
+        return [op.to_dict(extension=extensions[op.id]) for op in order_products]
+
+    @staticmethod
+    def get_model_extensions(order_products: list[OrderProduct]) -> dict[int, dict]:
+        '''Returns module specific parts of dictionary representations
+        of the order products by order product ID'''
+        return get_model_extensions(order_product_list_model_preparing,
+                                    order_product_model_preparing, order_products)
+
+    def to_dict(self, extension=None):
+        ext_model = extension if extension is not None \
+            else self.get_model_extensions([self])[self.id]
         return {
             'id': self.id,
             'order_id': self.suborder.order_id if self.suborder else self.order_id,
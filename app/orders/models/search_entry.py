@@ -0,0 +1,108 @@
+'''
+Search index of sale orders and order products
+'''
+from __future__ import annotations
+from typing import Optional
+
+from sqlalchemy import Column, ForeignKey, Index, Integer, String, Text, func, select
+from sqlalchemy.dialects import mysql
+from sqlalchemy.dialects.mysql import match
+
+from app import db
+
+# Entries of a trigram are counted up to this number when the rarest trigram
+# of the term is looked for
+TRIGRAM_COUNT_LIMIT = 1000
+
+class SearchTrigram(db.Model): # type: ignore
+    '''Trigram of the search text of the order or order product.
+    Is used by databases without n-gram full-text search. Trigrams are compared
+    as binary strings, so ones differing by accent only don't collide'''
+    __tablename__ = 'search_trigrams'
+    __table_args__ = (Index('ix_search_trigrams_entity', 'kind', 'entity_id'),)
+
+    kind = Column(String(16), primary_key=True)
+    trigram = Column(String(3).with_variant(mysql.VARCHAR(3, collation='utf8mb4_bin'), 'mysql'),
+                     primary_key=True)
+    entity_id = Column(String(20), primary_key=True)
+
+class SearchEntryMixin:
+    '''Normalized text all free-text searchable values of the entity are
+    joined into. Entries are maintained by `app.orders.search`'''
+    kind: str
+    text = Column(Text)
+
+    @staticmethod
+    def normalize(*values) -> str:
+        '''Returns search text of the values'''
+        return ' '.join(str(value) for value in values if value).lower()
+
+    @staticmethod
+    def get_trigrams(text: str) -> set[str]:
+        '''Returns all trigrams of the text'''
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @classmethod
+    def match(cls, term: str):
+        '''Returns select of IDs of the entities, which search text contains
+        all words of the term. On MySQL candidates are found by the n-gram
+        full-text index, on other databases by the rarest trigram of the words.
+        Candidates are checked by substring
+
+        :param str term: text to search for'''
+        words = term.lower().split()
+        query = select(cls.id) # type: ignore
+        if db.engine.dialect.name == 'mysql':
+            # Words shorter than n-grams of the index aren't found by it
+            phrases = [phrase for phrase in (word.replace('"', '') for word in words)
+                       if len(phrase) > 1]
+            if len(phrases) > 0:
+                query = query.where(match(cls.text, against=' '.join(
+                    f'+"{phrase}"' for phrase in phrases)).in_boolean_mode())
+        else:
+            trigram = cls._get_rarest_trigram(words)
+            if trigram is not None:
+                query = query.where(cls.id.in_( # type: ignore
+                    select(SearchTrigram.entity_id).where(
+                        SearchTrigram.kind == cls.kind, SearchTrigram.trigram == trigram)))
+        for word in words:
+            query = query.where(cls.text.like(f'%{word}%'))
+        return query
+
+    @classmethod
+    def _get_rarest_trigram(cls, words: list[str]) -> Optional[str]:
+        '''Returns the trigram of the words, which is found in the fewest entries.
+        Entries are counted up to `TRIGRAM_COUNT_LIMIT` so common trigrams
+        don't cost a scan of the whole index'''
+        trigrams = sorted(set().union(*[cls.get_trigrams(word) for word in words]))
+        if len(trigrams) == 0:
+            return None
+        counts = db.session.execute(select(*[
+            select(func.count()).select_from(
+                select(SearchTrigram.entity_id)
+                .where(SearchTrigram.kind == cls.kind, SearchTrigram.trigram == trigram)
+                .limit(TRIGRAM_COUNT_LIMIT).subquery()
+            ).scalar_subquery()
+            for trigram in trigrams])).one()
+        return min(zip(counts, trigrams))[1]
+
+class OrderSearchEntry(db.Model, SearchEntryMixin): # type: ignore
+    '''Search text of the sale order'''
+    __tablename__ = 'order_search'
+    __table_args__ = (Index('ix_order_search_text', 'text', mysql_prefix='FULLTEXT',
+                            mysql_with_parser='ngram'),)
+    kind = 'order'
+
+    id = Column(String(16), ForeignKey('orders.id', ondelete='CASCADE', onupdate='CASCADE'),
+                primary_key=True)
+
+class OrderProductSearchEntry(db.Model, SearchEntryMixin): # type: ignore
+    '''Search text of the order product'''
+    __tablename__ = 'order_product_search'
+    __table_args__ = (Index('ix_order_product_search_text', 'text', mysql_prefix='FULLTEXT',
+                            mysql_with_parser='ngram'),)
+    kind = 'order_product'
+
+    id = Column(Integer, ForeignKey('order_products.id', ondelete='CASCADE'),
+                primary_key=True)
+    order_id = Column(String(16), index=True)
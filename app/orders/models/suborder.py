@@ -9,13 +9,14 @@ from typing import Optional
 
 from flask import current_app
 
-from sqlalchemy import Column, DateTime, ForeignKey, Integer, String
+from sqlalchemy import Column, DateTime, ForeignKey, Integer, String, func
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
 from app import db
 from app.currencies.models.currency import Currency
 from app.models.base import BaseModel
+from app.models.sequence import Sequence
 import app.orders.models.order as o
 from app.products.models import Product
 
@@ -48,9 +49,8 @@ class Suborder(db.Model, BaseModel): #type: ignore
         self.order_id = order_id
 
         prefix = self.__id_pattern.format(order_num=order_id[4:16])
-        last_suborder = Suborder.query.filter_by(order_id=self.order_id).\
-            order_by(Suborder.seq_num.desc()).first()
-        self.seq_num = last_suborder.seq_num + 1 if last_suborder else 1
+        self.seq_num = seq_num if seq_num is not None \
+            else Suborder.allocate_seq_nums(order_id)[0]
         self.id = prefix + '{:03d}'.format(int(self.seq_num))
 
         # Set the relationship after id is computed so back_populates cascades
@@ -68,6 +68,20 @@ class Suborder(db.Model, BaseModel): #type: ignore
     def __repr__(self):
         return "<Suborder: {}>".format(self.id)
 
+    @classmethod
+    def allocate_seq_nums(cls, order_id: str, count: int=1) -> range:
+        '''Allocates sequential numbers for new suborders of the order.
+        Allocate all numbers at once when many suborders are created
+
+        :param str order_id: ID of the order to allocate suborder numbers for
+        :param int count: amount of numbers to allocate
+        :returns range: allocated numbers'''
+        def get_last_seq_num():
+            return db.session.query(func.max(Suborder.seq_num)). \
+                filter_by(order_id=order_id).scalar() or 0
+        return Sequence.allocate(cls.__id_pattern.format(order_num=order_id[4:16]),
+                                 count, get_last_seq_num, reserve=False)
+
     def get_total_weight(self):
         return reduce(
                 lambda acc, op: acc + op.product.weight * op.quantity,
@@ -139,7 +153,7 @@ class Suborder(db.Model, BaseModel): #type: ignore
             'subcustomer': f"{self.subcustomer.username}, {self.subcustomer.name}, {self.subcustomer.password}" \
                 if self.subcustomer else None,
             'buyout_date': self.buyout_date.strftime('%Y-%m-%d') if self.buyout_date else None,
-            'order_products': [op.to_dict() for op in self.order_products],
+            'order_products': OrderProduct.to_dict_list(self.order_products),
             'when_created': self.when_created.strftime('%Y-%m-%d %H:%M:%S') if self.when_created else None,
             'when_changed': self.when_changed.strftime('%Y-%m-%d %H:%M:%S') if self.when_changed else None
         }
@@ -152,16 +166,28 @@ class Suborder(db.Model, BaseModel): #type: ignore
             lambda op: not op.product.separate_shipping,
             self.get_order_products()))
         free_local_shipment_eligibility_amount = reduce(
-            calc_op_total, filter(
-                lambda op: not op.product.separate_shipping,
-                bulk_shipping_products
-            ), 0)
-        self.local_shipping = \
-            0 if len(bulk_shipping_products) == 0 \
+            calc_op_total, bulk_shipping_products, 0)
+        self.set_local_shipping(
+            len(bulk_shipping_products), free_local_shipment_eligibility_amount)
+        # db.session.commit()
+
+    def set_local_shipping(self, bulk_shipping_products_count: int,
+                           free_local_shipment_eligibility_amount: int) -> None:
+        '''Sets local shipping cost of the suborder. Local shipping is charged
+        when the suborder has products shipped in bulk and their total is below
+        the free local shipping threshold'''
+        self.local_shipping = self.get_local_shipping(
+            bulk_shipping_products_count, free_local_shipment_eligibility_amount)
+        self.when_changed = datetime.now()
+
+    @staticmethod
+    def get_local_shipping(bulk_shipping_products_count: int,
+                           free_local_shipment_eligibility_amount: int) -> int:
+        '''Returns local shipping cost of the suborder with provided figures'''
+        return \
+            0 if bulk_shipping_products_count == 0 \
             else current_app.config['LOCAL_SHIPPING_COST'] \
                 if free_local_shipment_eligibility_amount < \
                     current_app.config['FREE_LOCAL_SHIPPING_AMOUNT_THRESHOLD'] \
                 else 0
-        self.when_changed = datetime.now()
-        # db.session.commit()
 
@@ -19,20 +19,34 @@ from app.currencies.models import Currency
 from app.models import Country
 from app.orders import bp_api_admin, bp_api_user
 from app.orders.models.order import OrderBox
-from app.orders.validators.order import OrderEditValidator, OrderValidator
+from app.orders.validators.order import BulkOrderValidator, OrderEditValidator, \
+    OrderValidator
 from app.products.models import Product
 from app.shipping.models.shipping import Shipping, PostponeShipping
-from app.tools import cleanse_payload, prepare_datatables_query, modify_object, \
-    try_perform
+from app.tools import cleanse_payload, conditional_get, get_next_cursor, \
+    prepare_datatables_query, modify_object, try_perform
 
+from .. import bulk_import
 from ..models.order import Order
+from ..models.order_list_entry import OrderListEntry
 from ..models.order_product import OrderProduct, OrderProductStatus
 from ..models.order_status import OrderStatus
 from ..models.subcustomer import Subcustomer
 from ..models.suborder import Suborder
 
+from ..totals import mark_for_update, update_totals
 from ..utils import parse_subcustomer
 
+# Models sale orders' JSON is made of, including ones of the modules
+_ORDER_MODELS = [
+    Order, OrderBox, 'OrderParam', OrderListEntry, Suborder, OrderProduct, Product,
+    Subcustomer, 'User', Country, Shipping, 'PaymentMethod', 'Payment', 'Invoice',
+    'InvoiceItem', Currency, 'CurrencyHistoryEntry', 'PurchaseOrder', 'OrderPacker',
+    'OrderProductWarehouse',
+    # Outsiders are checked by the setting and the network
+    'Setting', 'Node'
+]
+
 def _create_po(order: Order, errors: list) -> None:
     from app.purchase.models import Company
     from app.purchase.po_manager import create_purchase_orders
@@ -70,11 +84,7 @@ def admin_delete_order(order_id):
             There is an invoice {order.invoice} assigned to the order <{order_id}>. 
             Can't delete order with invoice created""", status=409))
 
-    for suborder in order.suborders:
-        for op in suborder.order_products:
-            db.session.delete(op)
-        db.session.delete(suborder)
-    db.session.delete(order)
+    order.delete()
     db.session.commit()
     current_app.logger.warning(
         "Sale Order <%s> of customer <%s> created on <%s> is deleted by <%s>",
@@ -94,11 +104,7 @@ def user_delete_order(order_id):
     if order is None:
         abort(Response(f"No order <{order_id}> was found", status=404))
 
-    for suborder in order.suborders:
-        for op in suborder.order_products:
-            db.session.delete(op)
-        db.session.delete(suborder)
-    db.session.delete(order)
+    order.delete()
     db.session.commit()
     current_app.logger.warning(
         "Sale Order <%s> of customer <%s> created on <%s> is deleted by <%s>",
@@ -109,6 +115,7 @@ def user_delete_order(order_id):
 @bp_api_admin.route('/<order_id>')
 @login_required
 @roles_required('admin')
+@conditional_get(*_ORDER_MODELS)
 def admin_get_orders(order_id):
     ''' Returns all or selected orders in JSON '''
     orders = Order.query.filter(Order.status != OrderStatus.draft)
@@ -116,6 +123,8 @@ def admin_get_orders(order_id):
         orders = orders.filter_by(id=order_id)
         if orders.count() == 1:
             return jsonify(orders.first().to_dict(details=True))
+    elif request.values.get('draw') is not None: # Args were provided by DataTables
+        return filter_order_list(request.values)
     else:
         orders = orders.filter(not_(Order.id.like('%drft%')))
     if request.values.get('status'):
@@ -133,12 +142,12 @@ def admin_get_orders(order_id):
     # if orders.count() == 0:
     #     abort(Response("No orders were found", status=404))
     else:
-        return jsonify(
-            [entry.to_dict(details=request.values.get('details')) for entry in orders])
+        return jsonify(Order.to_dict_list(orders, details=request.values.get('details')))
 
 @bp_api_user.route('', defaults={'order_id': None})
 @bp_api_user.route('/<order_id>')
 @login_required
+@conditional_get(*_ORDER_MODELS)
 def user_get_orders(order_id):
     orders = Order.query
     if not current_user.has_role('admin'):
@@ -158,8 +167,7 @@ def user_get_orders(order_id):
     if orders.count() == 0:
         abort(Response("No orders were found", status=404))
     else:
-        return jsonify([entry.to_dict(details=request.values.get('details')) 
-                        for entry in orders])
+        return jsonify(Order.to_dict_list(orders, details=request.values.get('details')))
 
 def filter_orders(orders, filter_params):
     orders = orders.order_by(Order.purchase_date_sort)
@@ -170,7 +178,33 @@ def filter_orders(orders, filter_params):
         'draw': int(filter_params['draw']),
         'recordsTotal': records_total,
         'recordsFiltered': records_filtered,
-        'data': [entry.to_dict() for entry in orders]
+        'data': Order.to_dict_list(orders)
+    })
+
+def filter_order_list(filter_params):
+    '''Returns DataTables page of the denormalized orders list'''
+    entries = OrderListEntry.query.filter(not_(OrderListEntry.id.like('%drft%')))
+    if filter_params.get('status'):
+        entries = entries.filter(
+            OrderListEntry.status.in_(filter_params.getlist('status'))) # type: ignore
+    if filter_params.get('days'):
+        entries = entries.filter(
+            OrderListEntry.when_created >= datetime.now() - timedelta(days=int(filter_params['days'])))
+    if filter_params.get('user_id'):
+        entries = entries.filter_by(user_id=filter_params['user_id'])
+    entries = entries.order_by(OrderListEntry.purchase_date_sort)
+    keyset = [OrderListEntry.purchase_date_sort, OrderListEntry.id]
+    entries, records_total, records_filtered = prepare_datatables_query(
+        entries, filter_params, None, keyset
+    )
+    entries = entries.all()
+    return jsonify({
+        'draw': int(filter_params['draw']),
+        'recordsTotal': records_total,
+        'recordsFiltered': records_filtered,
+        'cursor': get_next_cursor(
+            entries, keyset, filter_params, records_total, records_filtered),
+        'data': [entry.to_dict() for entry in entries]
     })
 
 def _set_draft(order):
@@ -204,32 +238,8 @@ def user_create_order():
 
     payload: dict[str, Any] = request.get_json() #type: ignore
     result = {}
-    shipping = db.session.get(Shipping, payload['shipping'])
-    country = db.session.get(Country, payload['country'])
     with db.session.no_autoflush: # type: ignore
-        if current_user.currency_code:
-            user_currency_code = current_user.currency_code
-        else:
-            base = Currency.get_base_currency(current_app.config.get('TENANT_NAME', 'default'))
-            user_currency_code = base.code if base else None
-        order = Order(
-            user=current_user,
-            customer_name=payload['customer_name'],
-            address=payload['address'],
-            city_eng=payload['city_eng'],
-            country_id=payload['country'],
-            country=country,
-            zip=payload['zip'],
-            shipping=shipping,
-            phone=payload['phone'],
-            email=payload.get('email'),
-            comment=payload.get('comment'),
-            subtotal_base_currency=0,
-            user_currency_code=user_currency_code,
-            status=OrderStatus.pending,
-            when_created=datetime.now(),
-            service_fee=current_app.config.get('SERVICE_FEE', 0),
-        )
+        order = _new_order(payload)
         if 'draft' in payload.keys() and payload['draft']:
             order = _set_draft(order)
         logger.info("Order %s is created by %s with data: %s", order.id, 
@@ -243,7 +253,7 @@ def user_create_order():
             _set_shipping_params(order, payload['params']['shipping'])
         add_suborders(order, payload['suborders'], errors)
         try:
-            order.update_total()
+            update_totals([order])
         except NoShippingRateError:
             abort(Response("No shipping rate available", status=409))
 
@@ -291,23 +301,113 @@ def user_create_order():
         }
     return jsonify(result)
 
+def _new_order(payload: dict[str, Any]) -> Order:
+    '''Creates order of the current user from the order payload header'''
+    if current_user.currency_code:
+        user_currency_code = current_user.currency_code
+    else:
+        base = Currency.get_base_currency(current_app.config.get('TENANT_NAME', 'default'))
+        user_currency_code = base.code if base else None
+    return Order(
+        user=current_user,
+        customer_name=payload['customer_name'],
+        address=payload['address'],
+        city_eng=payload['city_eng'],
+        country_id=payload['country'],
+        country=db.session.get(Country, payload['country']),
+        zip=payload['zip'],
+        shipping=db.session.get(Shipping, payload['shipping']),
+        phone=payload['phone'],
+        email=payload.get('email'),
+        comment=payload.get('comment'),
+        subtotal_base_currency=0,
+        user_currency_code=user_currency_code,
+        status=OrderStatus.pending,
+        when_created=datetime.now(),
+        service_fee=current_app.config.get('SERVICE_FEE', 0),
+    )
+
+@bp_api_user.route('/bulk', methods=['POST'])
+@login_required
+def user_create_bulk_order():
+    '''Creates order from the flat list of order lines.
+    Accepts order details in payload. Each of `lines` has `subcustomer`,
+    `item_code`, `quantity` and optionally `line` attributes.
+    Lines, which can't be added, are skipped and returned in `errors`
+    '''
+    logger = current_app.logger.getChild('user_create_bulk_order')
+    with BulkOrderValidator(request) as validator:
+        if not validator.validate():
+            return Response(f"Couldn't create an Order\n{validator.errors}", status=409)
+    payload: dict[str, Any] = request.get_json() #type: ignore
+    with db.session.no_autoflush: # type: ignore
+        order = _new_order(payload)
+        db.session.add(order)
+        if payload.get('params') is not None and \
+           payload['params'].get('shipping') is not None:
+            _set_shipping_params(order, payload['params']['shipping'])
+        errors = bulk_import.add_suborders(
+            order, bulk_import.get_suborders(payload['lines']))
+        if len(order.suborders) == 0:
+            db.session.rollback()
+            return jsonify({
+                'status': 'error',
+                'message': "The order is empty. Please add at least one product.",
+                'errors': errors
+            }), 409
+        try:
+            update_totals([order])
+        except NoShippingRateError:
+            abort(Response("No shipping rate available", status=409))
+    db.session.commit()
+    logger.info("Order %s of %s lines is created by %s. %s lines are skipped",
+                order.id, len(payload['lines']), current_user, len(errors))
+    from ..signals import sale_order_created
+    sale_order_created.send(order, payload=payload)
+    return jsonify({
+        'status': 'warning' if len(errors) > 0 else 'success',
+        'order_id': order.id,
+        'errors': errors
+    })
+
+@bp_api_user.route('/import', methods=['POST'])
+@login_required
+def user_import_order_file():
+    '''Reads order from the uploaded order form spreadsheet or CSV file.
+    Returns order attributes found in the file, order lines,
+    which can be posted to the bulk order endpoint, and their products'''
+    file = request.files.get('file')
+    if file is None or not file.filename:
+        abort(Response("No file is provided", status=400))
+    try:
+        result = bulk_import.read_order_file(file.stream, file.filename)
+    except Exception as ex:
+        current_app.logger.getChild('user_import_order_file').warning(
+            "Couldn't read order file %s: %s", file.filename, ex)
+        abort(Response(f"Couldn't read the file <{file.filename}>", status=400))
+    return jsonify({
+        **result,
+        'suborders': bulk_import.get_suborders(result['lines']),
+        'products': bulk_import.get_products(result['lines'])
+    })
+
 def _set_shipping_params(order: Order, shipping_params):
     for k, v in shipping_params.items():
         order.params['shipping.' + k] = v
 
 def add_suborders(order, suborders, errors):
-    suborders_count = 0
-    for suborder_data in suborders:
-        suborder_data_subset = suborder_data.copy()
-        for index in range(0, len(suborder_data['items']), 10):
-            suborder_data_subset['items'] = suborder_data['items'][index:index + 10]
-            try:
-                _add_suborder(order, suborder_data_subset, errors)
-                try_perform(db.session.flush)
-                suborders_count += 1
-            except EmptySuborderError as ex:
-                errors.append(f"Suborder for <{ex.args[0]}> is empty. Skipped")
-    if suborders_count == 0:
+    try:
+        bulk_errors = bulk_import.add_suborders(
+            order, suborders, skip_invalid_subcustomers=False)
+    except SubcustomerParseError:
+        abort(Response(f"""Couldn't find subcustomer and provided data
+                        doesn't allow to create new one. Please provide
+                        new subcustomer data in format: 
+                        <ID>, <Name>, <Password>
+                        Erroneous data is: {[s['subcustomer'] for s in suborders]}""",
+                    status=400))
+    errors += [error.get('args', error['message']) for error in bulk_errors]
+    if len(order.suborders) == 0:
         abort(Response("The order is empty. Please add at least one product.", status=409))
 
 def _add_suborder(order, suborder_data, errors):
@@ -419,7 +519,7 @@ def user_save_order(order_id):
            payload['params'].get('shipping') is not None:
             _set_shipping_params(order, payload['params']['shipping'])
         try:
-            order.update_total()
+            update_totals([order])
         except NoShippingRateError:
             abort(Response("No shipping rate available", status=409))
 
@@ -538,7 +638,7 @@ def admin_save_order_product(order_product_id):
     order_product_saving.send(order_product, payload=payload)
     try:
         if order_product.need_to_update_total(payload):
-            order_product.suborder.order.update_total()
+            mark_for_update(order_product.suborder.order)
         db.session.commit()
         return jsonify(order_product.to_dict())
     except NoShippingRateError:
@@ -555,7 +655,7 @@ def user_delete_order_product(order_product_id):
         abort(Response(f"No order product <{order_product_id}> was found", status=404))
 
     order_product.delete()
-    order_product.suborder.order.update_total()
+    mark_for_update(order_product.suborder.order)
     db.session.commit()
 
     return jsonify({
@@ -612,7 +712,7 @@ def postpone_order_product(order_product_id):
     if not order_product:
         abort(Response(f"No product <{order_product_id}> was found", status=404))
     postponed_order_product = order_product.postpone()
-    order_product.suborder.order.update_total()
+    mark_for_update(order_product.suborder.order)
     db.session.commit()
     
     return jsonify({
@@ -660,7 +760,7 @@ def admin_save_order(order_id):
     modify_object(order, payload, ['tracking_id', 'tracking_url'])
     if order.need_to_update_total(payload):
         try:
-            order.update_total()
+            update_totals([order])
         except NoShippingRateError as ex:
             return jsonify({'error': f'No shipping rate available. {str(ex)}'})
     if payload.get('status'):
@@ -706,25 +806,10 @@ def get_order_products():
             OrderProduct.suborder.has(Suborder.order_id == request.values['order_id'])))
 
     if request.values.get('draw') is not None: # Args were provided by DataTables
-        filter_clause = f"%{request.values['search[value]']}%"
         order_products, records_total, records_filtered = prepare_datatables_query(
-            order_products, request.values,
-            or_(
-                OrderProduct.suborder.has(Suborder.order_id.like(filter_clause)), # type: ignore
-                OrderProduct.suborder.has(
-                    Suborder.subcustomer.has(
-                        Subcustomer.name.like(filter_clause))), # type: ignore
-                OrderProduct.suborder.has(
-                    Suborder.order.has(
-                        Order.customer_name.like(filter_clause))),
-                OrderProduct.product_id.like(filter_clause), # type: ignore
-                OrderProduct.product.has(Product.name.like(filter_clause)),
-                OrderProduct.product.has(Product.name_english.like(filter_clause)),
-                OrderProduct.product.has(Product.name_russian.like(filter_clause)),
-                OrderProduct.status == request.values['search[value]']
-            )
-        )
-        outcome = [entry.to_dict() for entry in order_products]
+            order_products, request.values, None, [OrderProduct.id])
+        order_products = order_products.all()
+        outcome = OrderProduct.to_dict_list(order_products)
         if not current_user.has_role('admin'):
             for entry in outcome:
                 entry.pop('private_comment', None)
@@ -732,13 +817,15 @@ def get_order_products():
             'draw': request.values['draw'],
             'recordsTotal': records_total,
             'recordsFiltered': records_filtered,
+            'cursor': get_next_cursor(order_products, [OrderProduct.id], request.values,
+                                      records_total, records_filtered),
             'data': outcome
         })
     order_products = order_products.limit(100)
     if order_products.count() == 0:
         abort(Response("No order products were fond", status=404))
 
-    outcome = [entry.to_dict() for entry in order_products]
+    outcome = OrderProduct.to_dict_list(order_products)
     if not current_user.has_role('admin'):
         for entry in outcome:
             entry.pop('private_comment', None)
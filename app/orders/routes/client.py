@@ -2,13 +2,14 @@
 import itertools
 import json
 import os
+from typing import IO
 from flask import Response, abort, current_app, request, render_template, send_file
 from flask.globals import current_app
 from flask_security import current_user, login_required, roles_required
 from markupsafe import escape
-import openpyxl
+from sqlalchemy.orm import selectinload
 
-from app import db
+from app import db, excel
 from app.orders import bp_client_admin, bp_client_user
 from app.currencies.models import Currency
 from app.models.country import Country
@@ -154,9 +155,10 @@ def admin_get_distribution_list():
     url = request.values.get('url', '')
     tracking_url = request.values.get('tracking_url', '')
     # applicable_shipping_ids = current_app.config.get('DISTRIBUTION_LIST_SHIPPING_IDS', [])
-    orders: list[Order] = Order.query.filter(Order.id.in_(order_ids))
-        # .filter(Order.shipping_id.in_(applicable_shipping_ids)) \
-        # .all()
+    # .filter(Order.shipping_id.in_(applicable_shipping_ids))
+    orders: list[Order] = Order.query.filter(Order.id.in_(order_ids)) \
+        .options(selectinload(Order.boxes), selectinload(Order.country)) \
+        .all()
     try:
         file = _get_dl_excel(orders, url)
         for order in orders:
@@ -171,24 +173,28 @@ def admin_get_distribution_list():
         abort(Response(
             f"Couldn't generate a distribution list Excel due to following error: {';'.join(ex.args)}"))
 
-def _get_dl_excel(orders: list[Order], url: str = ''):
+def _get_dl_excel(orders: list[Order], url: str = '') -> IO[bytes]:
     ''' Generates a distribution list Excel file for given orders '''
-    from openpyxl.utils import get_column_letter
-    from io import BytesIO
-
     package_path = os.path.dirname(__file__) + '/..'
-    dl_wb = openpyxl.open(f'{package_path}/templates/distribution_list.xlsx')
-    ws = dl_wb['список']
-    if ws is None:
-        raise OrderError("Couldn't open the distribution list Excel template")
+    try:
+        template = excel.get_template(
+            f'{package_path}/templates/distribution_list.xlsx', 'список', rows=2)
+    except KeyError as ex:
+        raise OrderError("Couldn't open the distribution list Excel template") from ex
+    dl_wb, ws = template.new_sheet(row_height=template.row_heights.get(2))
+    template.write_header(ws, {
+        'C1': f'=SUM(C2:C{len(orders) + 1})',
+        'E1': f'=SUM(E2:E{len(orders) + 1})'
+    }, rows=1)
 
-    for i, order in enumerate(orders):
+    for order in orders:
         address = f'{order.customer_name}\n' \
                 f'{order.email or ""} ' \
                 f'{order.phone}\n' \
                 f'{order.address} {order.zip} {order.city_eng}\n' \
                 f'{order.country.name}'
-        row = [
+        # The template row 2 is a sample of the order row
+        template.append_row(ws, [
             order.country.name,
             address,
             len(order.boxes) or 1,
@@ -201,18 +207,8 @@ def _get_dl_excel(orders: list[Order], url: str = ''):
             '',
             address,
             url
-        ]
-        ws.append(row)
-    ws.delete_rows(2, 1)  # remove template row
-
-    # for col_num, _ in enumerate(headers, 1):
-    #     column_letter = get_column_letter(col_num)
-    #     ws.column_dimensions[column_letter].width = 15
-
-    file_stream = BytesIO()
-    dl_wb.save(file_stream)
-    file_stream.seek(0)
-    return file_stream            
+        ])
+    return excel.save(dl_wb)
 
 @bp_client_admin.route('/')
 @login_required
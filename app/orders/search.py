@@ -0,0 +1,184 @@
+'''
+Free-text search index of sale orders and order products.
+Search entries are refreshed once per unit of work, when the session is
+committed, for all orders and order products changed in it. On MySQL entries are
+searched by the n-gram full-text index, on other databases by their trigrams
+'''
+from __future__ import annotations
+from itertools import chain
+from typing import Iterable
+
+import click
+from flask.cli import with_appcontext
+from more_itertools import chunked
+from sqlalchemy import delete, event, insert, inspect, or_, select
+from sqlalchemy.orm import selectinload
+
+from app import db
+
+from .models.order import LIST_BATCH_SIZE, Order
+from .models.order_product import OrderProduct
+from .models.search_entry import OrderProductSearchEntry, OrderSearchEntry, \
+    SearchEntryMixin, SearchTrigram
+from .models.suborder import Suborder
+
+# Keys of the session info, which hold IDs of entities to refresh search entries for
+_ORDERS_TO_REFRESH = 'orders_to_refresh_search'
+_ORDER_PRODUCTS_TO_REFRESH = 'order_products_to_refresh_search'
+_ORDERS_PRODUCTS_TO_REFRESH = 'orders_products_to_refresh_search'
+
+def refresh_orders(order_ids: Iterable[str]) -> None:
+    '''Brings search entries of the orders in line with them.
+    Entries of deleted orders are removed
+
+    :param Iterable[str] order_ids: IDs of the orders to refresh search entries for'''
+    for batch in chunked({order_id for order_id in order_ids if order_id is not None},
+                         LIST_BATCH_SIZE):
+        orders = db.session.execute(
+            select(Order).where(Order.id.in_(batch)).options(selectinload(Order.user))
+        ).scalars().all()
+        _update_entries(OrderSearchEntry, batch, {
+            order.id: OrderSearchEntry.normalize(
+                order.id, order.customer_name, order.user.username if order.user else None,
+                order.comment, getattr(order.status, 'name', order.status),
+                order.tracking_id)
+            for order in orders})
+
+def _get_order_product_ids(order_ids: Iterable[str]) -> set[int]:
+    '''Returns IDs of the orders' products including ones, which have search entries only'''
+    result: set[int] = set()
+    for batch in chunked({order_id for order_id in order_ids if order_id is not None},
+                         LIST_BATCH_SIZE):
+        result.update(db.session.execute(select(OrderProduct.id).where(or_(
+            OrderProduct.order_id.in_(batch),
+            OrderProduct.suborder.has(Suborder.order_id.in_(batch))))).scalars())
+        result.update(db.session.execute(select(OrderProductSearchEntry.id).where(
+            OrderProductSearchEntry.order_id.in_(batch))).scalars())
+    return result
+
+def refresh_order_products(order_product_ids: Iterable[int]) -> None:
+    '''Brings search entries of the order products in line with them.
+    Entries of deleted order products are removed
+
+    :param Iterable[int] order_product_ids: IDs of the order products
+        to refresh search entries for'''
+    for batch in chunked({op_id for op_id in order_product_ids if op_id is not None},
+                         LIST_BATCH_SIZE):
+        order_products = db.session.execute(
+            select(OrderProduct).where(OrderProduct.id.in_(batch)).options(
+                selectinload(OrderProduct.product),
+                selectinload(OrderProduct.suborder).selectinload(Suborder.order),
+                selectinload(OrderProduct.suborder).selectinload(Suborder.subcustomer))
+        ).scalars().all()
+        order_ids = {}
+        texts = {}
+        for op in order_products:
+            order = op.suborder.order if op.suborder else None
+            order_ids[op.id] = order.id if order else op.order_id
+            texts[op.id] = OrderProductSearchEntry.normalize(
+                order_ids[op.id], order.customer_name if order else None,
+                op.suborder.subcustomer.name \
+                    if op.suborder and op.suborder.subcustomer else None,
+                op.product_id,
+                *([op.product.name, op.product.name_english, op.product.name_russian]
+                  if op.product else []),
+                getattr(op.status, 'name', op.status))
+        _update_entries(OrderProductSearchEntry, batch, texts,
+                        lambda entry: setattr(entry, 'order_id', order_ids[entry.id]))
+
+def _update_entries(entry_type: type[SearchEntryMixin], ids: list, texts: dict,
+                    update_entry=lambda entry: None) -> None:
+    '''Sets search texts of the entries. Entries of IDs, which have no texts, are removed'''
+    entries = {entry.id: entry for entry in db.session.execute(
+        select(entry_type).where(entry_type.id.in_(ids))).scalars()} # type: ignore
+    changed = []
+    for entity_id in ids:
+        entry = entries.get(entity_id)
+        if entity_id not in texts:
+            if entry is not None:
+                db.session.delete(entry)
+            changed.append(entity_id)
+            continue
+        if entry is None:
+            entry = entry_type(id=entity_id) # type: ignore
+            db.session.add(entry)
+        update_entry(entry)
+        if entry.text != texts[entity_id]:
+            entry.text = texts[entity_id]
+            changed.append(entity_id)
+    if len(changed) == 0 or db.engine.dialect.name == 'mysql':
+        return
+    db.session.execute(delete(SearchTrigram).where(
+        SearchTrigram.kind == entry_type.kind,
+        SearchTrigram.entity_id.in_([str(entity_id) for entity_id in changed])))
+    trigrams = [{'kind': entry_type.kind, 'trigram': trigram, 'entity_id': str(entity_id)}
+                for entity_id in changed if entity_id in texts
+                for trigram in entry_type.get_trigrams(texts[entity_id])]
+    for batch in chunked(trigrams, LIST_BATCH_SIZE):
+        db.session.execute(insert(SearchTrigram), batch)
+
+def refresh_marked() -> None:
+    '''Refreshes search entries of all orders and order products marked
+    for refresh right away'''
+    order_ids = db.session.info.pop(_ORDERS_TO_REFRESH, set())
+    order_product_ids = db.session.info.pop(_ORDER_PRODUCTS_TO_REFRESH, set()) \
+        | _get_order_product_ids(db.session.info.pop(_ORDERS_PRODUCTS_TO_REFRESH, set()))
+    if len(order_ids) > 0:
+        refresh_orders(order_ids)
+    if len(order_product_ids) > 0:
+        refresh_order_products(order_product_ids)
+
+def rebuild() -> int:
+    '''Refreshes search entries of all orders and order products.
+    Each batch is committed separately
+
+    :returns int: number of processed orders'''
+    order_ids = set(db.session.execute(select(Order.id)).scalars()) \
+        | set(db.session.execute(select(OrderSearchEntry.id)).scalars())
+    for batch in chunked(sorted(order_ids), LIST_BATCH_SIZE):
+        refresh_orders(batch)
+        refresh_order_products(_get_order_product_ids(batch))
+        db.session.commit()
+    return len(order_ids)
+
+@click.command('rebuild-search-index')
+@with_appcontext
+def rebuild_command():
+    '''Rebuilds the free-text search index of orders and order products'''
+    click.echo(f"{rebuild()} orders are processed")
+
+# IDs of new order products are known only after flush
+@event.listens_for(db.session, 'after_flush')
+def _on_after_flush(session, _flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Order):
+            # Entries of a renamed draft order are stored by its old ID
+            old_ids = inspect(instance).attrs.id.history.deleted or []
+            session.info.setdefault(_ORDERS_TO_REFRESH, set()).update(
+                [instance.id, *old_ids])
+            # Order products' entries contain the customer name and the order ID
+            if instance in session.deleted or len(old_ids) > 0 \
+                    or inspect(instance).attrs.customer_name.history.has_changes():
+                session.info.setdefault(_ORDERS_PRODUCTS_TO_REFRESH, set()).update(
+                    [instance.id, *old_ids])
+        elif isinstance(instance, Suborder):
+            session.info.setdefault(_ORDERS_PRODUCTS_TO_REFRESH, set()).add(instance.order_id)
+        elif isinstance(instance, OrderProduct):
+            session.info.setdefault(_ORDER_PRODUCTS_TO_REFRESH, set()).add(instance.id)
+
+@event.listens_for(db.session, 'before_commit')
+def _on_before_commit(session):
+    # The commit flushes pending changes only after this hook. They are flushed
+    # here as IDs of new order products are known only after flush
+    if any(isinstance(instance, (Order, Suborder, OrderProduct))
+           for instance in chain(session.new, session.dirty, session.deleted)):
+        session.flush()
+    if any(session.info.get(key) for key in
+           (_ORDERS_TO_REFRESH, _ORDER_PRODUCTS_TO_REFRESH, _ORDERS_PRODUCTS_TO_REFRESH)):
+        refresh_marked()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _on_after_soft_rollback(session, _previous_transaction):
+    session.info.pop(_ORDERS_TO_REFRESH, None)
+    session.info.pop(_ORDER_PRODUCTS_TO_REFRESH, None)
+    session.info.pop(_ORDERS_PRODUCTS_TO_REFRESH, None)
@@ -3,6 +3,11 @@ from app import signals
 
 # The signal is sent when JSON of SO is generated
 sale_order_model_preparing = signals.signal("sale_order.sale_order_model.preparing")
+# The signal is sent once when JSON of a list of SOs is generated. The argument is
+# the list of SOs. Receivers return module specific parts of SOs by SO ID
+sale_order_list_model_preparing = signals.signal(
+    "sale_order.sale_order_model.list_preparing"
+)
 # The signal is sent when SO create request is received after the SO is created
 # The argument is SO object and creation payload in JSON
 sale_order_created = signals.signal("sale_order.created")
@@ -20,15 +25,23 @@ user_create_sale_order_rendering = signals.signal(
 order_product_model_preparing = signals.signal(
     "sale_order.order_product_model.preparing"
 )
+# The signal is sent once when JSON of a list of order products is generated.
+# The argument is the list of order products. Receivers return module specific
+# parts of order products by order product ID
+order_product_list_model_preparing = signals.signal(
+    "sale_order.order_product_model.list_preparing"
+)
 order_product_saving = signals.signal("sale_order.order_product.saving")
 
 __all__ = [
     admin_order_products_rendering,
+    order_product_list_model_preparing,
     order_product_model_preparing,
     order_product_saving,
     sale_order_created,
     sale_order_packed,
     sale_order_shipped,
+    sale_order_list_model_preparing,
     sale_order_model_preparing,
     user_create_sale_order_rendering,
 ]
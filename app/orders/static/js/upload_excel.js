@@ -1,6 +1,3 @@
-var urlXLSX = "https://cdnjs.cloudflare.com/ajax/libs/xlsx/0.8.0/xlsx.js";
-var urlJSZIP = "https://cdnjs.cloudflare.com/ajax/libs/xlsx/0.8.0/jszip.js";
-
 var order_product_number = 0;
 
 $(document).ready(() => {
@@ -15,87 +12,48 @@ $(document).ready(() => {
 });
 
 function read_file(file) {
-    const reader = new FileReader();
-    reader.onload = async function(event) {
-        modals_off();
-        await load_excel(event.target.result)
-        modals_on();
-    };
-    reader.readAsBinaryString(file)
+    var data = new FormData();
+    data.append('file', file);
+    $.ajax({
+        url: '/api/v1/order/import',
+        method: 'post',
+        data: data,
+        processData: false,
+        contentType: false,
+        success: async order => {
+            modals_off();
+            await load_order(order);
+            modals_on();
+        },
+        error: response => {
+            $('.wait').hide();
+            modal("Load order", response.responseText);
+        }
+    });
 }
 
-async function load_excel(data) {
+async function load_order(order) {
     cleanup();
-    var wb;
-    try {
-        var wb = XLSX.read(data, { type: 'binary' });
-    } catch (e) {
-        alert("Some error: " + e);
+    if (order.customer_name) {
+        $('#name').val(order.customer_name);
     }
-    var ws = wb.Sheets['Бланк'];
-    var current_node;
-    var item;
-
-    var countries = {
-        0: 'korea',
-        1: 'ru',
-        2: 'ua',
-        3: 'in',
-        4: 'au',
-        5: 'br',
-        6: 'ca',
-        7: 'cn',
-        8: 'fr',
-        9: 'de',
-        10: 'hk',
-        11: 'id',
-        12: 'jp',
-        13: 'my',
-        14: 'nz',
-        15: 'ph',
-        16: 'sg',
-        17: 'es',
-        18: 'tw',
-        19: 'th',
-        20: 'gb',
-        21: 'us',
-        22: 'vn',
-        23: 'zone1',
-        24: 'zone2',
-        25: 'zone3',
-        26: 'zone4',
-        27: 'kz', // Cargo,
-        28: 'uz', // Cargo
-        29: 'kz' // Russia ????
-    };
-
-    $('#name').val(ws['B5'].v);
-    $('#address').val(ws['B6'].v);
-    $('#phone').val(ws['B7'].v);
-    $('#country').val(countries[ws['L2'].v]);
-    await update_shipping_methods(countries[ws['L2'].v], 0);
-
-    if (ws['L2'].v == 0) {
-        $('#shipping').val(4); // No shipping
-    } else {
-        // console.log("Country: ", $('#country').val());
-        // console.log("L1: ", ws['L1'].v);
-        // console.log("Shipping before: ", $('#shipping').val());
-        // console.log("Shipping methods:", $('#shipping')[0].options)
-        if (ws['L2'].v == 27) {
-            $('#shipping').val(3);
-        } else if (ws['L2'].v == 28) {
-            $('#shipping').val(3);
-        } else {
-            $('#shipping').val(ws['L1'].v);
-        }
-        // console.log("Shipping after:", $('#shipping').val());
+    if (order.address) {
+        $('#address').val(order.address);
     }
-    load_products(ws);
-
+    if (order.phone) {
+        $('#phone').val(order.phone);
+    }
+    if (order.country) {
+        $('#country').val(order.country);
+        await update_shipping_methods(order.country, 0);
+    }
+    if (order.shipping) {
+        $('#shipping').val(order.shipping);
+    }
+    load_products(order.suborders, order.products);
 }
 
-async function add_product(current_node, item, product_id, quantity) {
+async function add_product(current_node, item, product_id, quantity, product) {
     if (item) {
         var button = $('input[id^=add_userItem]', current_node).attr('id');
         add_product_row(button);
@@ -104,7 +62,13 @@ async function add_product(current_node, item, product_id, quantity) {
     item_code_node.val(product_id);
     $('input.item-quantity', current_node).last().val(quantity);
     order_product_number++;
-    await get_product(item_code_node[0], true);
+    if (product) {
+        await update_product(item_code_node.closest('tr')[0], {...product}, true);
+    } else if (product_id) {
+        item_code_node.attr('title', 'No product was found');
+        item_code_node.addClass('is-invalid');
+        item_code_node.removeClass('is-valid');
+    }
 
     order_product_number--;
     if (!order_product_number) {
@@ -118,40 +82,27 @@ function cleanup() {
     delete_subcustomer($('.btn-delete'));
 }
 
-function load_products(ws) {
-    for (var i = 12; i <= 2000; i++) {
-        // Line is beginning of a new subcustomer but no subcustomer data provided
-        // it means no new entries in the file
-        if (ws['A' + i] && /^\d+$/.test(ws['A' + i].v) && !ws['B' + i]) break;
-        // Just empty line. Ignored
-        if (!ws['A' + i]) continue;
-        // The line is beginning of new subcustomer
-        if (/^\d+$/.test(ws['A' + i].v) && ws['B' + i] && !ws['D' + i]) {
-            current_node = add_subcustomer(ws['B' + i].v);
-            $('.subcustomer-seq-num', current_node).val(ws['A' + i].v);
-            item = 0;
-        // The line is product line
-        } else {
-            var quantity;
-            if (ws['D' + i]) {
-                quantity = parseInt(ws['D' + i].v);
-            } else {
-                quantity = 0;
-            }
-            if (isNaN(quantity)) {
-                quantity = 0;
-            }
-            if (typeof current_node === "undefined") {
-                modals_on();
-                modal("Load order", 
-                    "Couldn't load order from the Excel spreadsheet. " +
-                    "No first subcustomer was identified");
-                $('.wait').hide();
-                return null;
-            }
-            add_product(current_node, item, ws['A' + i].v, quantity);
+function load_products(suborders, products) {
+    if (suborders.length && !suborders[0].subcustomer) {
+        modals_on();
+        modal("Load order", 
+            "Couldn't load order from the file. " +
+            "No first subcustomer was identified");
+        $('.wait').hide();
+        return null;
+    }
+    for (var suborder of suborders) {
+        var current_node = add_subcustomer(suborder.subcustomer);
+        var item = 0;
+        for (var line of suborder.items) {
+            var quantity = parseInt(line.quantity);
+            add_product(current_node, item, line.item_code, isNaN(quantity) ? 0 : quantity,
+                        products[String(line.item_code)]);
             item++;
         }
-    }      
-    update_grand_subtotal();      
-}
\ No newline at end of file
+    }
+    if (!suborders.length) {
+        $('.wait').hide();
+    }
+    update_grand_subtotal();
+}
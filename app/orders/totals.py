@@ -0,0 +1,198 @@
+'''
+Set-based calculation of sale orders totals.
+Figures of all suborders of the requested orders are aggregated by the database
+with grouped queries instead of walking every order product and its product.
+Orders can be marked for recalculation in which case their totals are
+recalculated once per unit of work, when the session is committed
+'''
+from __future__ import annotations
+import logging
+from typing import Any, Iterable, NamedTuple
+
+from more_itertools import chunked
+from sqlalchemy import and_, case, event, func, inspect, or_, select
+from sqlalchemy.orm import selectinload
+
+from app import db
+from app.currencies.models.currency import Currency
+from app.products.models.product import Product
+from common.exceptions import NoShippingRateError
+
+from .models.order import LIST_BATCH_SIZE, Order
+from .models.order_product import OrderProduct, OrderProductStatus
+from .models.suborder import Suborder
+
+# Key of the session info, which holds orders marked for totals recalculation
+_ORDERS_TO_UPDATE = 'orders_to_update_totals'
+
+class SuborderTotals(NamedTuple):
+    '''Aggregated figures of the suborder's available order products'''
+    subtotal: int = 0
+    weight: int = 0
+    bulk_shipping_products_count: int = 0
+    free_local_shipment_eligibility_amount: int = 0
+
+def get_suborders_totals(order_ids: list[str]) -> dict[str, SuborderTotals]:
+    '''Returns aggregated figures of all suborders of the orders with one query
+
+    :param list[str] order_ids: IDs of the orders which suborders are aggregated
+    :returns dict[str, SuborderTotals]: figures of the suborders by suborder ID'''
+    op_total = OrderProduct.price * OrderProduct.quantity
+    is_bulk_shipping = and_(OrderProduct.id != None,
+                            Product.separate_shipping.is_not(True))
+    rows = db.session.execute(
+        select(Suborder.id,
+               func.coalesce(func.sum(op_total), 0),
+               func.coalesce(func.sum(Product.weight * OrderProduct.quantity), 0),
+               func.count(case((is_bulk_shipping, OrderProduct.id))),
+               func.coalesce(func.sum(case((is_bulk_shipping, op_total))), 0))
+        .outerjoin(OrderProduct, and_(
+            OrderProduct.suborder_id == Suborder.id,
+            or_(OrderProduct.status == None,
+                OrderProduct.status != OrderProductStatus.unavailable)))
+        .outerjoin(Product, OrderProduct.product_id == Product.id)
+        .where(Suborder.order_id.in_(order_ids))
+        .group_by(Suborder.id)
+    )
+    return {row[0]: SuborderTotals(*[int(value) for value in row[1:]]) for row in rows}
+
+def update_totals(orders: Iterable[Order]) -> None:
+    '''Recomputes totals of the orders and local shipping of their suborders.
+    Does the same as `Order.update_total()` but the order products' figures
+    are aggregated by the database for all orders at once.
+    Pending changes of the session are flushed before calculation
+
+    :param Iterable[Order] orders: orders to update totals for
+    :raises NoShippingRateError: if shipping cost of any order can't be calculated'''
+    orders = list(orders)
+    if len(orders) == 0:
+        return
+    db.session.flush()
+    for batch in chunked(orders, LIST_BATCH_SIZE):
+        order_ids = [order.id for order in batch]
+        db.session.execute(
+            select(Order).where(Order.id.in_(order_ids)).options(
+                selectinload(Order.suborders),
+                selectinload(Order.attached_orders),
+                selectinload(Order.boxes),
+                selectinload(Order.shipping),
+                selectinload(Order.country),
+                selectinload(Order.user_currency))
+        ).scalars().all()
+        suborders_totals = get_suborders_totals(order_ids)
+        for order in batch:
+            order_weight = subtotal = 0
+            for suborder in order.suborders:
+                totals = suborders_totals.get(suborder.id, SuborderTotals())
+                suborder.set_local_shipping(
+                    totals.bulk_shipping_products_count,
+                    totals.free_local_shipment_eligibility_amount)
+                order_weight += totals.weight
+                subtotal += totals.subtotal + suborder.local_shipping
+            order._apply_totals(order_weight, subtotal)
+
+def get_missing_totals(orders: Iterable[Order]) -> dict[str, dict[str, Any]]:
+    '''Calculates totals of the orders, which totals aren't stored yet.
+    The orders aren't changed so the calculation has no side effects.
+    Stored totals are filled by `backfill_missing_totals()`
+
+    :param Iterable[Order] orders: orders to calculate missing totals for
+    :returns dict[str, dict[str, Any]]: calculated totals by order ID.
+        Orders, which totals are stored, are omitted'''
+    orders = list(orders)
+    no_totals = [order for order in orders if not order.total_base_currency]
+    suborders_totals = get_suborders_totals([order.id for order in no_totals]) \
+        if len(no_totals) > 0 else {}
+    result = {}
+    for order in no_totals:
+        order_weight = subtotal = 0
+        for suborder in order.suborders:
+            totals = suborders_totals.get(suborder.id, SuborderTotals())
+            order_weight += totals.weight
+            subtotal += totals.subtotal + Suborder.get_local_shipping(
+                totals.bulk_shipping_products_count,
+                totals.free_local_shipment_eligibility_amount)
+        result[order.id] = order._calculate_totals(order_weight, subtotal)
+    for order in orders:
+        if order.total_base_currency and not order.total_user_currency \
+           and order.user_currency_code:
+            user_currency = db.session.get(Currency, order.user_currency_code)
+            if user_currency and not user_currency.base:
+                result[order.id] = {
+                    'total_user_currency': order.total_base_currency * user_currency.rate
+                }
+    return result
+
+def backfill_missing_totals() -> int:
+    '''Stores totals of all orders, which totals aren't stored yet.
+    Orders are processed in batches, each batch is committed separately
+
+    :returns int: number of orders, which totals were stored'''
+    logger = logging.getLogger('backfill_missing_totals')
+    order_ids = db.session.execute(
+        select(Order.id)
+        .outerjoin(Currency, Order.user_currency_code == Currency.code)
+        .where(or_(
+            Order.total_base_currency == None,
+            and_(Order.total_user_currency == None,
+                 Currency.base.is_not(True), Currency.code != None)))
+        .order_by(Order.id)
+    ).scalars().all()
+    fixed = 0
+    for batch in chunked(order_ids, LIST_BATCH_SIZE):
+        orders = db.session.execute(
+            select(Order).where(Order.id.in_(batch))).scalars().all()
+        no_totals = [order for order in orders if order.total_base_currency is None]
+        no_user_totals = get_missing_totals(
+            [order for order in orders if order.total_base_currency is not None])
+        _update_totals_safe(no_totals)
+        for order_id, totals in no_user_totals.items():
+            db.session.get(Order, order_id).total_user_currency = totals['total_user_currency']
+        fixed += len([order for order in no_totals if order.total_base_currency is not None]) \
+            + len(no_user_totals)
+        db.session.commit()
+    logger.info("Totals of %s orders out of %s are stored", fixed, len(order_ids))
+    return fixed
+
+def _update_totals_safe(orders: list[Order]) -> None:
+    '''Same as `update_totals()` but orders, which totals can't be
+    calculated, are left intact'''
+    try:
+        with db.session.begin_nested():
+            update_totals(orders)
+    except NoShippingRateError:
+        for order in orders:
+            try:
+                with db.session.begin_nested():
+                    update_totals([order])
+            except NoShippingRateError:
+                logging.getLogger('backfill_missing_totals').warning(
+                    "No shipping rate is available for %s", order.id)
+
+def mark_for_update(order: Order) -> None:
+    '''Marks the order for totals recalculation. Totals of all marked orders
+    are recalculated once when the session is committed. Use `update_marked_totals()`
+    if recalculated totals are needed before commit
+
+    :param Order order: order to recalculate totals for'''
+    db.session.info.setdefault(_ORDERS_TO_UPDATE, set()).add(order)
+
+def update_marked_totals() -> None:
+    '''Recalculates totals of all orders marked for recalculation right away
+
+    :raises NoShippingRateError: if shipping cost of any order can't be calculated'''
+    orders = db.session.info.pop(_ORDERS_TO_UPDATE, set())
+    if len(orders) == 0:
+        return
+    db.session.flush()
+    update_totals([order for order in orders
+                   if not (inspect(order).deleted or inspect(order).detached)])
+
+@event.listens_for(db.session, 'before_commit')
+def _on_before_commit(session):
+    if session.info.get(_ORDERS_TO_UPDATE):
+        update_marked_totals()
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _on_after_soft_rollback(session, _previous_transaction):
+    session.info.pop(_ORDERS_TO_UPDATE, None)
@@ -1,5 +1,6 @@
 '''Sale orders related useful functions'''
 from datetime import datetime
+from typing import Optional
 # import re
 
 from sqlalchemy.exc import DataError
@@ -7,16 +8,21 @@ from sqlalchemy.exc import DataError
 from common.exceptions import SubcustomerParseError
 from .models.subcustomer import Subcustomer
 
-def parse_subcustomer(subcustomer_data) -> tuple[Subcustomer, bool]:
+def parse_subcustomer(subcustomer_data,
+                      subcustomers: Optional[dict[str, Subcustomer]]=None
+                      ) -> tuple[Subcustomer, bool]:
     '''Returns a tuple of customer from raw data
     and indication whether customer is existing one or created
     
     :param str subcustomer_data: string in format <ID, Name, Password>
+    :param dict[str, Subcustomer] subcustomers: already loaded subcustomers by username.
+        If provided the subcustomer is looked up there instead of the database
     :returns tuple[Subcustomer, bool]: tuple of Subcustomer object and boolean indicating if it was created'''
     parts = subcustomer_data.split(',', 2)
     try:
         subcustomer = Subcustomer.query.filter(
-            Subcustomer.username == parts[0].strip()).first()
+            Subcustomer.username == parts[0].strip()).first() \
+            if subcustomers is None else subcustomers.get(parts[0].strip())
         if subcustomer:
             if len(parts) >= 2 and subcustomer.name != parts[1].strip():
                 subcustomer.name = parts[1].strip()
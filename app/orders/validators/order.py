@@ -81,6 +81,21 @@ class OrderValidator(Inputs):
     def __exit__(self, *_args):
         del self
 
+class BulkOrderValidator(Inputs):
+    '''Validator for bulk order input. Order lines are validated
+    while being added so invalid ones are skipped'''
+    json = {
+        **{field: validators for field, validators in OrderValidator.json.items()
+           if field != 'suborders'},
+        'lines': [DataRequired("lines:Field is required")]
+    }
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, p1, p2, p3):
+        del self
+
 def _no_empty_field(_form, field):
     if field.data == '':
         raise ValidationError(f'{field.id}: Field is required')
@@ -3,7 +3,7 @@ import enum
 from functools import reduce
 import logging
 
-from sqlalchemy import Column, Enum, Numeric, ForeignKey, Integer, String, Text
+from sqlalchemy import Column, Enum, Numeric, ForeignKey, Integer, String, Text, update
 from sqlalchemy.orm import relationship
 from sqlalchemy.orm.attributes import InstrumentedAttribute
 
@@ -172,22 +172,31 @@ class Payment(db.Model, BaseModel):
         '''
         return self.payment_method.execute_payment(self)
 
+    @classmethod
+    def backfill_missing_amounts(cls) -> int:
+        '''Stores zero sent amount of payments, which don't have it stored yet
+
+        :returns int: number of updated payments'''
+        result = db.session.execute(
+            update(Payment).where(Payment.amount_sent_original == None)
+            .values(amount_sent_original=0))
+        db.session.commit()
+        return result.rowcount
+
     def to_dict(self, **kwargs):
         '''
         Get representation of the payment as dictionary for JSON conversion
         '''
-        if not self.amount_sent_original:
-            self.amount_sent_original = 0
-            db.session.commit() #type: ignore
+        amount_sent_original = self.amount_sent_original or 0
         return {
             'id': self.id,
             'orders': [order.id for order in self.orders],
             'user_id': self.user_id,
             'user_name': self.user.username,
             'sender_name': self.sender_name,
-            'amount_original': float(self.amount_sent_original),
-            'amount_sent_original': float(self.amount_sent_original),
-            'amount_sent_original_string': self.currency.format(self.amount_sent_original),
+            'amount_original': float(amount_sent_original),
+            'amount_sent_original': float(amount_sent_original),
+            'amount_sent_original_string': self.currency.format(amount_sent_original),
             'amount_krw': self.amount_sent_krw or 0,
             'amount_sent_krw': self.amount_sent_krw or 0,
             'amount_received_krw': self.amount_received_krw or 0,
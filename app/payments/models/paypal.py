@@ -1,5 +1,4 @@
 import re
-from app import db
 
 from . import PaymentMethod
 
@@ -11,9 +10,7 @@ class PayPal(PaymentMethod):
     
     def execute_payment(self, payment):
         from app.settings.models.setting import Setting
-        client_id = db.session.get(Setting, 'payment.paypal.client_id')
-        client_id = client_id.value if client_id is not None else None
-        client_id = client_id not in (None, '')
+        client_id = Setting.get('payment.paypal.client_id') not in (None, '')
         return {'url': '%s/paypal' % payment.id} if client_id else None
 
 #if response is not None:
@@ -24,7 +24,7 @@ from app.users.models.user import User
 
 from common.exceptions import PaymentNoReceivedAmountException, PaymentStatusTransitionError
 from app.tools import get_tmp_file_by_id, get_upload_path, modify_object, rm, write_to_file
-from app.tools import prepare_datatables_query, stream_and_close
+from app.tools import get_next_cursor, prepare_datatables_query, stream_and_close
 
 @bp_api_admin.route('', defaults={'payment_id': None})
 @bp_api_admin.route('/<int:payment_id>')
@@ -54,12 +54,15 @@ def admin_get_payments(payment_id):
 
 def filter_payments(payments, filter_params):
     payments, records_total, records_filtered = prepare_datatables_query(
-        payments, filter_params, None
+        payments, filter_params, None, [Payment.id]
     )
+    payments = payments.all()
     return jsonify({
         'draw': int(filter_params['draw']),
         'recordsTotal': records_total,
         'recordsFiltered': records_filtered,
+        'cursor': get_next_cursor(
+            payments, [Payment.id], filter_params, records_total, records_filtered),
         'data': [entry.to_dict() for entry in payments]
     })
 
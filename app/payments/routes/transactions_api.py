@@ -5,7 +5,7 @@ import re
 from flask import jsonify, request
 from flask_security import current_user, login_required, roles_required
 
-from app.tools import prepare_datatables_query
+from app.tools import get_next_cursor, prepare_datatables_query
 
 from app import db
 from .. import bp_api_admin, bp_api_user
@@ -31,12 +31,15 @@ def admin_get_transactions(transaction_id):
 
 def _filter_transactions(transactions, filter_params):
     transactions, records_total, records_filtered = prepare_datatables_query(
-        transactions, filter_params, None
+        transactions, filter_params, None, [Transaction.id]
     )
+    transactions = transactions.all()
     return jsonify({
         'draw': int(filter_params['draw']),
         'recordsTotal': records_total,
         'recordsFiltered': records_filtered,
+        'cursor': get_next_cursor(
+            transactions, [Transaction.id], filter_params, records_total, records_filtered),
         'data': [entry.to_dict() for entry in transactions]
     })
 
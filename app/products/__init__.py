@@ -8,7 +8,7 @@ bp_client_admin = Blueprint('products_client_admin', __name__, url_prefix='/admi
                             template_folder='templates')
 
 def register_blueprints(flask_app):
-    from . import routes
+    from . import routes, search
     flask_app.register_blueprint(bp_api_admin)
     flask_app.register_blueprint(bp_api_user)
     flask_app.register_blueprint(bp_client_admin)
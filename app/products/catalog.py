@@ -0,0 +1,43 @@
+'''
+Snapshot of the products catalog.
+The catalog is serialized to JSON and compressed once per version of products
+and stored in the cache, so it is served without querying products until
+products or their images are changed. The snapshot of a new version is built
+by the first request for it
+'''
+from __future__ import annotations
+import gzip
+from typing import NamedTuple
+
+from flask import current_app
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app import cache, db
+from app.models.file import File
+from app.tools import get_change_tag
+
+from .models.product import Product
+
+class CatalogSnapshot(NamedTuple):
+    '''Serialized catalog'''
+    tag: str
+    count: int
+    # JSON list of products compressed by gzip
+    data: bytes
+
+def get_snapshot() -> CatalogSnapshot:
+    '''Returns the snapshot of the current version of the catalog. The snapshot
+    is generated if there is none for the version'''
+    tag = get_change_tag(Product, File)
+    key = f"{current_app.config.get('TENANT_NAME')}:catalog:{tag}"
+    snapshot = cache.get(key)
+    if snapshot is None:
+        products = [
+            product.to_dict(details=False) for product in db.session.execute(
+                select(Product).options(selectinload(Product.image))).scalars()]
+        snapshot = CatalogSnapshot(
+            tag, len(products), gzip.compress(current_app.json.dumps(products).encode()))
+        cache.set(key, snapshot,
+                  timeout=current_app.config.get('CATALOG_SNAPSHOT_TIMEOUT', 86400))
+    return snapshot
@@ -2,10 +2,14 @@
 Product model
 '''
 from __future__ import annotations
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, UniqueConstraint
-from sqlalchemy.orm import relationship
+from typing import Iterable
 
-from app import db
+from more_itertools import chunked
+from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, UniqueConstraint, \
+    select
+from sqlalchemy.orm import relationship, validates
+
+from app import db, local_cache
 from app.models.base import BaseModel
 from app.models.file import File
 from app.shipping.models.shipping import Shipping
@@ -23,6 +27,8 @@ class Product(db.Model, BaseModel): #type: ignore
     __tablename__ = 'products'
 
     id = Column(String(16), primary_key=True)
+    # ID stripped of leading zeros. Products are looked up by it
+    normalized_id = Column(String(16), index=True)
     vendor_id = Column(String(16), index=True)
     name = Column(String(256), index=True)
     name_english = Column(String(256), index=True)
@@ -62,13 +68,35 @@ class Product(db.Model, BaseModel): #type: ignore
                 if column.key == 'purchase' \
             else base_filter.filter(column.like(part_filter))
 
+    @staticmethod
+    def get_shipping_mask(product_ids: Iterable[str]) -> int:
+        '''Returns the mask of shipping methods, which can ship all the products.
+        Bit number N of the mask is set if the shipping method with ID N can ship.
+        Products are found the same way `get_product_by_id()` does.
+        Unknown products can't be shipped by any method
+
+        :param Iterable[str] product_ids: IDs of the products
+        :returns int: the mask'''
+        masks = local_cache.get('product_shipping_masks')
+        mask = -1
+        for product_id in product_ids:
+            mask &= masks.get(Product.normalize_id(product_id), 0)
+        return mask
+
+    @validates('id')
+    def _validate_id(self, _key, value):
+        self.normalized_id = Product.normalize_id(value) if value is not None else None
+        return value
+
+    @staticmethod
+    def normalize_id(product_id: str) -> str:
+        '''Returns the product ID stripped of whitespaces and leading zeros'''
+        return product_id.strip().lstrip('0')
+
     @staticmethod
     def get_product_by_id(product_id):
-        stripped_id = product_id.lstrip('0')
-        product_query = Product.query. \
-            filter(Product.id.endswith(stripped_id)).all()
-        products = [product for product in product_query
-                        if product.id.lstrip('0') == stripped_id]
+        products = Product.query.filter_by(
+            normalized_id=Product.normalize_id(product_id)).all()
         if len(products) == 1:
             return products[0]
         elif len(products) == 0:
@@ -76,6 +104,21 @@ class Product(db.Model, BaseModel): #type: ignore
         else:
             raise Exception(f"More than one product was found by ID <{product_id}>")
 
+    @staticmethod
+    def get_products_by_ids(product_ids: Iterable[str]) -> dict[str, list[Product]]:
+        '''Finds products by IDs the same way `get_product_by_id()` does
+        but for all IDs at once
+
+        :param Iterable[str] product_ids: IDs of the products to find
+        :returns dict[str, list[Product]]: products found for each ID
+            stripped of leading zeros'''
+        normalized_ids = {Product.normalize_id(product_id) for product_id in product_ids}
+        result: dict[str, list[Product]] = {product_id: [] for product_id in normalized_ids}
+        for batch in chunked(sorted(normalized_ids), 500):
+            for product in Product.query.filter(Product.normalized_id.in_(batch)):
+                result[product.normalized_id].append(product)
+        return result
+
     def to_dict(self, details=False):
         result = {
             'id': self.id,
@@ -98,3 +141,20 @@ class Product(db.Model, BaseModel): #type: ignore
                 'shipping': [shipping.to_dict() for shipping in self.get_available_shipping()]
             }
         return result
+
+def _load_shipping_masks() -> dict[str, int]:
+    '''Returns masks of shipping methods allowed for each product.
+    Products without own shipping methods can be shipped by all of them'''
+    restricted: dict[str, int] = {}
+    for product_id, shipping_id in db.session.execute(
+            select(_products_shipping.c.product_id, _products_shipping.c.shipping_method_id)):
+        if shipping_id is not None:
+            restricted[product_id] = restricted.get(product_id, 0) | (1 << shipping_id)
+    masks: dict[str, int] = {}
+    # Products with the same normalized ID can be shipped by common methods only
+    for product_id, normalized_id in db.session.execute(
+            select(Product.id, Product.normalized_id)):
+        masks[normalized_id] = masks.get(normalized_id, -1) & restricted.get(product_id, -1)
+    return masks
+
+local_cache.register('product_shipping_masks', _load_shipping_masks, Product)
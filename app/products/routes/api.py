@@ -1,52 +1,60 @@
 from app.shipping.models.shipping import Shipping
 from datetime import datetime
 from decimal import Decimal
+import gzip
 
-from flask import Response, abort, jsonify, request
+from flask import Response, abort, current_app, jsonify, request
 from flask_security import login_required, roles_required
 
 from sqlalchemy import or_
 from sqlalchemy.exc import IntegrityError, OperationalError
+from sqlalchemy.orm import selectinload
 
 from app import db
-from app.products import bp_api_admin, bp_api_user
+from app.products import bp_api_admin, bp_api_user, catalog, search
 from app.products.models import Product
-from app.tools import modify_object, prepare_datatables_query
+from app.tools import conditional_get, get_next_cursor, modify_object, \
+    prepare_datatables_query
+
+# Number of products in a page of select lists
+_PAGE_SIZE = 100
 
 
 @bp_api_user.route('', defaults={'product_id': None})
 @bp_api_user.route('/<product_id>')
 @login_required
+@conditional_get(Product, 'File')
 def get_product(product_id):
-    '''Returns list of products in JSON'''
-    products = None
-    error_message = None
-    if product_id:
-        error_message = f"No product with code <{product_id}> was found"
-        stripped_id = product_id.lstrip('0')
-        products = Product.query.filter(Product.id.endswith(stripped_id))
-        products = [product for product in products
-                    if product.id.lstrip('0') == stripped_id]
-    else:
-        error_message = "There are no products in store now"
-        products = Product.query.all()
+    '''Returns list of products in JSON. The whole catalog is served
+    from its snapshot, compressed if the client accepts gzip'''
+    if product_id is None:
+        snapshot = catalog.get_snapshot()
+        if snapshot.count == 0:
+            abort(Response("There are no products in store now", status=404))
+        if 'gzip' in request.accept_encodings:
+            response = Response(snapshot.data, mimetype='application/json')
+            response.headers['Content-Encoding'] = 'gzip'
+        else:
+            response = Response(gzip.decompress(snapshot.data), mimetype='application/json')
+        response.vary.add('Accept-Encoding')
+        return response
+    products = Product.query.filter_by(
+        normalized_id=Product.normalize_id(product_id)).all()
     if len(products) != 0:
         return jsonify([product.to_dict(details=False) for product in products])
-    abort(Response(error_message, status=404))
+    abort(Response(f"No product with code <{product_id}> was found", status=404))
 
 
 @bp_api_user.route('/search/<term>')
 @login_required
 def get_product_by_term(term):
     '''
-    Returns list of products where product ID or name starts with provided value in JSON
+    Returns list of products where product ID or name starts with provided value in JSON.
+    Number of products is limited by `limit` argument or `PRODUCT_SEARCH_LIMIT`
     '''
-    product_query = Product.query.filter_by(available=True).filter(or_(
-        Product.id.like(term + '%'),
-        Product.name.like(term + '%'),
-        Product.name_english.like(term + '%'),
-        Product.name_russian.like(term + '%')))
-    return jsonify([product.to_dict(details=False) for product in product_query])
+    limit = request.args.get('limit', type=int) or \
+        current_app.config.get('PRODUCT_SEARCH_LIMIT', 50)
+    return jsonify(search.search(term, limit))
 
 
 @bp_api_admin.route('', defaults={'product_id': None})
@@ -76,12 +84,12 @@ def admin_get_product(product_id):
         ))
     if request.values.get('page') is not None:
         page = int(request.values['page'])
-        total_results = products.count()
-        products = products.offset((page - 1) * 100).limit(page * 100)
+        products = products.options(selectinload(Product.image)) \
+            .order_by(Product.id).offset((page - 1) * _PAGE_SIZE).limit(_PAGE_SIZE + 1).all()
         return jsonify({
-            'results': [entry.to_dict() for entry in products],
+            'results': [entry.to_dict() for entry in products[:_PAGE_SIZE]],
             'pagination': {
-                'more': total_results > page * 100
+                'more': len(products) > _PAGE_SIZE
             }
         })
 
@@ -89,14 +97,31 @@ def admin_get_product(product_id):
 
 
 def _filter_products(products, filter_params):
+    keyset = [Product.id]
     products, records_total, records_filtered = prepare_datatables_query(
-        products, filter_params, None
+        products.options(selectinload(Product.image),
+                         selectinload(Product.available_shipping)),
+        filter_params, None, keyset
     )
+    products = products.all()
+    # Products without own shipping methods can be shipped by all of them
+    all_shipping = None
+    data = []
+    for entry in products:
+        if len(entry.available_shipping) == 0 and all_shipping is None:
+            all_shipping = [shipping.to_dict() for shipping in Shipping.query]
+        data.append({
+            **entry.to_dict(),
+            'shipping': [shipping.to_dict() for shipping in entry.available_shipping]
+                if len(entry.available_shipping) > 0 else all_shipping
+        })
     return jsonify({
         'draw': int(filter_params['draw']),
         'recordsTotal': records_total,
         'recordsFiltered': records_filtered,
-        'data': [entry.to_dict(details=True) for entry in products]
+        'cursor': get_next_cursor(
+            products, keyset, filter_params, records_total, records_filtered),
+        'data': data
     })
 
 
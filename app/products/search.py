@@ -0,0 +1,74 @@
+'''
+Index for product autocomplete.
+Codes and names of available products are kept lowercased in a sorted array,
+so products, which codes or names start with a term, are found by binary
+search without querying the database. The index is kept in the process-local cache
+'''
+from __future__ import annotations
+from bisect import bisect_left
+from typing import Any, NamedTuple
+
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from app import db, local_cache
+from app.models.file import File
+
+from .models.product import Product
+
+# Ranks of matched keys. Products matched by code go first
+_RANK_ID = 0
+_RANK_NAME = 1
+
+class _SearchIndex(NamedTuple):
+    keys: list[str]
+    # Product ID and rank of each key
+    entries: list[tuple[str, int]]
+    # Serialized products by ID
+    products: dict[str, dict[str, Any]]
+
+def search(term: str, limit: int) -> list[dict[str, Any]]:
+    '''Returns available products, which code or any of names starts with
+    the term. Exact code matches go first, then code and name matches,
+    each ordered by length of the matched value
+
+    :param str term: beginning of the code or a name
+    :param int limit: maximal number of products to return
+    :returns list[dict[str, Any]]: serialized products'''
+    term = term.strip().casefold()
+    if not term:
+        return []
+    index: _SearchIndex = local_cache.get('product_search')
+    ranks: dict[str, tuple[int, int, int]] = {}
+    position = bisect_left(index.keys, term)
+    while position < len(index.keys) and index.keys[position].startswith(term):
+        key = index.keys[position]
+        product_id, rank = index.entries[position]
+        key_rank = (0 if key == term and rank == _RANK_ID else 1, rank, len(key))
+        if product_id not in ranks or key_rank < ranks[product_id]:
+            ranks[product_id] = key_rank
+        position += 1
+    return [index.products[product_id] for product_id in
+            sorted(ranks, key=lambda product_id: (ranks[product_id], product_id))[:limit]]
+
+def _build_index() -> _SearchIndex:
+    keyed_entries: list[tuple[str, str, int]] = []
+    products: dict[str, dict[str, Any]] = {}
+    for product in db.session.execute(
+            select(Product).where(Product.available == True)
+            .options(selectinload(Product.image))).scalars():
+        products[product.id] = product.to_dict(details=False)
+        keys = {(product.id.casefold(), _RANK_ID)}
+        if product.normalized_id:
+            keys.add((product.normalized_id.casefold(), _RANK_ID))
+        for name in (product.name, product.name_english, product.name_russian):
+            if name:
+                keys.add((name.strip().casefold(), _RANK_NAME))
+        keyed_entries.extend((key, product.id, rank) for key, rank in keys)
+    keyed_entries.sort()
+    return _SearchIndex(
+        [key for key, _, _ in keyed_entries],
+        [(product_id, rank) for _, product_id, rank in keyed_entries],
+        products)
+
+local_cache.register('product_search', _build_index, Product, File)
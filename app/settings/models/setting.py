@@ -1,9 +1,17 @@
 '''Setting model'''
-from sqlalchemy import Column, String
+from itertools import chain
 
-from app import db
+from sqlalchemy import Column, String, event, select
+from sqlalchemy.orm import object_session
+
+from app import db, local_cache
 from app.models.base import BaseModel
 
+# Key of the session info, which holds keys of settings changed in the transaction
+_SETTINGS_CHANGED = 'settings_changed'
+# Marks all settings as changed in the transaction
+_ALL_SETTINGS = '*'
+
 class Setting(db.Model, BaseModel):
     '''Represents setting'''
     __tablename__ = 'settings'
@@ -16,11 +24,15 @@ class Setting(db.Model, BaseModel):
 
     @classmethod
     def get(cls, setting_name):
-        '''Gets setting's value or None if setting doesn't exist'''
-        setting = db.session.get(Setting, setting_name)
-        if setting is not None:
-            return setting.value
-        return None
+        '''Gets setting's value or None if setting doesn't exist.
+        Values of all settings are kept in the local cache. Settings changed
+        in the current transaction are read from the session'''
+        changed = db.session.info.get(_SETTINGS_CHANGED)
+        if changed and (setting_name in changed or _ALL_SETTINGS in changed):
+            setting = db.session.get(Setting, setting_name)
+            return setting.value \
+                if setting is not None and setting not in db.session.deleted else None
+        return local_cache.get('settings').get(setting_name)
 
     @classmethod
     def __getitem__(cls, setting_name):
@@ -37,4 +49,44 @@ class Setting(db.Model, BaseModel):
                 if self.when_created else None,
             'when_changed': self.when_changed.strftime('%Y-%m-%d %H:%M:%S') \
                 if self.when_changed else None
-        }
\ No newline at end of file
+        }
+
+def _load_settings() -> dict[str, str]:
+    return {key: value for key, value in db.session.execute(select(Setting.key, Setting.value))}
+
+local_cache.register('settings', _load_settings, Setting)
+
+def _mark_changed(session, setting_key: str) -> None:
+    session.info.setdefault(_SETTINGS_CHANGED, set()).add(setting_key)
+
+@event.listens_for(Setting.value, 'set')
+def _on_value_set(target, _value, _old_value, _initiator):
+    session = object_session(target)
+    if session is not None:
+        _mark_changed(session, target.key)
+
+@event.listens_for(db.session, 'transient_to_pending')
+def _on_transient_to_pending(session, instance):
+    if isinstance(instance, Setting):
+        _mark_changed(session, instance.key)
+
+@event.listens_for(db.session, 'after_flush')
+def _on_after_flush(session, _flush_context):
+    for instance in chain(session.new, session.dirty, session.deleted):
+        if isinstance(instance, Setting):
+            _mark_changed(session, instance.key)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _on_orm_execute(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+       and orm_execute_state.bind_mapper is not None \
+       and issubclass(orm_execute_state.bind_mapper.class_, Setting):
+        _mark_changed(orm_execute_state.session, _ALL_SETTINGS)
+
+@event.listens_for(db.session, 'after_commit')
+def _on_after_commit(session):
+    session.info.pop(_SETTINGS_CHANGED, None)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _on_after_soft_rollback(session, _previous_transaction):
+    session.info.pop(_SETTINGS_CHANGED, None)
@@ -0,0 +1,112 @@
+'''
+Concurrent evaluation of shipping methods availability.
+Shipping methods, which call carriers' services to check availability, are
+checked in threads of a shared pool, so these checks don't wait for each
+other. Other shipping methods are checked inline. A carrier's check, which
+doesn't finish within the deadline of its shipping method, is reported as
+unknown and is left to finish in background
+'''
+from __future__ import annotations
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+import logging
+from threading import Lock
+from time import monotonic, perf_counter
+from typing import Iterable, NamedTuple, Optional
+
+from flask import Flask, current_app
+
+from app import db
+from app.models import Country
+
+from .models.shipping import Shipping
+
+class Availability(NamedTuple):
+    '''Result of the shipping method check'''
+    shipping: Shipping
+    # `None` if the check hasn't finished in time or has failed
+    available: Optional[bool]
+    # Seconds the check took or was waited for
+    elapsed: float
+
+_executor: Optional[ThreadPoolExecutor] = None
+_lock = Lock()
+
+def check_availability(shipping_methods: Iterable[Shipping], country: Optional[Country],
+                       weight: Optional[int], products: list[str]) -> list[Availability]:
+    '''Checks whether shipping methods can ship the parcel. Carriers' checks
+    run concurrently and are waited for `SHIPPING_CHECK_TIMEOUTS[<shipping type>]`
+    or `SHIPPING_CHECK_TIMEOUT` seconds (10 by default) from the start.
+    Errors of other checks are raised
+
+    :param Iterable[Shipping] shipping_methods: shipping methods to check
+    :param Country country: destination country
+    :param int weight: weight of the parcel in grams
+    :param list[str] products: IDs of the products in the parcel
+    :returns list[Availability]: results in the order of shipping methods'''
+    logger = logging.getLogger('check_availability()')
+    app = current_app._get_current_object() #type: ignore
+    country_id = country.id if country is not None else None
+    shipping_methods = list(shipping_methods)
+    started = monotonic()
+    remote_checks = {
+        shipping.id: _get_executor().submit(
+            _can_ship, app, shipping.id, country_id, weight, products)
+        for shipping in shipping_methods if shipping.is_availability_remote()}
+    result = []
+    for shipping in shipping_methods:
+        if shipping.id not in remote_checks:
+            check_started = perf_counter()
+            available = shipping.can_ship(country=country, weight=weight, products=products)
+            result.append(Availability(shipping, available, perf_counter() - check_started))
+            continue
+        deadline = started + _get_timeout(shipping)
+        try:
+            available, elapsed = remote_checks[shipping.id].result(
+                timeout=max(deadline - monotonic(), 0))
+        except FutureTimeoutError:
+            logger.warning("%s hasn't checked shipping to %s in %.3fs",
+                           shipping, country_id, _get_timeout(shipping))
+            available, elapsed = None, monotonic() - started
+        logger.debug("%s: available: %s, %.3fs", shipping, available, elapsed)
+        result.append(Availability(shipping, available, elapsed))
+    return result
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=_get_max_workers(), thread_name_prefix='shipping_check')
+        return _executor
+
+def _get_max_workers() -> int:
+    '''Returns `SHIPPING_CHECK_WORKERS` or, by default, the number of threads,
+    which leaves at least half of database connections to other work. Checks,
+    which exceeded their deadlines, keep their threads and connections'''
+    if current_app.config.get('SHIPPING_CHECK_WORKERS'):
+        return current_app.config['SHIPPING_CHECK_WORKERS']
+    pool_size = getattr(db.engine.pool, 'size', None)
+    return max(pool_size() // 2, 1) if callable(pool_size) else 4
+
+def _get_timeout(shipping: Shipping) -> float:
+    timeouts = current_app.config.get('SHIPPING_CHECK_TIMEOUTS') or {}
+    return timeouts.get(shipping.discriminator,
+                        current_app.config.get('SHIPPING_CHECK_TIMEOUT', 10))
+
+def _can_ship(app: Flask, shipping_id: int, country_id: Optional[str],
+              weight: Optional[int], products: list[str]) -> tuple[Optional[bool], float]:
+    '''Checks the shipping method in its own application context and session
+
+    :returns tuple[Optional[bool], float]: whether the method can ship
+        (`None` if the check has failed) and seconds it took'''
+    with app.app_context():
+        started = perf_counter()
+        shipping = db.session.get(Shipping, shipping_id)
+        country = db.session.get(Country, country_id) if country_id else None
+        try:
+            available = shipping.can_ship(country=country, weight=weight, products=products)
+        except Exception:
+            logging.getLogger('check_availability()').error(
+                "%s has failed to check shipping to %s", shipping, country_id, exc_info=True)
+            available = None
+        return available, perf_counter() - started
@@ -10,9 +10,7 @@ import app.orders.models as o
 from app import db
 from app.currencies.models import Currency
 from app.shipping.models.shipping import Shipping
-from app.shipping.models.shipping_rate import ShippingRate
 from common.exceptions import OrderError
-from sqlalchemy import select
 
 class Cargo(Shipping):
     __mapper_args__ = {'polymorphic_identity': 'cargo'} #type: ignore
@@ -29,13 +27,7 @@ class Cargo(Shipping):
             destination_id = destination
         else:
             destination_id = destination.id
-        rate = db.session.execute(
-            select(ShippingRate).where(
-                ShippingRate.shipping_method_id == self.id,
-                ShippingRate.destination == destination_id
-            )
-        ).scalars().first()
-        if rate:
+        if self.get_local_rates(destination_id) is not None:
             # For cargo, the cost is always 0 if the country is allowed, otherwise no rate is found
             return 0
         from common.exceptions import NoShippingRateError
@@ -1,9 +1,11 @@
 import logging
 import math
-from operator import attrgetter
+
+from sqlalchemy import select
 
 from app import db
 from app.models import BaseModel, Country
+from app.shipping import rates
 from app.shipping.models.shipping import Shipping
 from common.exceptions import NoShippingRateError
 
@@ -11,6 +13,19 @@ from .dhl_country import DHLCountry
 from .dhl_rate import DHLRate
 from .dhl_zone import DHLZone
 
+def _load_tariff() -> dict[str, rates.RateTable]:
+    '''Returns rates of DHL zones by country'''
+    zone_rates: dict[int, list[tuple[float, float]]] = {}
+    for zone, weight, rate in db.session.execute(
+            select(DHLRate.zone, DHLRate.weight, DHLRate.rate)):
+        zone_rates.setdefault(zone, []).append((weight, rate))
+    tables = {zone: rates.RateTable.compile(entries) for zone, entries in zone_rates.items()}
+    return {country_id: tables.get(zone, rates.RateTable([], []))
+            for country_id, zone in db.session.execute(
+                select(DHLCountry.country_id, DHLCountry.zone))}
+
+rates.register_tariff('dhl', _load_tariff, DHLCountry, DHLRate)
+
 # dhl_zones = db.Table('dhl_zones',
 #     db.Column('id', db.Integer(), primary_key=True)
 # )
@@ -32,7 +47,7 @@ class DHL(Shipping):
             return False
         if country is None:
             return True
-        rate_exists = DHLCountry.query.filter_by(country_id=country.id).first() is not None
+        rate_exists = country.id in rates.get_tariff('dhl')
         if rate_exists:
             logger.debug(f"There is a rate to country {country}. Can ship")
         else:
@@ -46,16 +61,14 @@ class DHL(Shipping):
     def get_shipping_cost(self, destination: str, weight):
         logger = logging.getLogger("DHL::get_shipping_cost()")
         weight = int(weight) / 1000
-        country = db.session.get(DHLCountry, destination)
-        if country is None:
+        if isinstance(destination, Country):
+            destination = destination.id
+        table = rates.get_tariff('dhl').get(destination)
+        if table is None:
             raise NoShippingRateError
-        rate = sorted(
-            filter(lambda r: r.weight > weight, country.rates),
-                   key=attrgetter('weight')
-        )
-        if len(rate) == 0:
+        rate = table.find(weight, inclusive=False)
+        if rate is None:
             raise NoShippingRateError()
-        rate = rate[0].rate
         if weight > 30:
             return rate * math.ceil(weight)
 
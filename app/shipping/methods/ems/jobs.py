@@ -0,0 +1,59 @@
+''' Background jobs for EMS shipping'''
+from typing import Optional
+
+from celery.utils.log import get_task_logger
+from flask import current_app
+from sqlalchemy import delete, select
+
+from app import celery, db
+from app.models import Country
+from common.exceptions import NoShippingRateError
+from .models.ems import EMS, fetch_rates
+from .models.ems_rate import EMSRate
+
+@celery.on_after_finalize.connect #type: ignore
+def setup_periodic_tasks(sender, **kwargs):
+    sender.add_periodic_task(86400, prefetch_ems_rates,
+        name="Prefetch EMS rates every day")
+
+@celery.task
+def prefetch_ems_rates(services=('EMS', 'PREMIUM')):
+    '''Fetches EMS charges of all weight brackets to all countries and stores
+    them. Prices of EMS brackets are calculated by EMS too, so shipping costs
+    are got without calling EMS. Brackets, which price couldn't be calculated,
+    are stored without it and their costs are still calculated by EMS.
+    Stored charges of a country are kept if its charges couldn't be fetched.
+    Returns number of stored charge lists'''
+    logger = get_task_logger('prefetch_ems_rates')
+    logger.setLevel(current_app.config['LOG_LEVEL'])
+    ems = db.session.execute(select(EMS)).scalars().first()
+    fetched = 0
+    for country_id in db.session.execute(select(Country.id)).scalars():
+        country_code = country_id.upper()
+        for service in services:
+            try:
+                charges = fetch_rates(country_code, service)
+            except NoShippingRateError:
+                logger.info("Couldn't get %s charges to %s", service, country_code)
+                continue
+            rates = [
+                EMSRate(service=service, country_id=country_code,
+                        weight=charge['weight'], rate=charge['rate'],
+                        price=_calculate_price(ems, country_code, charge['weight'])
+                            if service == 'EMS' else None)
+                for charge in {charge['weight']: charge for charge in charges}.values()]
+            db.session.execute(delete(EMSRate).where(
+                EMSRate.service == service, EMSRate.country_id == country_code))
+            db.session.add_all(rates)
+            db.session.commit()
+            fetched += 1
+    logger.info("Stored EMS charges to %d destinations", fetched)
+    return fetched
+
+def _calculate_price(ems: Optional[EMS], country_code: str, weight: int) -> Optional[int]:
+    if ems is None:
+        return None
+    try:
+        return ems.calculate_price(country_code, weight)
+    except NoShippingRateError:
+        return None
@@ -1 +1,2 @@
-from .ems import EMS
\ No newline at end of file
+from .ems import EMS
+from .ems_rate import EMSRate
@@ -5,11 +5,12 @@ import logging
 from operator import itemgetter
 import re
 import time
-from typing import Any
+from typing import Any, NamedTuple, Optional
 
 from flask import current_app, url_for
+from sqlalchemy import select
 
-from app import cache
+from app import cache, db
 from app.models import Country
 from app.models.address import Address
 import app.orders.models as o
@@ -17,12 +18,14 @@ from app.shipping.models.box import Box
 from app.shipping.models.shipping import Shipping
 from app.shipping.models.shipping_contact import ShippingContact
 from app.shipping.models.shipping_item import ShippingItem
+from app.shipping.rates import RateTable, get_tariff, register_tariff
 from app.tools import first_or_default, get_json, invoke_curl
 from common.exceptions import HTTPError, NoShippingRateError, OrderError, \
     ConsignException
 
 from app.shipping.models.consign_result import ConsignResult
 from ..exceptions import EMSItemsException
+from .ems_rate import EMSRate
 
 hs_codes = {
     "Coffee": "0901902000",
@@ -62,6 +65,7 @@ class EMS(Shipping):
     type = "EMS"
 
     _consign_implemented = True
+    _remote_availability_check = True
     __username = "sub1079"
     __password = "2045"
 
@@ -338,6 +342,22 @@ class EMS(Shipping):
 
     def get_shipping_cost(self, destination, weight):
         logger = logging.getLogger("EMS::get_shipping_cost()")
+        rate = get_prefetched_rate(destination, weight)
+        if rate is not None:
+            logger.debug("Prefetched shipping rate for %skg parcel to %s is %s",
+                         weight / 1000, destination, rate)
+            return rate
+        return self.calculate_price(destination, weight)
+
+    def calculate_price(self, destination, weight) -> int:
+        '''Returns the price of the parcel calculated by EMS including
+        extra shipping charges
+
+        :param str destination: code of the destination country
+        :param int weight: weight of the parcel in grams
+        :returns int: the price
+        :raises NoShippingRateError: if the price couldn't be calculated'''
+        logger = logging.getLogger("EMS::calculate_price()")
         result = self.__get_rate(destination.upper(), weight)
         try:
             rate = int(result["post_price"]) + int(result.get("extra_shipping_charge") or 0)
@@ -406,13 +426,15 @@ class EMS(Shipping):
         return {"Authorization": cache.get(f"ems_auth:{self.__username}")}
 
 
-def __get_rates(country, url: str) -> list[dict]:
+def _get_country_code(country) -> str:
     if isinstance(country, Country):
-        country_code = country.id.upper()
-    elif isinstance(country, str):
-        country_code = country.upper()
-    else:
-        raise NoShippingRateError("Unknown country")
+        return country.id.upper()
+    if isinstance(country, str):
+        return country.upper()
+    raise NoShippingRateError("Unknown country")
+
+def __get_rates(country, url: str) -> list[dict]:
+    country_code = _get_country_code(country)
     #TODO: Remove when MyEMS supports Lithuania
     if country_code == 'LT':
         country_code = 'PL'
@@ -429,14 +451,58 @@ def __get_rates(country, url: str) -> list[dict]:
         raise NoShippingRateError
 
 
-def get_rates(country):
+def fetch_rates(country, service: str='EMS') -> list[dict]:
+    '''Fetches charges of the service to the country from EMS
+
+    :param country: destination country or its code
+    :param str service: 'EMS' or 'PREMIUM'
+    :returns list[dict]: charges of weight brackets
+    :raises NoShippingRateError: if charges couldn't be fetched'''
     return __get_rates(
-        country, f'{BASE_URL}/common/emsChargeList/type/EMS/country/{{}}'
+        country, f'{BASE_URL}/common/emsChargeList/type/{service}/country/{{}}'
     )
 
 
+def get_prefetched_rate(country, weight: int) -> Optional[int]:
+    '''Returns the price of the lightest EMS weight bracket fitting the weight
+    from prefetched prices
+
+    :returns Optional[int]: the price or `None` if there is no prefetched
+        price of the bracket or the weight exceeds all brackets'''
+    table = get_tariff('ems').get(('EMS', _get_country_code(country)))
+    charge = table.find(weight) if table is not None else None
+    return charge.price if charge is not None else None
+
+
+def _get_rates(country, service: str) -> list[dict]:
+    table = get_tariff('ems').get((service, _get_country_code(country)))
+    if table is not None:
+        return [{"weight": weight, "rate": charge.rate}
+                for weight, charge in zip(table.weights, table.rates)]
+    return fetch_rates(country, service)
+
+
+def get_rates(country):
+    return _get_rates(country, 'EMS')
+
+
 def get_premium_rates(country):
-    return __get_rates(
-        country,
-        f'{BASE_URL}/common/emsChargeList/type/PREMIUM/country/{{}}',
-    )
+    return _get_rates(country, 'PREMIUM')
+
+
+class _Charge(NamedTuple):
+    # Charge of the weight bracket from the charge list
+    rate: int
+    # Price calculated by EMS for the bracket
+    price: Optional[int]
+
+def _load_tariff() -> dict[tuple[str, str], RateTable]:
+    '''Returns prefetched charges by service and country'''
+    entries: dict[tuple[str, str], list[tuple[int, _Charge]]] = {}
+    for service, country_id, weight, rate, price in db.session.execute(
+            select(EMSRate.service, EMSRate.country_id, EMSRate.weight, EMSRate.rate,
+                   EMSRate.price)):
+        entries.setdefault((service, country_id), []).append((weight, _Charge(rate, price)))
+    return {key: RateTable.compile(rates) for key, rates in entries.items()}
+
+register_tariff('ems', _load_tariff, EMSRate)
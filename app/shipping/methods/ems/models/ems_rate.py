@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String
+
+from app import db
+from app.models import BaseModel
+
+class EMSRate(db.Model, BaseModel):
+    '''EMS charge and price by country and weight bracket fetched from EMS'''
+    __tablename__ = 'shipping_ems_rates'
+
+    id = None
+    when_changed = None
+    service = Column(String(8), primary_key=True)
+    country_id = Column(String(2), primary_key=True)
+    weight = Column(Integer, primary_key=True)
+    rate = Column(Integer)
+    # Price calculated by EMS for the bracket including extra charges
+    price = Column(Integer)
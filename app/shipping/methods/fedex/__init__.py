@@ -9,5 +9,7 @@ bp_client_admin = Blueprint('shipping_fedex_client_admin', __name__,
 
 def register_blueprints(flask_app):
     from . import routes
+    from .jobs import warm_up_command
     flask_app.register_blueprint(bp_api_admin)
     flask_app.register_blueprint(bp_client_admin)
+    flask_app.cli.add_command(warm_up_command)
@@ -0,0 +1,58 @@
+''' Background jobs for FedEx shipping'''
+import click
+from celery.utils.log import get_task_logger
+from flask import current_app
+from flask.cli import with_appcontext
+from sqlalchemy import select
+
+from app import celery, db
+from app.models import Country
+from .models.fedex import Fedex, get_lane, get_weight_classes
+from .models.fedex_availability import FedexAvailability
+
+@celery.on_after_finalize.connect #type: ignore
+def setup_periodic_tasks(sender, **kwargs):
+    sender.add_periodic_task(86400, warm_up_fedex_availability,
+        name="Warm up FedEx services availability every day")
+
+@celery.task
+def warm_up_fedex_availability(refresh=False):
+    '''Checks FedEx services availability for lanes of all countries and
+    weight classes and stores it, so shipping methods are listed without
+    calling FedEx. Lanes with stored availability, which isn't expired,
+    are skipped unless `refresh` is set.
+    Returns number of lanes checked with FedEx'''
+    logger = get_task_logger('warm_up_fedex_availability')
+    logger.setLevel(current_app.config['LOG_LEVEL'])
+    fedex = db.session.execute(
+        select(Fedex).where(Fedex.enabled == True)).scalars().first()
+    if fedex is None:
+        logger.info("There is no enabled FedEx shipping method")
+        return 0
+    stored = {
+        (availability.country_id, availability.postcode_prefix, availability.weight_class)
+        for availability in db.session.execute(select(FedexAvailability)).scalars()
+        if not availability.is_expired()}
+    checked = 0
+    for country in db.session.execute(select(Country)).scalars():
+        for weight_class in get_weight_classes():
+            if not refresh and get_lane(country, weight_class) in stored:
+                continue
+            try:
+                fedex.get_available_services(country, weight_class, refresh=True)
+                db.session.commit()
+                checked += 1
+            except Exception:
+                logger.exception("Couldn't check FedEx availability to %s (%sg)",
+                                 country.id, weight_class)
+                db.session.rollback()
+    logger.info("Checked FedEx availability for %d lanes", checked)
+    return checked
+
+@click.command('warm-up-fedex-availability')
+@click.option('--refresh', is_flag=True,
+              help="Check lanes with stored availability too")
+@with_appcontext
+def warm_up_command(refresh):
+    '''Checks and stores FedEx services availability for all lanes'''
+    click.echo(f"{warm_up_fedex_availability(refresh)} lanes are checked")
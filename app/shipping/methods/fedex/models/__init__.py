@@ -1 +1,2 @@
-from .fedex import Fedex
\ No newline at end of file
+from .fedex import Fedex
+from .fedex_availability import FedexAvailability
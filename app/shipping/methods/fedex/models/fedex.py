@@ -1,5 +1,7 @@
 from __future__ import annotations
 import base64
+from bisect import bisect_left
+from datetime import datetime, timedelta
 from functools import reduce
 import json
 import logging
@@ -7,9 +9,10 @@ import os
 import re
 from tempfile import _TemporaryFileWrapper
 import time
-from typing import Any
+from typing import Any, Optional
 
 from flask import current_app, url_for
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import relationship
 
 from app import cache, db
@@ -17,6 +20,7 @@ from app.currencies.models.currency import Currency
 from app.models.address import Address
 from app.models.country import Country
 from app.orders.models.order import Order
+from app.shipping.methods.fedex.models.fedex_availability import FedexAvailability
 from app.shipping.methods.fedex.models.fedex_setting import FedexSetting
 from app.shipping.models.box import Box
 from app.shipping.models.shipping import Shipping
@@ -37,6 +41,7 @@ class Fedex(Shipping):
     settings = relationship('FedexSetting', uselist=False, lazy='select')
 
     _consign_implemented = True
+    _remote_availability_check = True
     __zip = '08584'
     __src_country = 'KR'
 
@@ -79,13 +84,11 @@ class Fedex(Shipping):
                         method=method, retry=retry, 
                         get_data=__invoke_curl, ignore_ssl_check=ignore_ssl_check)
     
-    def __get_service_availability(self, country_id: str) -> list[str]:
+    def __get_service_availability(self, country: Country, weight: int) -> list[str]:
         '''Returns list of services available for the given country
-        :param str country_id: ID of the country
+        :param Country country: destination country
+        :param int weight: weight of the parcel in grams
         :returns list[str]: list of available services'''
-        country = db.session.get(Country, country_id)
-        if country is None:
-            return []
         payload = json.dumps({
             "requestedShipment": {
                 "pickupType": "USE_SCHEDULED_PICKUP",
@@ -107,7 +110,7 @@ class Fedex(Shipping):
                             ],
                             "city": country.capital,
                             "postalCode": country.first_zip,
-                            "countryCode": country_id.upper()
+                            "countryCode": country.id.upper()
                         }
                     }
                 ],
@@ -145,7 +148,7 @@ class Fedex(Shipping):
                     {
                         "weight": {
                             "units": "KG",
-                            "value": "1"
+                            "value": str(weight / 1000)
                         }
                     }
                 ]
@@ -161,6 +164,59 @@ class Fedex(Shipping):
         return [s['serviceType'] 
                 for s in result['output']['transitTimes'][0]['transitTimeDetails']]
 
+    def get_available_services(self, country: Country, weight: Optional[int]=None,
+                               refresh: bool=False) -> list[str]:
+        '''Returns list of services available for the lane of the destination.
+        Availability of the lane is stored for `FEDEX_AVAILABILITY_TTL` seconds
+        (a week by default) or, if no service is available, for
+        `FEDEX_AVAILABILITY_NEGATIVE_TTL` seconds (an hour by default)
+
+        :param Country country: destination country
+        :param int weight: weight of the parcel in grams
+        :param bool refresh: whether to check the lane with FedEx even if
+            its availability is stored
+        :returns list[str]: list of available services'''
+        lane = get_lane(country, weight)
+        availability = db.session.get(FedexAvailability, lane)
+        if availability is not None and not refresh and not availability.is_expired():
+            return availability.get_services()
+        services = self.__get_service_availability(country, lane[2])
+        self.__store_availability(lane, services)
+        if availability is not None:
+            db.session.expire(availability)
+        return services
+
+    def __store_availability(self, lane: tuple[str, str, int], services: list[str]) -> None:
+        '''Stores availability of the lane in its own transaction, so the
+        caller's transaction is neither committed nor rolled back'''
+        # SQLite locks the whole database on write so there is nothing
+        # to gain from a separate transaction
+        if db.engine.dialect.name == 'sqlite':
+            self.__store_availability_in(db.session.connection(), lane, services)
+            return
+        with db.engine.begin() as connection:
+            self.__store_availability_in(connection, lane, services)
+
+    def __store_availability_in(self, connection, lane: tuple[str, str, int],
+                                services: list[str]) -> None:
+        table = FedexAvailability.__table__
+        key = dict(zip(('country_id', 'postcode_prefix', 'weight_class'), lane))
+        values = {
+            'services': ','.join(services),
+            'expires_at': datetime.now() + timedelta(
+                seconds=current_app.config.get('FEDEX_AVAILABILITY_TTL', 604800) if services
+                    else current_app.config.get('FEDEX_AVAILABILITY_NEGATIVE_TTL', 3600))}
+        stored = connection.execute(table.update().where(
+            *[table.c[column] == value for column, value in key.items()]
+        ).values(**values))
+        if stored.rowcount == 0:
+            try:
+                with connection.begin_nested():
+                    connection.execute(table.insert().values(**key, **values))
+            except IntegrityError:
+                # Availability of the lane is stored by another check meanwhile
+                pass
+
     def __login(self, force=False) -> dict[str, str]:
         if cache.get("fedex_login_in_progress"):
             logging.info("Another login process is running. Will wait till the end")
@@ -211,7 +267,7 @@ class Fedex(Shipping):
             if country is None:
                 return True
 
-            services = self.__get_service_availability(country.id)
+            services = self.get_available_services(country, weight)
             if self.settings.service_type in services:
                 logging.debug(f"Can ship to country {country}. ")
                 return True
@@ -518,6 +574,25 @@ class Fedex(Shipping):
             'service_type': self.settings.service_type
         }
 
+def get_lane(country: Country, weight: Optional[int]=None) -> tuple[str, str, int]:
+    '''Returns the lane of the destination, by which FedEx services availability
+    is stored. Postcodes are cut to `FEDEX_AVAILABILITY_POSTCODE_PREFIX`
+    characters and weights are rounded up to one of `FEDEX_AVAILABILITY_WEIGHT_CLASSES`
+
+    :param Country country: destination country
+    :param int weight: weight of the parcel in grams
+    :returns tuple[str, str, int]: country ID, postcode prefix and weight class'''
+    weight_classes = get_weight_classes()
+    position = min(bisect_left(weight_classes, weight or 0), len(weight_classes) - 1)
+    postcode_prefix = (country.first_zip or '').replace(' ', '')[
+        :current_app.config.get('FEDEX_AVAILABILITY_POSTCODE_PREFIX', 3)]
+    return country.id, postcode_prefix, weight_classes[position]
+
+def get_weight_classes() -> list[int]:
+    '''Returns maximal weights in grams of weight classes of lanes'''
+    return sorted(current_app.config.get('FEDEX_AVAILABILITY_WEIGHT_CLASSES')
+                  or [1000, 5000, 10000, 20000, 30000])
+
 def get_label(tracking_id: str) -> str:
     label_file_path = get_upload_path('fedex', f'label-{tracking_id}.pdf')
     if os.path.exists(label_file_path):
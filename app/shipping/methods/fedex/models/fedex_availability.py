@@ -0,0 +1,27 @@
+from __future__ import annotations
+from datetime import datetime
+
+from sqlalchemy import Column, DateTime, Integer, String, Text
+
+from app import db
+from app.models import BaseModel
+
+class FedexAvailability(db.Model, BaseModel):
+    '''FedEx services available for a lane, which is a destination country,
+    a postcode prefix and a weight class'''
+    __tablename__ = 'shipping_fedex_availability'
+
+    id = None
+    when_changed = None
+    country_id = Column(String(2), primary_key=True)
+    postcode_prefix = Column(String(9), primary_key=True)
+    weight_class = Column(Integer, primary_key=True)
+    # Comma separated service types. Empty if the lane is unavailable
+    services = Column(Text, default='')
+    expires_at = Column(DateTime, index=True)
+
+    def get_services(self) -> list[str]:
+        return self.services.split(',') if self.services else []
+
+    def is_expired(self) -> bool:
+        return self.expires_at is None or self.expires_at <= datetime.now()
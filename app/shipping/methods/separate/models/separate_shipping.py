@@ -1,10 +1,8 @@
 '''SeparateShipping method - shipping cost is charged separately via eurocargo_management'''
 from __future__ import annotations
 
-from app import db
 from app.models.country import Country
 from app.shipping.models.shipping import Shipping
-from app.shipping.models.shipping_rate import ShippingRate
 
 
 class SeparateShipping(Shipping):
@@ -40,7 +38,4 @@ class SeparateShipping(Shipping):
         if not country:
             return True
         country_id = country.id if isinstance(country, Country) else str(country)
-        return db.session.query(ShippingRate).filter_by(
-            shipping_method_id=self.id,
-            destination=country_id,
-        ).count() > 0
+        return self.get_local_rates(country_id) is not None
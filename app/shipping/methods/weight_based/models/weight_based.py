@@ -3,6 +3,7 @@ Weight based shipping method type
 '''
 import logging
 import math
+from typing import NamedTuple, Optional
 
 # from sqlalchemy.ext.associationproxy import association_proxy
 from sqlalchemy import select
@@ -11,25 +12,37 @@ from sqlalchemy.orm import relationship
 from app import db
 from app.models import Country
 from common.exceptions import NoShippingRateError
+from app.shipping import rates
 from app.shipping.models.shipping import Shipping
 from .weight_based_rate import WeightBasedRate
 
+class WeightBasedTariff(NamedTuple):
+    '''Compiled rate of the weight based shipping to a destination'''
+    minimum_weight: int
+    maximum_weight: int
+    cost_per_kg: int
+    weight_step: int
+
+def _load_tariff() -> dict[tuple[int, str], WeightBasedTariff]:
+    return {
+        (shipping_id, destination): WeightBasedTariff(*values)
+        for shipping_id, destination, *values in db.session.execute(
+            select(WeightBasedRate.shipping_id, WeightBasedRate.destination,
+                   WeightBasedRate.minimum_weight, WeightBasedRate.maximum_weight,
+                   WeightBasedRate.cost_per_kg, WeightBasedRate.weight_step))}
+
+rates.register_tariff('weight_based', _load_tariff, WeightBasedRate)
+
 class WeightBased(Shipping):
     __mapper_args__ = {'polymorphic_identity': 'weight_based'}
 
     type = "Weight based"
     rates = relationship('WeightBasedRate', lazy='select')
 
-    def __get_rate(self, destination):
+    def __get_rate(self, destination) -> Optional[WeightBasedTariff]:
         if isinstance(destination, Country):
             destination = destination.id
-
-        return db.session.execute(
-            select(WeightBasedRate).where(
-                WeightBasedRate.shipping_id == self.id,
-                WeightBasedRate.destination == destination
-            )
-        ).scalar_one_or_none()
+        return rates.get_tariff('weight_based').get((self.id, destination))
 
     def get_edit_url(self):
         from .. import bp_client_admin
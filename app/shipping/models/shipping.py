@@ -8,7 +8,7 @@ from tempfile import _TemporaryFileWrapper
 from typing import Any, Optional
 from flask import current_app
 
-from sqlalchemy import Boolean, Column, Integer, String, Text, or_, select
+from sqlalchemy import Boolean, Column, Integer, String, Text, select
 from sqlalchemy.orm import relationship, reconstructor
 from sqlalchemy.sql.schema import ForeignKey
 
@@ -16,6 +16,7 @@ from app import db
 from app.models.address import Address
 from app.models.country import Country
 from app.models.base import BaseModel
+from app.shipping import rates
 from common.exceptions import NoShippingRateError
 
 from .box import Box
@@ -54,6 +55,8 @@ class Shipping(db.Model, BaseModel):  # type: ignore
     }    
     
     _consign_implemented = False
+    # Whether availability is checked by calling the carrier's service
+    _remote_availability_check = False
 
     @reconstructor
     def init_on_load(self):
@@ -61,20 +64,12 @@ class Shipping(db.Model, BaseModel):  # type: ignore
 
     def _are_all_products_shippable(self, products: list[str]):
         from app.products.models.product import Product
-        product_ids: list[str] = []
-        for product_id in products:
-            product_ids += [product_id, product_id.zfill(6)]
         if products:
-            shippable_products = Product.query.filter(
-                Product.id.in_(product_ids),
-                or_(
-                    Product.available_shipping.any(Shipping.id == self.id),
-                    Product.available_shipping == None))
-            non_shippable_products = [
-                p for p in products if p not in [sp.id for sp in shippable_products]
-            ]
-            logging.debug(f"These products are not shippable by {self}: {non_shippable_products}")
-            return shippable_products.count() == len(products)
+            if Product.get_shipping_mask(products) >> self.id & 1:
+                return True
+            logging.debug("These products are not shippable by %s: %s", self, [
+                p for p in products if not Product.get_shipping_mask([p]) >> self.id & 1])
+            return False
         return True
 
     def can_ship(self, country: Country, weight: int, products: list[str]=[]) -> bool:
@@ -143,22 +138,29 @@ class Shipping(db.Model, BaseModel):  # type: ignore
         weight = int(weight) if weight is not None else 0
         if isinstance(destination, Country):
             destination = destination.id #type: ignore
-        rate = db.session.execute(
-            select(ShippingRate).where(
-                ShippingRate.shipping_method_id == self.id,
-                ShippingRate.destination == destination,
-                ShippingRate.weight >= weight
-            ).order_by(ShippingRate.weight)
-        ).scalars().first()
-        if rate:
-            return rate.rate
+        table = self.get_local_rates(destination)
+        rate = table.find(weight) if table is not None else None
+        if rate is not None:
+            return rate
         raise NoShippingRateError()
+
+    def get_local_rates(self, destination: str) -> Optional[rates.RateTable]:
+        '''Returns the compiled local tariff of the shipping method to the destination
+
+        :param str destination: ID of the destination country
+        :returns Optional[RateTable]: rates by weight or `None`
+            if there are no rates to the destination'''
+        return rates.get_tariff('local').get((self.id, destination))
     
     def is_consignable(self):
         if not (current_app.config.get("SHIPPING_AUTOMATION") and
                 current_app.config['SHIPPING_AUTOMATION']['enabled']):
             return False
         return self._consign_implemented
+
+    def is_availability_remote(self) -> bool:
+        '''Returns whether availability is checked by calling the carrier's service'''
+        return self._remote_availability_check
     
     def to_dict(self):
         return {
@@ -184,6 +186,19 @@ class Shipping(db.Model, BaseModel):  # type: ignore
         ) if package_weight > 0 \
         else 0
 
+def _load_local_tariff() -> dict[tuple[int, str], rates.RateTable]:
+    entries: dict[tuple[int, str], list[tuple[int, int]]] = {}
+    for shipping_id, destination, weight, rate in db.session.execute(
+            select(ShippingRate.shipping_method_id, ShippingRate.destination,
+                   ShippingRate.weight, ShippingRate.rate)):
+        destination_entries = entries.setdefault((shipping_id, destination), [])
+        if weight is not None and rate is not None:
+            destination_entries.append((weight, rate))
+    return {key: rates.RateTable.compile(destination_entries)
+            for key, destination_entries in entries.items()}
+
+rates.register_tariff('local', _load_local_tariff, ShippingRate)
+
 class NoShipping(Shipping):
     __mapper_args__ = {'polymorphic_identity': 'noshipping'} #type: ignore
     @property
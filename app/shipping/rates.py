@@ -0,0 +1,57 @@
+'''
+Compiled tariffs of shipping methods.
+Tariffs stored in the database are compiled into tables keyed by shipping
+method and destination, where rates are kept in arrays sorted by weight,
+so a rate for any weight is found by binary search without querying the
+database. Compiled tables are kept in the process-local cache
+'''
+from __future__ import annotations
+from bisect import bisect_left, bisect_right
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from app import local_cache
+
+class RateTable(NamedTuple):
+    '''Rates of a destination sorted by maximal weight'''
+    weights: list[float]
+    rates: list[Any]
+
+    @classmethod
+    def compile(cls, entries) -> RateTable:
+        '''Returns the table of (weight, rate) pairs'''
+        entries = sorted(entries, key=lambda entry: entry[0])
+        return cls([weight for weight, _ in entries], [rate for _, rate in entries])
+
+    def find(self, weight: float, inclusive: bool=True) -> Optional[Any]:
+        '''Returns the rate of the lightest weight, which is not less
+        than the weight (or greater than the weight if not inclusive)
+
+        :param float weight: weight of the parcel
+        :param bool inclusive: whether the rate for exactly the weight fits
+        :returns Optional[Any]: the rate or `None` if the weight exceeds all weights'''
+        position = bisect_left(self.weights, weight) if inclusive \
+            else bisect_right(self.weights, weight)
+        return self.rates[position] if position < len(self.rates) else None
+
+def register_tariff(name: str, loader: Callable[[], dict[Hashable, Any]], *models) -> None:
+    '''Registers a tariff to be compiled and cached by `app.local_cache`
+
+    :param str name: name of the tariff
+    :param loader: function, which loads the tariff from the database
+        and returns its table
+    :param models: model classes the tariff is made of'''
+    local_cache.register(_get_cache_name(name), loader, *models)
+
+def get_tariff(name: str) -> dict[Hashable, Any]:
+    '''Returns the table of the tariff of the current tenant
+
+    :param str name: name of the registered tariff
+    :returns dict[Hashable, Any]: the table'''
+    return local_cache.get(_get_cache_name(name))
+
+def invalidate(name: str) -> None:
+    '''Makes the tariff of the current tenant recompile on the next use'''
+    local_cache.invalidate(_get_cache_name(name))
+
+def _get_cache_name(name: str) -> str:
+    return f'shipping_tariff:{name}'
@@ -13,6 +13,7 @@ from app.models import Country
 from app.models.address import Address
 import app.orders.models.order as o
 from app.shipping import bp_api_admin, bp_api_user
+from app.shipping.availability import check_availability
 from app.shipping.models.box import default_box
 from app.shipping.models.shipping import Shipping
 from app.shipping.models.shipping_contact import ShippingContact
@@ -57,28 +58,35 @@ def get_shipping_methods(country_id, weight):
         if request.values.get("products")
         else []
     )
-    for shipping in shipping_methods:
-        if shipping.can_ship(country=country, weight=weight, products=product_ids):
-            result.append(shipping.to_dict())
-            logging.debug("%s can ship to %s", shipping, country)
+    availability = check_availability(shipping_methods, country, weight, product_ids)
+    for check in availability:
+        if check.available:
+            result.append(check.shipping.to_dict())
+            logging.debug("%s can ship to %s", check.shipping, country)
         else:
-            logging.debug("%s can't ship to %s", shipping, country)
+            logging.debug("%s can't ship to %s", check.shipping, country)
 
     logging.debug("Found shipping methods for %sg to %s:", weight, country_name)
     logging.debug(result)
     
     if len(result) > 0:
         sorted_result = sorted(result, key=itemgetter("name"))
-        cache.set(
-            "{}_shipping_methods_{}_{}_{}".format(
-                current_app.config['TENANT_NAME'], country_id, weight, 
-                md5(request.query_string).hexdigest()), 
-            sorted_result, timeout=86400)
+        # Result is incomplete if some checks haven't finished
+        if all(check.available is not None for check in availability):
+            cache.set(
+                "{}_shipping_methods_{}_{}_{}".format(
+                    current_app.config['TENANT_NAME'], country_id, weight, 
+                    md5(request.query_string).hexdigest()), 
+                sorted_result, timeout=86400)
         logging.debug("Returning shipping methods")
         logging.debug("Parameters: country=%s, weight=%s", country_name, weight)
         logging.debug("Query string: %s", request.query_string)
         logging.debug(sorted_result)
-        return jsonify(sorted_result)
+        response = jsonify(sorted_result)
+        response.headers['Server-Timing'] = ', '.join(
+            f'shipping-{check.shipping.id};dur={check.elapsed * 1000:.0f}'
+            for check in availability)
+        return response
     abort(
         Response(
             f"Couldn't find shipping method to send {weight}g parcel to {country_name}",
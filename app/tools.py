@@ -1,26 +1,31 @@
 ''' Handful tools '''
+import base64
 import enum
-from datetime import datetime
+from datetime import date, datetime
 from glob import glob
+import hashlib
 import itertools
 import json
 import logging
 import subprocess
-from functools import reduce
+from functools import reduce, wraps
 import os
 import os.path
 import re
 import lxml
 from lxml import etree #type:ignore
 import tempfile
+import time
 from time import sleep
-from typing import T, Any, Callable # type: ignore
+from typing import T, Any, Callable, NamedTuple, Optional # type: ignore
 
-from flask import current_app
+from flask import current_app, make_response, request
+from sqlalchemy import Date, DateTime, event, func, inspect as sa_inspect, literal, text, tuple_
 from werkzeug.datastructures import MultiDict
 
 from common.exceptions import FilterError, HTTPError
 
+from app import cache, db
 from app.models.base import BaseModel
 
 # logging.basicConfig(level=logging.INFO)
@@ -82,7 +87,21 @@ def get_po_path(*parts: str) -> str:
     """Absolute path to the PO-screenshots folder: DATA_PATH/po/[*parts]."""
     return get_data_path('po', *parts)
 
-def prepare_datatables_query(query, args, filter_clause=None) -> tuple[Any, int, int]:
+def prepare_datatables_query(query, args, filter_clause=None, keyset=None) -> tuple[Any, int, int]:
+    '''Applies DataTables filtering, sorting and paging to the query.
+    If `keyset` is provided and the client sent `cursor` argument the page is
+    selected by the position after the cursor instead of the offset
+    (keyset pagination). Such pages are sorted by the keyset only, in order
+    defined by the requested sorting or `cursor_dir` argument (`asc` or `desc`).
+    If the client requested sorting by other columns the offset is used.
+    Counts are carried by the cursor so they are calculated only on the first page.
+    Use `get_next_cursor()` to get the cursor of the next page
+
+    :param query: query to get records from
+    :param MultiDict args: DataTables arguments
+    :param keyset: columns, which values define position of the record unambiguously.
+        Without cursor they break ties of the requested sorting
+    :returns tuple: filtered query, total number of records and number of filtered records'''
     logger = logging.getLogger('prepare_datatables_query')
     def get_column(query, column_name):
         try:
@@ -95,7 +114,11 @@ def prepare_datatables_query(query, args, filter_clause=None) -> tuple[Any, int,
         raise AttributeError("Arguments aren't of MultiDict type")
     args = convert_datatables_args(args)
     columns = args.get('columns') or []
-    records_total = query.count()
+    keyset_direction = _get_keyset_direction(args, keyset)
+    is_keyset_page = keyset_direction is not None
+    cursor = _decode_cursor(args['cursor'], keyset, _get_filter_hash(args)) \
+        if is_keyset_page else None
+    records_total = cursor.records_total if cursor else get_count(query)
     query_filtered = query
     # Filtering .....
     target_model = query_filtered.column_descriptions[0]['entity']
@@ -117,7 +140,22 @@ def prepare_datatables_query(query, args, filter_clause=None) -> tuple[Any, int,
                             column.like('%' + column_data['search']['value'] + '%')) #type: ignore
                     except:
                         raise FilterError(f"Couldn't figure out how to filter the column '{column_name}' in the object {target_model}. Probably {target_model} has no get_filter() implemented or get_filter() doesn't filter by '{column_name}'")
-    records_filtered = query_filtered.count()
+    records_filtered = cursor.records_filtered if cursor else get_count(query_filtered)
+    if is_keyset_page:
+        is_descending = keyset_direction == 'desc'
+        position = [_get_keyset_expression(column) for column in keyset]
+        query_filtered = query_filtered.order_by(None).order_by(
+            *[column.desc() if is_descending else column for column in position])
+        if cursor:
+            cursor_position = tuple_(*[
+                literal(_get_null_substitute(column) if value is None else value)
+                for column, value in zip(keyset, cursor.values)])
+            query_filtered = query_filtered.filter(
+                tuple_(*position) < cursor_position if is_descending
+                else tuple_(*position) > cursor_position)
+        if args.get('length') is not None and int(args['length']) >= 0:
+            query_filtered = query_filtered.limit(args['length'])
+        return (query_filtered, records_total, records_filtered)
     # Sorting
     for sort_column_input in args.get('order') or []:
         sort_column_name = columns[int(sort_column_input['column'])]['data']
@@ -127,13 +165,282 @@ def prepare_datatables_query(query, args, filter_clause=None) -> tuple[Any, int,
             if sort_column_input['dir'] == 'desc':
                 sort_column = sort_column.desc()
             query_filtered = query_filtered.order_by(sort_column)
+    if keyset is not None:
+        # Records with equal sort values keep their order between pages
+        query_filtered = query_filtered.order_by(*keyset)
     # Limiting to page
-    if args.get('start') is not None and args.get('length') is not None:
+    if args.get('start') is not None and args.get('length') is not None \
+       and int(args['length']) >= 0:
         query_filtered = query_filtered.offset(args['start']) \
                                        .limit(args['length'])
 
     return (query_filtered, records_total, records_filtered)
 
+def get_count(query) -> int:
+    '''Returns number of records of the query.
+    Counts are cached for `DATATABLES_COUNT_CACHE_TIMEOUT` seconds (60 by default,
+    0 disables caching) by the model and the query's SQL and parameters, so
+    queries limited to a user are cached separately for each user.
+    Cached counts of the model are invalidated when its records are inserted
+    or deleted. If `DATATABLES_APPROXIMATE_COUNT_THRESHOLD` is set unfiltered
+    MySQL tables having more records are counted by the table statistics
+
+    :param query: query to count records of
+    :returns int: number of records'''
+    timeout = current_app.config.get('DATATABLES_COUNT_CACHE_TIMEOUT', 60)
+    if not timeout:
+        return _estimate_count(query) or query.count()
+    mapper = sa_inspect(query.column_descriptions[0]['entity'])
+    statement = query.order_by(None).statement.compile()
+    fingerprint = hashlib.md5(
+        (str(statement) + repr(sorted(statement.params.items()))).encode()
+    ).hexdigest()
+    key = f"{current_app.config.get('TENANT_NAME')}:datatables_count:" \
+          f"{mapper.base_mapper.class_.__name__}:" \
+          f"{cache.get(_get_count_version_key(mapper.base_mapper.class_.__name__))}:" \
+          f"{fingerprint}"
+    count = cache.get(key)
+    if count is None:
+        count = _estimate_count(query) or query.count()
+        cache.set(key, count, timeout=timeout)
+    return count
+
+def _estimate_count(query) -> Optional[int]:
+    '''Returns number of records of the unfiltered query by MySQL table statistics
+    if the table is larger than `DATATABLES_APPROXIMATE_COUNT_THRESHOLD`'''
+    threshold = current_app.config.get('DATATABLES_APPROXIMATE_COUNT_THRESHOLD')
+    mapper = sa_inspect(query.column_descriptions[0]['entity'])
+    if threshold is None or db.engine.dialect.name != 'mysql' \
+       or mapper.inherits is not None or query.whereclause is not None \
+       or len(query.statement.get_final_froms()) != 1:
+        return None
+    estimate = db.session.execute(
+        text("SELECT TABLE_ROWS FROM information_schema.TABLES "
+             "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = :table"),
+        {'table': mapper.local_table.name}
+    ).scalar()
+    return estimate if estimate is not None and estimate >= int(threshold) else None
+
+def _get_count_version_key(model_name: str) -> str:
+    return f"{current_app.config.get('TENANT_NAME')}:datatables_count_version:{model_name}"
+
+# Key of the session info, which holds names of models, which records were
+# inserted or deleted in the transaction
+_COUNTS_TO_INVALIDATE = 'datatables_counts_to_invalidate'
+
+@event.listens_for(db.session, 'after_flush')
+def _on_after_flush(session, _flush_context):
+    for instance in itertools.chain(session.new, session.deleted):
+        session.info.setdefault(_COUNTS_TO_INVALIDATE, set()).add(
+            sa_inspect(instance).mapper.base_mapper.class_.__name__)
+
+@event.listens_for(db.session, 'after_commit')
+def _on_after_commit(session):
+    for model_name in session.info.pop(_COUNTS_TO_INVALIDATE, set()):
+        cache.set(_get_count_version_key(model_name), time.time_ns(), timeout=0)
+
+@event.listens_for(db.session, 'after_soft_rollback')
+def _on_after_soft_rollback(session, _previous_transaction):
+    session.info.pop(_COUNTS_TO_INVALIDATE, None)
+    session.info.pop(_CHANGED_MODELS, None)
+
+# Key of the session info, which holds names of models, which records were
+# changed in the transaction
+_CHANGED_MODELS = 'changed_models'
+# Names of models responses of conditional routes are made of
+_watched_models: set[str] = set()
+
+def _get_model_name(model) -> str:
+    return model if isinstance(model, str) \
+        else sa_inspect(model).base_mapper.class_.__name__
+
+def _get_change_version_key(model_name: str) -> str:
+    return f"{current_app.config.get('TENANT_NAME')}:change_version:{model_name}"
+
+def watch_changes(*models) -> None:
+    '''Starts tracking changes of the models' records, which `get_change_tag()`
+    is derived from. Versions of the models are changed when a session is committed
+
+    :param models: model classes or their names'''
+    _watched_models.update(_get_model_name(model) for model in models)
+
+def get_change_tag(*models) -> str:
+    '''Returns a tag of the models' data, which changes whenever records
+    of any of the models are changed. Changes of the models must be watched
+    by `watch_changes()`. Versions of the models are kept in the cache, which
+    must be shared by all processes as with `CACHE_MEMCACHED_SERVERS`.
+    A version missing in the cache is set anew, so earlier tags don't match it
+
+    :param models: model classes or their names
+    :returns str: the tag'''
+    keys = [_get_change_version_key(name)
+            for name in sorted({_get_model_name(model) for model in models})]
+    versions = cache.get_many(*keys)
+    for idx, key in enumerate(keys):
+        if versions[idx] is None:
+            cache.add(key, time.time_ns(), timeout=0)
+            versions[idx] = cache.get(key)
+    if None in versions:
+        # The cache doesn't keep versions so the tag can't be trusted
+        return f'unversioned:{time.time_ns()}'
+    return ':'.join(str(version) for version in versions)
+
+def mark_changed(*models) -> None:
+    '''Changes versions of the models when the session is committed.
+    Is needed for changes made by textual SQL, which aren't tracked by the session
+
+    :param models: model classes or their names'''
+    db.session.info.setdefault(_CHANGED_MODELS, set()).update(
+        name for name in map(_get_model_name, models) if name in _watched_models)
+
+def conditional_get(*models):
+    '''Makes GET responses of the route conditional. The ETag of the response
+    is derived from versions of the models, the user and the request URL,
+    so a request with the matching `If-None-Match` is answered with 304 before
+    the route runs. The ETag is weak as the route may serve the same data
+    in different encodings. Versions of the models are changed when a session
+    is committed
+
+    :param models: model classes or their names, which the response is made of'''
+    watch_changes(*models)
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return func(*args, **kwargs)
+            from flask_security import current_user
+            etag = hashlib.md5(
+                f"{get_change_tag(*models)}:{current_user.get_id()}:{request.full_path}"
+                .encode()).hexdigest()
+            if request.if_none_match.contains_weak(etag):
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(func(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return wrapper
+    return decorator
+
+@event.listens_for(db.session, 'after_flush')
+def _on_after_flush_track_changes(session, _flush_context):
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        model_name = _get_model_name(type(instance))
+        if model_name not in _watched_models \
+           or (instance in session.dirty and not session.is_modified(instance)):
+            continue
+        session.info.setdefault(_CHANGED_MODELS, set()).add(model_name)
+
+@event.listens_for(db.session, 'do_orm_execute')
+def _on_orm_execute(orm_execute_state):
+    if (orm_execute_state.is_update or orm_execute_state.is_delete) \
+       and orm_execute_state.bind_mapper is not None:
+        model_name = _get_model_name(orm_execute_state.bind_mapper.class_)
+        if model_name in _watched_models:
+            orm_execute_state.session.info.setdefault(_CHANGED_MODELS, set()).add(model_name)
+
+@event.listens_for(db.session, 'after_commit')
+def _on_after_commit_change_versions(session):
+    changed_models = session.info.pop(_CHANGED_MODELS, set())
+    if len(changed_models) > 0:
+        cache.set_many({_get_change_version_key(name): time.time_ns()
+                        for name in changed_models}, timeout=0)
+
+def _get_keyset_direction(args: dict, keyset) -> Optional[str]:
+    '''Returns direction (`asc` or `desc`) of the keyset pagination page.
+    Returns None if keyset pagination wasn't requested or the requested
+    sorting can't be served by the keyset'''
+    if keyset is None or args.get('cursor') is None:
+        return None
+    columns = args.get('columns') or []
+    sorting = [(columns[int(sort_column_input['column'])]['data'], sort_column_input['dir'])
+               for sort_column_input in args.get('order') or []
+               if columns[int(sort_column_input['column'])]['data'] != '']
+    if len(sorting) == 0:
+        return 'desc' if args.get('cursor_dir') == 'desc' else 'asc'
+    if len({direction for _, direction in sorting}) == 1 and \
+       [column for column, _ in sorting] == [column.key for column in keyset[:len(sorting)]]:
+        return 'desc' if sorting[0][1] == 'desc' else 'asc'
+    return None
+
+def _get_keyset_expression(column):
+    '''Returns the expression to sort and compare the keyset column by.
+    NULLs are replaced as row values comparisons skip them'''
+    if not getattr(column.expression, 'nullable', True):
+        return column
+    return func.coalesce(column, literal(_get_null_substitute(column)))
+
+def _get_null_substitute(column):
+    '''Returns the value, which is less than any value of the column,
+    so NULLs are sorted first like without keyset pagination'''
+    if isinstance(column.type, DateTime):
+        return datetime(1000, 1, 1)
+    if isinstance(column.type, Date):
+        return date(1000, 1, 1)
+    if column.type.python_type is str:
+        return ''
+    return -2 ** 63
+
+class _Cursor(NamedTuple):
+    '''Position of the last record of the keyset pagination page'''
+    values: list
+    records_total: int
+    records_filtered: int
+
+def get_next_cursor(entities: list, keyset, args, records_total: int,
+                    records_filtered: int) -> Optional[str]:
+    '''Returns the cursor of the page following the page of the entities.
+    The cursor is returned only if the client requested keyset pagination
+    and there might be more records
+
+    :param list entities: records of the current page
+    :param keyset: columns the page was selected by
+    :param MultiDict args: DataTables arguments
+    :param int records_total: total number of records
+    :param int records_filtered: number of filtered records
+    :returns Optional[str]: opaque cursor to be sent back to get the next page'''
+    args = convert_datatables_args(args)
+    if _get_keyset_direction(args, keyset) is None or len(entities) == 0 or \
+       (args.get('length') is not None and
+        not 0 <= int(args['length']) <= len(entities)):
+        return None
+    values = [getattr(entities[-1], column.key) for column in keyset]
+    cursor = {
+        'values': [value.isoformat() if isinstance(value, (date, datetime)) else value
+                   for value in values],
+        'total': records_total,
+        'filtered': records_filtered,
+        'filter': _get_filter_hash(args)
+    }
+    return base64.urlsafe_b64encode(json.dumps(cursor).encode()).decode()
+
+def _decode_cursor(encoded_cursor: str, keyset, filter_hash: str) -> Optional[_Cursor]:
+    '''Returns the position encoded by `get_next_cursor()`. Returns None
+    for the first page or if the filter was changed since the cursor was made'''
+    if encoded_cursor == '':
+        return None
+    try:
+        cursor = json.loads(base64.urlsafe_b64decode(encoded_cursor.encode()))
+        if cursor['filter'] != filter_hash:
+            return None
+        values = [
+            None if value is None else
+            datetime.fromisoformat(value) if isinstance(column.type, DateTime) else
+            date.fromisoformat(value) if isinstance(column.type, Date) else value
+            for column, value in zip(keyset, cursor['values'], strict=True)]
+        return _Cursor(values, cursor['total'], cursor['filtered'])
+    except (ValueError, TypeError, KeyError) as ex:
+        raise FilterError(f"Invalid cursor '{encoded_cursor}'") from ex
+
+def _get_filter_hash(args: dict) -> str:
+    '''Returns fingerprint of the arguments, which define set of records'''
+    filter_args = {key: value for key, value in args.items()
+                   if key not in ('_', 'draw', 'start', 'length', 'order',
+                                  'cursor', 'cursor_dir')}
+    return hashlib.md5(json.dumps(filter_args, sort_keys=True, default=str).encode()).hexdigest()
+
 def convert_datatables_args(raw_args):
     def set_value(args_dict, keys, value):
         if len(keys) == 1:
@@ -171,6 +478,28 @@ def convert_datatables_args(raw_args):
     make_arrays(args)
     return args
 
+def get_model_extensions(list_signal, signal, entities: list, **kwargs) -> dict[Any, dict]:
+    '''Collects module specific parts of the entities' dictionary representations.
+    Modules contribute either for all entities at once via `list_signal`
+    by returning parts by entity ID or for each entity via `signal`
+
+    :param list_signal: signal sent once with the list of entities
+    :param signal: signal sent for each entity
+    :param list entities: entities to get parts for
+    :returns dict: merged module specific parts by entity ID'''
+    result: dict[Any, dict] = {entity.id: {} for entity in entities}
+    if len(result) == 0:
+        return result
+    for _receiver, extensions in list_signal.send(entities, **kwargs):
+        for entity_id, extension in (extensions or {}).items():
+            if entity_id in result:
+                result[entity_id].update(extension)
+    if signal.receivers:
+        for entity in entities:
+            for _receiver, extension in signal.send(entity, **kwargs):
+                result[entity.id].update(extension)
+    return result
+
 def modify_object(entity: BaseModel, payload: dict[str, Any], 
                   editable_attributes: list[str]) -> BaseModel:
     for attr in editable_attributes:
@@ -0,0 +1,57 @@
+"""Add search index
+
+Revision ID: a6b7c8d9e0f1
+Revises: f5a6b7c8d9e0
+Create Date: 2026-10-18
+
+Run `flask rebuild-search-index` after upgrade to fill the index
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import mysql
+
+revision = 'a6b7c8d9e0f1'
+down_revision = 'f5a6b7c8d9e0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_search',
+        sa.Column('id', sa.String(length=16), nullable=False),
+        sa.Column('text', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['id'], ['orders.id'], ondelete='CASCADE',
+                                onupdate='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_search_text', 'order_search', ['text'],
+                    mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    op.create_table('order_product_search',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('order_id', sa.String(length=16), nullable=True),
+        sa.Column('text', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['id'], ['order_products.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_product_search_order_id'), 'order_product_search',
+                    ['order_id'])
+    op.create_index('ix_order_product_search_text', 'order_product_search', ['text'],
+                    mysql_prefix='FULLTEXT', mysql_with_parser='ngram')
+    op.create_table('search_trigrams',
+        sa.Column('kind', sa.String(length=16), nullable=False),
+        sa.Column('trigram', sa.String(length=3).with_variant(
+            mysql.VARCHAR(length=3, collation='utf8mb4_bin'), 'mysql'), nullable=False),
+        sa.Column('entity_id', sa.String(length=20), nullable=False),
+        sa.PrimaryKeyConstraint('kind', 'trigram', 'entity_id')
+    )
+    op.create_index('ix_search_trigrams_entity', 'search_trigrams', ['kind', 'entity_id'])
+
+
+def downgrade():
+    op.drop_index('ix_search_trigrams_entity', table_name='search_trigrams')
+    op.drop_table('search_trigrams')
+    op.drop_index('ix_order_product_search_text', table_name='order_product_search')
+    op.drop_index(op.f('ix_order_product_search_order_id'), table_name='order_product_search')
+    op.drop_table('order_product_search')
+    op.drop_index('ix_order_search_text', table_name='order_search')
+    op.drop_table('order_search')
@@ -0,0 +1,28 @@
+"""Add normalized ID of products
+
+Revision ID: b7c8d9e0f1a2
+Revises: a6b7c8d9e0f1
+Create Date: 2026-10-18
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'b7c8d9e0f1a2'
+down_revision = 'a6b7c8d9e0f1'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('normalized_id', sa.String(length=16), nullable=True))
+    op.create_index(op.f('ix_products_normalized_id'), 'products', ['normalized_id'])
+    if op.get_bind().dialect.name == 'mysql':
+        op.execute("UPDATE products SET normalized_id = TRIM(LEADING '0' FROM TRIM(id))")
+    else:
+        op.execute("UPDATE products SET normalized_id = LTRIM(TRIM(id), '0')")
+
+
+def downgrade():
+    op.drop_index(op.f('ix_products_normalized_id'), table_name='products')
+    op.drop_column('products', 'normalized_id')
@@ -0,0 +1,34 @@
+"""Add EMS rates
+
+Revision ID: c8d9e0f1a2b3
+Revises: b7c8d9e0f1a2
+Create Date: 2026-10-18
+
+Rates are fetched by the `prefetch_ems_rates` job
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'c8d9e0f1a2b3'
+down_revision = 'b7c8d9e0f1a2'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shipping_ems_rates',
+        sa.Column('service', sa.String(length=8), nullable=False),
+        sa.Column('country_id', sa.String(length=2), nullable=False),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.Column('rate', sa.Integer(), nullable=True),
+        sa.Column('price', sa.Integer(), nullable=True),
+        sa.Column('when_created', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('service', 'country_id', 'weight')
+    )
+    op.create_index(op.f('ix_shipping_ems_rates_when_created'), 'shipping_ems_rates',
+                    ['when_created'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_shipping_ems_rates_when_created'), table_name='shipping_ems_rates')
+    op.drop_table('shipping_ems_rates')
@@ -0,0 +1,39 @@
+"""Add FedEx availability
+
+Revision ID: d9e0f1a2b3c4
+Revises: c8d9e0f1a2b3
+Create Date: 2026-10-18
+
+Availability is stored on FedEx checks and by the `warm_up_fedex_availability` job
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'd9e0f1a2b3c4'
+down_revision = 'c8d9e0f1a2b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('shipping_fedex_availability',
+        sa.Column('country_id', sa.String(length=2), nullable=False),
+        sa.Column('postcode_prefix', sa.String(length=9), nullable=False),
+        sa.Column('weight_class', sa.Integer(), nullable=False),
+        sa.Column('services', sa.Text(), nullable=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=True),
+        sa.Column('when_created', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('country_id', 'postcode_prefix', 'weight_class')
+    )
+    op.create_index(op.f('ix_shipping_fedex_availability_expires_at'),
+                    'shipping_fedex_availability', ['expires_at'])
+    op.create_index(op.f('ix_shipping_fedex_availability_when_created'),
+                    'shipping_fedex_availability', ['when_created'])
+
+
+def downgrade():
+    op.drop_index(op.f('ix_shipping_fedex_availability_when_created'),
+                  table_name='shipping_fedex_availability')
+    op.drop_index(op.f('ix_shipping_fedex_availability_expires_at'),
+                  table_name='shipping_fedex_availability')
+    op.drop_table('shipping_fedex_availability')
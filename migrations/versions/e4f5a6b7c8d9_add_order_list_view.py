@@ -0,0 +1,58 @@
+"""Add order_list_view
+
+Revision ID: e4f5a6b7c8d9
+Revises: a1b2c3d4e5f6
+Create Date: 2026-10-18
+
+The table is populated by `flask rebuild-order-list-view`
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'e4f5a6b7c8d9'
+down_revision = 'a1b2c3d4e5f6'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_list_view',
+        sa.Column('id', sa.String(length=16), nullable=False),
+        sa.Column('user_id', sa.Integer(), nullable=True),
+        sa.Column('user', sa.String(length=32), nullable=True),
+        sa.Column('customer_name', sa.String(length=64), nullable=True),
+        sa.Column('comment', sa.String(length=65536), nullable=True),
+        sa.Column('tracking_id', sa.String(length=64), nullable=True),
+        sa.Column('status', sa.Enum('draft', 'pending', 'can_be_paid', 'po_created',
+                                    'packed', 'shipped', 'cancelled', 'ready_to_ship',
+                                    'at_warehouse', 'shipment_is_paid',
+                                    name='orderstatus'), nullable=True),
+        sa.Column('country_id', sa.String(length=2), nullable=True),
+        sa.Column('shipping_method_id', sa.Integer(), nullable=True),
+        sa.Column('payment_method_id', sa.Integer(), nullable=True),
+        sa.Column('invoice_export_id', sa.String(length=32), nullable=True),
+        sa.Column('subtotal_krw', sa.Integer(), nullable=True),
+        sa.Column('shipping_krw', sa.Integer(), nullable=True),
+        sa.Column('total_krw', sa.Integer(), nullable=True),
+        sa.Column('payment_pending', sa.Boolean(), nullable=True),
+        sa.Column('purchase_date', sa.DateTime(), nullable=True),
+        sa.Column('purchase_date_sort', sa.DateTime(), nullable=True),
+        sa.Column('when_po_posted', sa.DateTime(), nullable=True),
+        sa.Column('when_created', sa.DateTime(), nullable=True),
+        sa.Column('when_changed', sa.DateTime(), nullable=True),
+        sa.Column('data', sa.JSON(), nullable=True),
+        sa.ForeignKeyConstraint(['id'], ['orders.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_order_list_view_user_id'), 'order_list_view', ['user_id'], unique=False)
+    op.create_index(op.f('ix_order_list_view_status'), 'order_list_view', ['status'], unique=False)
+    op.create_index(op.f('ix_order_list_view_purchase_date_sort'), 'order_list_view', ['purchase_date_sort'], unique=False)
+    op.create_index(op.f('ix_order_list_view_when_created'), 'order_list_view', ['when_created'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_order_list_view_when_created'), table_name='order_list_view')
+    op.drop_index(op.f('ix_order_list_view_purchase_date_sort'), table_name='order_list_view')
+    op.drop_index(op.f('ix_order_list_view_status'), table_name='order_list_view')
+    op.drop_index(op.f('ix_order_list_view_user_id'), table_name='order_list_view')
+    op.drop_table('order_list_view')
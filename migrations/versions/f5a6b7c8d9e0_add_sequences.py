@@ -0,0 +1,27 @@
+"""Add sequences
+
+Revision ID: f5a6b7c8d9e0
+Revises: e4f5a6b7c8d9
+Create Date: 2026-10-18
+
+Counters are seeded by existing IDs on first use
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = 'f5a6b7c8d9e0'
+down_revision = 'e4f5a6b7c8d9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sequences',
+        sa.Column('name', sa.String(length=32), nullable=False),
+        sa.Column('value', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+
+def downgrade():
+    op.drop_table('sequences')
@@ -1,10 +1,11 @@
+from contextlib import contextmanager
 import sys
 from typing import Optional
 from unittest import TestCase
 # import unittest
 #unittest.TestCase.run = lambda self,*args,**kw: unittest.TestCase.debug(self)
-from sqlalchemy import text
-from app import db, create_app
+from sqlalchemy import event, text
+from app import cache, db, create_app, local_cache
 
 from app.orders.models.subcustomer import Subcustomer
 from app.orders.models.suborder import Suborder
@@ -33,6 +34,8 @@ class BaseTestCase(TestCase):
 
     def tearDown(self):
         db.drop_all()
+        cache.clear()
+        local_cache.clear()
         self._ctx.pop()  # Pop the request context
         self._app_ctx.pop() # Pop the application context
 
@@ -81,6 +84,18 @@ class BaseTestCase(TestCase):
     def logout(self):
         return self.client.get('/logout')
 
+    @contextmanager
+    def count_queries(self):
+        '''Collects SQL statements executed within the context'''
+        statements = []
+        def before_cursor_execute(_conn, _cursor, statement, *_args):
+            statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', before_cursor_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', before_cursor_execute)
+
     def try_add_entity(self, entity):
         try:
             db.session.add(entity) #type:ignore
@@ -3,6 +3,7 @@ from datetime import datetime
 from app.currencies.models.currency_history_entry import CurrencyHistoryEntry
 from app.users.models.role import Role
 from app.users.models.user import User
+from app.currencies import reference
 from app.currencies.models import Currency
 from tests import BaseTestCase, db
 
@@ -71,4 +72,42 @@ class TestCurrencyClient(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         currency = db.session.get(Currency, gen_id)
         self.assertEqual(currency, None)
-    
\ No newline at end of file
+    
+    def test_get_historical_rate(self):
+        currency = Currency(code='USD', name='Dollar', rate=3)
+        self.try_add_entities([
+            currency,
+            CurrencyHistoryEntry(code='USD', rate=1, when_created=datetime(2026, 1, 1)),
+            CurrencyHistoryEntry(code='USD', rate=2, when_created=datetime(2026, 2, 1))
+        ])
+        self.assertEqual(currency.get_rate(datetime(2025, 12, 1)), 3)
+        with self.count_queries() as statements:
+            self.assertEqual(currency.get_rate(datetime(2026, 1, 15)), 1)
+            self.assertEqual(currency.get_rate(datetime(2026, 2, 1)), 2)
+            self.assertEqual(currency.get_rate(datetime(2026, 2, 1).date()), 2)
+            self.assertEqual(currency.get_rate(), 2)
+        self.assertEqual(len(statements), 0)
+
+        self.try_add_entity(
+            CurrencyHistoryEntry(code='USD', rate=4, when_created=datetime(2026, 1, 10)))
+        self.assertEqual(currency.get_rate(datetime(2026, 1, 15)), 4)
+
+    def test_cached_currencies(self):
+        self.try_add_entities([
+            Currency(code='KRW', name='Won', rate=1, enabled=True, base=True),
+            Currency(code='USD', name='Dollar', rate=0.001, enabled=False)
+        ])
+        self.assertEqual([currency.code for currency in reference.get_enabled_currencies()],
+                         ['KRW'])
+        self.assertEqual(Currency.get_base_currency('default').code, 'KRW')
+        with self.count_queries() as statements:
+            base = Currency.get_base_currency('default')
+            self.assertEqual(base.code, 'KRW')
+            self.assertEqual(float(base.rate), 1)
+        self.assertEqual(len(statements), 0)
+        self.assertIs(base, db.session.get(Currency, 'KRW'))
+
+        self.try_admin_operation(
+            lambda: self.client.post('/api/v1/admin/currency/USD', json={'enabled': True}))
+        self.assertEqual([currency.code for currency in reference.get_enabled_currencies()],
+                         ['KRW', 'USD'])
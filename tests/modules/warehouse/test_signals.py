@@ -62,3 +62,28 @@ class TestWarehouseApi(BaseTestCase):
         self.assertEqual(res.status_code, 200)
         warehouse_product = db.session.get(WarehouseProduct, (gen_int_id, '0001'))
         self.assertEqual(warehouse_product.quantity, 5)
+
+    def test_get_order_products_with_warehouse(self):
+        self.try_add_entities(([
+            Product(id='0001', name='Product 1', price=10, weight=10),
+            Country(id='c1'),
+            Currency(code='USD', rate=0.5)
+        ]))
+        order = Order(id='ORD-test-warehouse', user=self.user,
+                      status=OrderStatus.pending, country_id='c1')
+        suborder = Suborder(order=order)
+        self.try_add_entities([
+            order, suborder, Warehouse(id=1, name='Test WH')
+        ] + [
+            OrderProduct(id=i, suborder=suborder, product_id='0001', quantity=1)
+            for i in range(1, 6)
+        ])
+        self.try_add_entity(OrderProductWarehouse(order_product_id=1, warehouse_id=1))
+        db.session.expire_all()
+        order_products = OrderProduct.query.order_by(OrderProduct.id).all()
+        with self.count_queries() as statements:
+            result = OrderProduct.to_dict_list(order_products)
+        self.assertEqual([op['warehouse'] for op in result],
+                         ['Test WH', None, None, None, None])
+        self.assertEqual(
+            len([s for s in statements if 'order_products_warehouses' in s]), 1)
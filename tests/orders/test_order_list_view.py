@@ -0,0 +1,219 @@
+'''
+Tests of the denormalized orders list
+'''
+from datetime import datetime
+
+from sqlalchemy import update
+
+from tests import BaseTestCase, db
+from app.currencies.models import Currency
+from app.invoices.models.invoice import Invoice
+from app.network.models.node import Node
+from app.models import Country
+from app.orders.list_view import rebuild
+from app.orders.models.order import Order
+from app.orders.models.order_list_entry import OrderListEntry
+from app.orders.models.order_status import OrderStatus
+from app.orders.models.subcustomer import Subcustomer
+from app.orders.models.suborder import Suborder
+from app.orders.totals import update_totals
+from app.payments.models.payment import Payment, PaymentStatus
+from app.purchase.models import Company, PurchaseOrder
+from app.settings.models.setting import Setting
+from app.shipping.models.shipping import NoShipping
+from app.users.models.role import Role
+from app.users.models.user import User
+
+class TestOrderListView(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        admin_role = Role(name='admin')
+        self.user = User(
+            username='user1_test_order_list_view',
+            email='user1_test_order_list_view@name.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True)
+        self.admin = User(
+            username='root_test_order_list_view',
+            email='root_test_order_list_view@name.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True,
+            roles=[admin_role])
+        self.try_add_entities([
+            self.user, self.admin, admin_role,
+            Country(id='c1', name='country1'),
+            Currency(code='USD', rate=0.5),
+            NoShipping(id=999),
+            Subcustomer(id=1, username='A000', name='Subcustomer'),
+            Setting(key='check_outsiders', value='1')
+        ])
+
+    def _make_order(self, order_id, **kwargs):
+        order = Order(id=order_id, user=self.user, country_id='c1',
+                      shipping_method_id=999, status=OrderStatus.pending,
+                      purchase_date=datetime(2026, 1, 1), **kwargs)
+        Suborder(id=order_id.replace('ORD', 'SOS'), order=order, subcustomer_id=1)
+        self.try_add_entity(order)
+        update_totals([order])
+        db.session.commit()
+        return db.session.get(Order, order_id)
+
+    def _get_list(self, query=''):
+        return self.client.get(
+            '/api/v1/admin/order?draw=1&search[value]=&columns[0][data]=id' +
+            '&columns[0][name]=id&columns[0][search][value]=' + query)
+
+    def test_entry_follows_order(self):
+        order = self._make_order('ORD-2601-0001', customer_name='Customer 1')
+        entry = db.session.get(OrderListEntry, order.id)
+        self.assertEqual(entry.user, self.user.username)
+        self.assertEqual(entry.data['country']['name'], 'country1')
+        self.assertEqual(entry.data['shipping']['id'], 999)
+
+        order.customer_name = 'Customer 2'
+        order.set_status(OrderStatus.packed, actor=self.admin)
+        db.session.commit()
+        entry = db.session.get(OrderListEntry, order.id)
+        self.assertEqual(entry.customer_name, 'Customer 2')
+        self.assertEqual(entry.status, OrderStatus.packed)
+        self.assertEqual(entry.data['status'], 'packed')
+
+        db.session.delete(order)
+        db.session.commit()
+        self.assertIsNone(db.session.get(OrderListEntry, 'ORD-2601-0001'))
+
+    def test_entry_follows_purchase_orders_and_payments(self):
+        order = self._make_order('ORD-2601-0001')
+        company = Company(id=1, name='Company')
+        self.try_add_entity(company)
+        when_posted = datetime(2026, 1, 2, 10, 0, 0)
+        self.try_add_entity(PurchaseOrder(
+            suborder=order.suborders[0], customer_id=1, company=company,
+            when_posted=when_posted))
+        entry = db.session.get(OrderListEntry, order.id)
+        self.assertEqual(entry.when_po_posted, when_posted)
+        self.assertEqual(entry.data['when_po_posted'], '2026-01-02 10:00:00')
+
+        payment = Payment(user=self.user, orders=[order], status=PaymentStatus.pending,
+                          amount_sent_original=1, currency_code='USD')
+        self.try_add_entity(payment)
+        self.assertTrue(db.session.get(OrderListEntry, order.id).payment_pending)
+        payment.status = PaymentStatus.cancelled
+        db.session.commit()
+        self.assertFalse(db.session.get(OrderListEntry, order.id).payment_pending)
+
+    def test_entry_follows_packer(self):
+        order = self._make_order('ORD-2601-0001')
+        res = self.try_admin_operation(
+            lambda: self.client.post(f'/api/v1/admin/order/packer/{order.id}',
+                                     json={'packer': 'Packer 1'}))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(db.session.get(OrderListEntry, order.id).data['packer'], 'Packer 1')
+
+    def test_entry_follows_related_entities(self):
+        invoice = Invoice(id='INV-2601-0001', currency_code='USD')
+        self.try_add_entity(invoice)
+        order = self._make_order('ORD-2601-0001', invoice=invoice)
+        self.try_add_entity(Node(id='A000', name='Node'))
+        entry = db.session.get(OrderListEntry, order.id)
+        self.assertEqual(entry.data['outsiders'], [])
+
+        invoice.export_id = 'EXP-1'
+        self.user.username = 'user2_test_order_list_view'
+        db.session.get(Subcustomer, 1).name = 'Subcustomer 2'
+        db.session.commit()
+        entry = db.session.get(OrderListEntry, order.id)
+        self.assertEqual(entry.invoice_export_id, 'EXP-1')
+        self.assertEqual(entry.user, 'user2_test_order_list_view')
+
+        db.session.delete(db.session.get(Node, 'A000'))
+        db.session.commit()
+        self.assertEqual(db.session.get(OrderListEntry, order.id).data['outsiders'],
+                         ['A000:Subcustomer 2'])
+
+    def test_rebuild(self):
+        self._make_order('ORD-2601-0001')
+        self._make_order('ORD-2601-0002')
+        db.session.execute(OrderListEntry.__table__.delete())
+        db.session.commit()
+        self.assertEqual(OrderListEntry.query.count(), 0)
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(OrderListEntry.query.count(), 2)
+
+    def test_get_orders_list(self):
+        self._make_order('ORD-2601-0001')
+        self._make_order('ORD-2601-0002')
+        res = self.try_admin_operation(self._get_list)
+        self.assertEqual(res.json['recordsTotal'], 2)
+        expected = Order.to_dict_list([db.session.get(Order, 'ORD-2601-0001')])[0]
+        row = res.json['data'][0]
+        self.assertEqual(row, {key: expected[key] for key in row})
+        res = self._get_list('0002')
+        self.assertEqual(res.json['recordsFiltered'], 1)
+        self.assertEqual(res.json['data'][0]['id'], 'ORD-2601-0002')
+
+    def test_get_orders_list_by_cursor(self):
+        for i in range(1, 4):
+            self._make_order(f'ORD-2601-000{i}')
+        self.try_admin_operation(self._get_list)
+        url = '/api/v1/admin/order?draw=1&search[value]=&length=2&cursor='
+        res = self.client.get(url)
+        self.assertEqual([row['id'] for row in res.json['data']],
+                         ['ORD-2601-0001', 'ORD-2601-0002'])
+        with self.count_queries() as statements:
+            res = self.client.get(url + res.json['cursor'])
+        self.assertEqual([row['id'] for row in res.json['data']], ['ORD-2601-0003'])
+        self.assertEqual(res.json['recordsTotal'], 3)
+        self.assertIsNone(res.json['cursor'])
+        self.assertEqual(len([s for s in statements if 'count(' in s]), 0)
+
+        res = self.client.get(url + '&cursor_dir=desc')
+        self.assertEqual([row['id'] for row in res.json['data']],
+                         ['ORD-2601-0003', 'ORD-2601-0002'])
+
+    def test_get_orders_list_by_cursor_with_nulls(self):
+        for i in range(1, 4):
+            self._make_order(f'ORD-2601-000{i}')
+        db.session.execute(update(OrderListEntry)
+            .where(OrderListEntry.id != 'ORD-2601-0002')
+            .values(purchase_date_sort=None))
+        db.session.commit()
+        self.try_admin_operation(self._get_list)
+        url = '/api/v1/admin/order?draw=1&search[value]=&length=1&cursor='
+        ids = []
+        res = self.client.get(url)
+        while res.json['cursor'] is not None:
+            ids += [row['id'] for row in res.json['data']]
+            res = self.client.get(url + res.json['cursor'])
+        ids += [row['id'] for row in res.json['data']]
+        self.assertEqual(ids, ['ORD-2601-0001', 'ORD-2601-0003', 'ORD-2601-0002'])
+
+    def test_get_orders_list_by_cursor_sorted_by_column(self):
+        for i in range(1, 4):
+            self._make_order(f'ORD-2601-000{i}')
+        url = '/api/v1/admin/order?draw=1&search[value]=&columns[0][data]=id' \
+              '&columns[0][search][value]=&order[0][column]=0&order[0][dir]=desc' \
+              '&cursor=&start=1&length=1'
+        res = self.try_admin_operation(lambda: self.client.get(url))
+        self.assertEqual([row['id'] for row in res.json['data']], ['ORD-2601-0002'])
+        self.assertIsNone(res.json['cursor'])
+
+        res = self.client.get(
+            '/api/v1/admin/order?draw=1&search[value]=&length=-1&cursor=')
+        self.assertEqual(len(res.json['data']), 3)
+        self.assertIsNone(res.json['cursor'])
+
+    def test_get_orders_list_counts_are_cached(self):
+        self._make_order('ORD-2601-0001')
+        res = self.try_admin_operation(self._get_list)
+        self.assertEqual(res.json['recordsTotal'], 1)
+        with self.count_queries() as statements:
+            res = self._get_list()
+        self.assertEqual(res.json['recordsTotal'], 1)
+        self.assertEqual(len([s for s in statements if 'count(' in s]), 0)
+
+        self._make_order('ORD-2601-0002')
+        res = self._get_list()
+        self.assertEqual(res.json['recordsTotal'], 2)
+        self.assertEqual(res.json['recordsFiltered'], 2)
@@ -1,15 +1,22 @@
 """
 Tests for Order model currency methods (Subtask 1: DB Migration + Order Model Refactor)
 """
+from datetime import datetime
+from unittest.mock import patch
+
 from tests import BaseTestCase, db
 from app.currencies.models import Currency
 from app.models.country import Country
 from app.orders.models.order import Order
 from app.orders.models.order_status import OrderStatus
-from app.orders.models.order_product import OrderProduct
+from app.orders.models.order_product import OrderProduct, OrderProductStatus
 from app.orders.models.subcustomer import Subcustomer
 from app.orders.models.suborder import Suborder
+from app.orders.totals import backfill_missing_totals, mark_for_update, \
+    update_marked_totals, update_totals
 from app.products.models import Product
+from app.purchase.models import PurchaseOrder
+from app.settings.models import Setting
 from app.shipping.models.shipping import NoShipping, Shipping, ShippingRate
 from app.users.models.user import User
 
@@ -198,3 +205,262 @@ class TestOrderModelCurrency(BaseTestCase):
         # Base currency — user_currency amounts should be 0 (no conversion needed)
         self.assertEqual(float(order.subtotal_user_currency), 0.0)
         self.assertEqual(float(order.total_user_currency), 0.0)
+
+
+class TestOrderListSerialization(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        self.user = User(
+            username='test_order_list_user',
+            email='test_order_list@test.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True,
+        )
+        self.try_add_entities([
+            Currency(code='KRW', rate=1, base=True),
+            Currency(code='USD', rate=0.001),
+            self.user,
+            Country(id='c1', name='country1'),
+            Shipping(id=1, name='Shipping1'),
+            ShippingRate(shipping_method_id=1, destination='c1', weight=10000, rate=100),
+            Product(id='L001', name='Product 1', price=10000, weight=100),
+            Setting(key='check_outsiders', value='1'),
+            Subcustomer(username='s1', name='Internal', password='1', in_network=True),
+            Subcustomer(username='s2', name='Outsider', password='2', in_network=False),
+        ])
+
+    def _make_orders(self, count):
+        subcustomers = Subcustomer.query.order_by(Subcustomer.id).all()
+        orders = []
+        for seq in range(count):
+            order = Order(user=self.user, status=OrderStatus.pending,
+                          country_id='c1', shipping_method_id=1,
+                          user_currency_code='USD')
+            order.params['shipping.code'] = str(seq)
+            db.session.add(order)
+            for subcustomer in subcustomers:
+                suborder = Suborder(order=order, subcustomer=subcustomer)
+                db.session.add(suborder)
+                db.session.add(OrderProduct(
+                    suborder=suborder, product_id='L001', quantity=seq + 1))
+                db.session.flush()
+                db.session.add(PurchaseOrder(
+                    suborder, when_posted=datetime(2024, 1, seq + 1)))
+            order.update_total()
+            db.session.commit()
+            orders.append(order)
+        return orders
+
+    def test_to_dict_list_same_as_to_dict(self):
+        orders = self._make_orders(3)
+        expected = [order.to_dict() for order in orders]
+        db.session.expire_all()
+        self.assertEqual(Order.to_dict_list(Order.query.order_by(Order.id)), expected)
+
+    def test_to_dict_list_queries_dont_grow(self):
+        self._make_orders(6)
+        def count_queries(limit):
+            db.session.expire_all()
+            orders = Order.query.order_by(Order.id).limit(limit).all()
+            with self.count_queries() as statements:
+                Order.to_dict_list(orders)
+            return len(statements)
+        self.assertEqual(count_queries(2), count_queries(6))
+
+
+class TestOrderTotals(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        self.user = User(
+            username='test_order_totals_user',
+            email='test_order_totals@test.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True,
+        )
+        self.try_add_entities([
+            Currency(code='KRW', rate=1, base=True),
+            Currency(code='USD', rate=0.001),
+            self.user,
+            Country(id='c1', name='country1'),
+            Shipping(id=1, name='Shipping1'),
+            ShippingRate(shipping_method_id=1, destination='c1', weight=100000, rate=5000),
+            Product(id='T001', name='Bulk', price=10000, weight=100),
+            Product(id='T002', name='Separate', price=50000, weight=1000,
+                    separate_shipping=True),
+        ])
+
+    def _make_order(self, items):
+        order = Order(user=self.user, status=OrderStatus.pending, country_id='c1',
+                      shipping_method_id=1, user_currency_code='USD')
+        db.session.add(order)
+        for suborder_items in items:
+            suborder = Suborder(order=order)
+            db.session.add(suborder)
+            for product_id, quantity, status in suborder_items:
+                db.session.add(OrderProduct(suborder=suborder, product_id=product_id,
+                                            quantity=quantity, status=status))
+            db.session.flush()
+        db.session.commit()
+        return order
+
+    def _get_totals(self, order):
+        return (order.total_weight, order.shipping_box_weight,
+                order.subtotal_base_currency, float(order.subtotal_user_currency),
+                order.shipping_base_currency, order.total_base_currency,
+                float(order.total_user_currency),
+                [so.local_shipping for so in order.suborders])
+
+    def test_update_totals_same_as_update_total(self):
+        orders = [
+            self._make_order([[('T001', 1, OrderProductStatus.pending)]]),
+            self._make_order([
+                [('T001', 2, OrderProductStatus.pending),
+                 ('T002', 1, OrderProductStatus.pending)],
+                [('T002', 2, OrderProductStatus.pending)],
+                [('T001', 5, OrderProductStatus.unavailable)]]),
+            self._make_order([]),
+        ]
+        for order in orders:
+            order.update_total()
+        expected = [self._get_totals(order) for order in orders]
+        for order in orders:
+            order.total_weight = order.subtotal_base_currency = order.total_base_currency = 0
+            for suborder in order.suborders:
+                suborder.local_shipping = None
+        update_totals(orders)
+        self.assertEqual([self._get_totals(order) for order in orders], expected)
+        self.assertEqual(expected[1][-1], [2500, 0, 0])
+
+    def test_update_totals_queries_dont_grow(self):
+        self.try_add_entity(NoShipping(id=999))
+        order_ids = []
+        for seq in range(6):
+            order = self._make_order([[('T001', seq + 1, OrderProductStatus.pending)]] * 2)
+            order.shipping_method_id = 999
+            order_ids.append(order.id)
+        db.session.commit()
+        def count_queries(order_ids):
+            db.session.expunge_all()
+            orders = Order.query.filter(Order.id.in_(order_ids)).all()
+            with self.count_queries() as statements:
+                update_totals(orders)
+            return len([s for s in statements if s.startswith('SELECT')])
+        self.assertEqual(count_queries(order_ids[:2]), count_queries(order_ids))
+
+    def test_marked_orders_updated_once_on_commit(self):
+        order = self._make_order([[('T001', 1, OrderProductStatus.pending),
+                                   ('T002', 1, OrderProductStatus.pending)]])
+        ops = order.order_products
+        with patch('app.orders.totals.update_totals', wraps=update_totals) as update_mock:
+            for op in ops:
+                op.set_status(OrderProductStatus.unavailable)
+            mark_for_update(order)
+            self.assertEqual(update_mock.call_count, 0)
+            db.session.commit()
+            self.assertEqual(update_mock.call_count, 1)
+            self.assertEqual(update_mock.call_args.args[0], [order])
+        self.assertEqual(order.subtotal_base_currency, 0)
+        self.assertEqual(order.total_weight, 0)
+
+    def test_update_marked_totals_forces_recalculation(self):
+        order = self._make_order([[('T001', 1, OrderProductStatus.pending)]])
+        mark_for_update(order)
+        update_marked_totals()
+        self.assertEqual(order.subtotal_base_currency, 12500)
+        with patch('app.orders.totals.update_totals') as update_mock:
+            db.session.commit()
+            update_mock.assert_not_called()
+
+    def test_rollback_discards_marked_orders(self):
+        order = self._make_order([[('T001', 1, OrderProductStatus.pending)]])
+        order.comment = 'Discarded'
+        mark_for_update(order)
+        db.session.flush()
+        db.session.rollback()
+        with patch('app.orders.totals.update_totals') as update_mock:
+            db.session.commit()
+            update_mock.assert_not_called()
+
+    def test_to_dict_doesnt_store_missing_totals(self):
+        order = self._make_order([[('T001', 1, OrderProductStatus.pending)]])
+        order_id = order.id
+        update_totals([order])
+        db.session.commit()
+        expected = order.to_dict()
+        db.session.execute(Order.__table__.update().values(
+            total_weight=None, subtotal_base_currency=None, total_base_currency=None,
+            total_user_currency=None))
+        db.session.commit()
+        with self.count_queries() as statements:
+            result = db.session.get(Order, order_id).to_dict()
+        self.assertFalse([s for s in statements if s.startswith(('UPDATE', 'INSERT'))])
+        self.assertEqual(result['total_base_currency'], expected['total_base_currency'])
+        self.assertEqual(result['total_user_currency'], expected['total_user_currency'])
+        self.assertEqual(Order.to_dict_list([db.session.get(Order, order_id)])[0], result)
+        db.session.commit()
+        self.assertIsNone(db.session.execute(
+            Order.__table__.select()).mappings().one()['total_base_currency'])
+
+        self.assertEqual(backfill_missing_totals(), 1)
+        db.session.expire_all()
+        order = db.session.get(Order, order_id)
+        self.assertEqual(order.total_base_currency, expected['total_base_currency'])
+        self.assertEqual(float(order.total_user_currency), expected['total_user_currency'])
+        self.assertEqual(backfill_missing_totals(), 0)
+
+
+    def test_backfill_skips_zero_totals(self):
+        order = self._make_order([[('T001', 1, OrderProductStatus.pending)]])
+        update_totals([order])
+        db.session.commit()
+        db.session.execute(Order.__table__.update().values(
+            total_base_currency=0, total_user_currency=0))
+        db.session.commit()
+        with self.count_queries() as statements:
+            self.assertEqual(backfill_missing_totals(), 0)
+        self.assertFalse([s for s in statements if s.startswith('UPDATE')])
+
+class TestOrderIds(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        self.user = User(
+            username='test_order_ids_user',
+            email='test_order_ids@test.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True,
+        )
+        self.try_add_entities([self.user, Currency(code='USD', rate=0.001)])
+
+    def test_order_ids_continue_existing_ones(self):
+        prefix = datetime.now().strftime('ORD-%Y-%m-')
+        self.try_add_entity(Order(id=prefix + '0007', seq_num=7, user=self.user))
+        first = Order(user=self.user)
+        second = Order(user=self.user)
+        self.assertEqual(first.id, prefix + '0008')
+        self.assertEqual(second.id, prefix + '0009')
+        with self.count_queries() as statements:
+            Order(user=self.user)
+        self.assertFalse([s for s in statements if 'LIKE' in s])
+
+    def test_suborder_ids_are_allocated_in_block(self):
+        order = Order(user=self.user)
+        self.try_add_entity(order)
+        self.try_add_entity(Suborder(order=order))
+        order_id = order.id
+        with self.count_queries() as statements:
+            seq_nums = Suborder.allocate_seq_nums(order_id, 3)
+        self.assertEqual(list(seq_nums), [2, 3, 4])
+        self.assertEqual(len(statements), 2)
+        suborders = [Suborder(order=order, seq_num=seq_num) for seq_num in seq_nums]
+        self.assertEqual(suborders[-1].id, f'SOS-{order.id[4:]}-004')
+        self.assertEqual(Suborder(order=order).seq_num, 5)
+
+    def test_invoice_ids_are_sequential(self):
+        from app.invoices.models.invoice import Invoice
+        prefix = datetime.now().strftime('INV-%Y-%m-')
+        invoices = [Invoice(currency_code='USD') for _ in range(2)]
+        self.assertEqual([invoice.id for invoice in invoices],
+                         [prefix + '0001', prefix + '0002'])
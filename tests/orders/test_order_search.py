@@ -0,0 +1,147 @@
+'''
+Tests of the free-text search index of orders and order products
+'''
+from datetime import datetime
+
+from tests import BaseTestCase, db
+from app.currencies.models import Currency
+from app.models import Country
+from app.orders.models.order import Order
+from app.orders.models.order_product import OrderProduct, OrderProductStatus
+from app.orders.models.order_status import OrderStatus
+from app.orders.models.search_entry import OrderProductSearchEntry, OrderSearchEntry, \
+    SearchTrigram
+from app.orders.models.subcustomer import Subcustomer
+from app.orders.models.suborder import Suborder
+from app.orders.search import rebuild
+from app.products.models import Product
+from app.shipping.models.shipping import NoShipping
+from app.users.models.role import Role
+from app.users.models.user import User
+
+class TestOrderSearch(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        admin_role = Role(name='admin')
+        self.user = User(
+            username='user1_test_order_search',
+            email='user1_test_order_search@name.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True)
+        self.admin = User(
+            username='root_test_order_search',
+            email='root_test_order_search@name.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True,
+            roles=[admin_role])
+        self.try_add_entities([
+            self.user, self.admin, admin_role,
+            Country(id='c1', name='country1'),
+            Currency(code='USD', rate=0.5),
+            NoShipping(id=999),
+            Subcustomer(id=1, username='A000', name='Ivan Petrov'),
+            Product(id='0000', name='Vitamin tablets', name_english='Vitamin',
+                    price=10, weight=10),
+            Product(id='0001', name='Toothpaste', price=10, weight=10)
+        ])
+
+    def _make_order(self, order_id, product_id, **kwargs):
+        order = Order(id=order_id, user=self.user, country_id='c1',
+                      shipping_method_id=999, status=OrderStatus.pending,
+                      purchase_date=datetime(2026, 1, 1), **kwargs)
+        suborder = Suborder(id=order_id.replace('ORD', 'SOS'), order=order,
+                            subcustomer_id=1)
+        OrderProduct(suborder=suborder, product_id=product_id, quantity=1,
+                     status=OrderProductStatus.pending)
+        self.try_add_entity(order)
+        return db.session.get(Order, order_id)
+
+    def _get_orders(self, search):
+        return self.client.get(
+            '/api/v1/admin/order?draw=1&columns[0][data]=id&columns[0][name]=id' +
+            '&columns[0][search][value]=&search[value]=' + search)
+
+    def _get_order_products(self, search):
+        return self.client.get(
+            '/api/v1/order/product?draw=1&columns[0][data]=id' +
+            '&columns[0][name]=id&columns[0][search][value]=&search[value]=' + search)
+
+    def test_search_orders(self):
+        self._make_order('ORD-2601-0001', '0000', customer_name='Sidorov Sergey')
+        self._make_order('ORD-2601-0002', '0001', customer_name='Kuznetsova Anna',
+                         comment='Call before delivery')
+        res = self.try_admin_operation(lambda: self._get_orders('sidorov'))
+        self.assertEqual([row['id'] for row in res.json['data']], ['ORD-2601-0001'])
+        res = self._get_orders('ANNA call')
+        self.assertEqual([row['id'] for row in res.json['data']], ['ORD-2601-0002'])
+        res = self._get_orders('0002')
+        self.assertEqual([row['id'] for row in res.json['data']], ['ORD-2601-0002'])
+        res = self._get_orders('idoro')
+        self.assertEqual([row['id'] for row in res.json['data']], ['ORD-2601-0001'])
+        res = self._get_orders('anna sidorov')
+        self.assertEqual(res.json['data'], [])
+
+    def test_search_order_products(self):
+        self._make_order('ORD-2601-0001', '0000', customer_name='Sidorov Sergey')
+        self._make_order('ORD-2601-0002', '0001', customer_name='Kuznetsova Anna')
+        res = self.try_admin_operation(
+            lambda: self._get_order_products('vitamin'), admin_only=True)
+        self.assertEqual([row['order_id'] for row in res.json['data']], ['ORD-2601-0001'])
+        res = self._get_order_products('petrov')
+        self.assertEqual(len(res.json['data']), 2)
+        res = self._get_order_products('kuznetsova 0001')
+        self.assertEqual([row['product_id'] for row in res.json['data']], ['0001'])
+
+    def test_entries_follow_changes(self):
+        order = self._make_order('ORD-2601-0001', '0000', customer_name='Sidorov Sergey')
+        op_id = order.suborders[0].order_products[0].id
+        self.assertIn('sidorov', db.session.get(OrderSearchEntry, order.id).text)
+        self.assertIn('sidorov', db.session.get(OrderProductSearchEntry, op_id).text)
+
+        order.customer_name = 'Kuznetsova Anna'
+        db.session.commit()
+        self.assertIn('kuznetsova', db.session.get(OrderSearchEntry, order.id).text)
+        self.assertIn('kuznetsova', db.session.get(OrderProductSearchEntry, op_id).text)
+        self.assertEqual(
+            db.session.get(OrderProductSearchEntry, op_id).text,
+            OrderProductSearchEntry.query.filter(
+                OrderProductSearchEntry.id.in_(
+                    OrderProductSearchEntry.match('kuznetsova'))).one().text)
+        self.assertEqual(
+            OrderProductSearchEntry.query.filter(
+                OrderProductSearchEntry.id.in_(
+                    OrderProductSearchEntry.match('sidorov'))).count(), 0)
+
+        db.session.delete(order)
+        db.session.commit()
+        self.assertIsNone(db.session.get(OrderSearchEntry, 'ORD-2601-0001'))
+        self.assertIsNone(db.session.get(OrderProductSearchEntry, op_id))
+        self.assertEqual(SearchTrigram.query.count(), 0)
+
+    def test_rebuild(self):
+        self._make_order('ORD-2601-0001', '0000')
+        self._make_order('ORD-2601-0002', '0001')
+        db.session.execute(OrderSearchEntry.__table__.delete())
+        db.session.execute(OrderProductSearchEntry.__table__.delete())
+        db.session.execute(SearchTrigram.__table__.delete())
+        db.session.commit()
+        self.assertEqual(rebuild(), 2)
+        self.assertEqual(OrderSearchEntry.query.count(), 2)
+        self.assertEqual(OrderProductSearchEntry.query.count(), 2)
+        self.assertEqual(
+            OrderSearchEntry.query.filter(
+                OrderSearchEntry.id.in_(OrderSearchEntry.match('0002'))).count(), 1)
+
+    def test_entries_follow_renamed_order(self):
+        order = Order(id='ORD-draft-1', user=self.user, country_id='c1',
+                      shipping_method_id=999, status=OrderStatus.draft)
+        self.try_add_entity(order)
+        order.id = 'ORD-2601-0001'
+        db.session.commit()
+        self.assertIsNone(db.session.get(OrderSearchEntry, 'ORD-draft-1'))
+        self.assertIsNotNone(db.session.get(OrderSearchEntry, 'ORD-2601-0001'))
+        self.assertEqual(SearchTrigram.query.filter_by(entity_id='ORD-draft-1').count(), 0)
+        self.assertEqual(
+            OrderSearchEntry.query.filter(
+                OrderSearchEntry.id.in_(OrderSearchEntry.match('2601-00'))).count(), 1)
@@ -4,9 +4,11 @@ Tests of sale order functionality API
 
 from app.shipping.models.shipping import NoShipping
 from datetime import datetime, timedelta
+from io import BytesIO
 
 from unittest.mock import patch
 from tests import BaseTestCase, db
+from app import cache
 from app.models import Country
 from app.addresses.models import Address
 from app.currencies.models import Currency
@@ -102,6 +104,39 @@ class TestOrdersApi(BaseTestCase):
         self.assertEqual(order.total_base_currency, 2620)
         self.assertEqual(order.shipping.name, "Shipping1")
 
+    def test_create_order_skipped_items(self):
+        self.try_add_entities([
+            Product(id="0001", name="Product 1", price=10, weight=10),
+            Product(id="001", name="Product 1", price=10, weight=10),
+        ])
+        res = self.try_user_operation(
+            lambda: self.client.post(
+                "/api/v1/order",
+                json={
+                    "customer_name": "User1",
+                    "address": "Address1",
+                    "city_eng": "City1",
+                    "country": "c1",
+                    "zip": "0000",
+                    "shipping": "1",
+                    "phone": "1",
+                    "comment": "",
+                    "suborders": [
+                        {
+                            "subcustomer": "A000, Subcustomer1, P@ssw0rd",
+                            "items": [
+                                {"item_code": "0000", "quantity": "1"},
+                                {"item_code": "1", "quantity": "1"},
+                            ],
+                        }
+                    ],
+                },
+            )
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json["status"], "warning")
+        self.assertEqual(res.json["message"], [["More than one product was found by ID <1>"]])
+
     def test_create_weightless_order(self):
         gen_id = f"{__name__}-{int(datetime.now().timestamp())}"
         self.try_add_entities([Product(id=gen_id, name="0", price=10, weight=0)])
@@ -360,6 +395,103 @@ class TestOrdersApi(BaseTestCase):
         self.assertEqual(len(order.suborders[0].order_products), 1)
         self.assertEqual(order.suborders[0].order_products[0].quantity, 2)
 
+    def _post_bulk_order(self, lines):
+        return self.client.post(
+            "/api/v1/order/bulk",
+            json={
+                "customer_name": "User1",
+                "address": "Address1",
+                "city_eng": "City1",
+                "country": "c1",
+                "zip": "0000",
+                "shipping": "1",
+                "phone": "1",
+                "lines": lines,
+            },
+        )
+
+    def test_create_bulk_order(self):
+        self.try_add_entities(
+            [
+                Product(id=f"{i:06d}", name=f"Product {i}", price=10, weight=1)
+                for i in range(1, 31)
+            ]
+            + [Subcustomer(username="A001", name="Subcustomer1", password="P@ssw0rd")]
+        )
+        lines = [
+            {"line": i, "subcustomer": "A001", "item_code": str(i), "quantity": 1}
+            for i in range(1, 31)
+        ] + [
+            {"line": 31, "subcustomer": "A002, Subcustomer2, P@ssw0rd",
+             "item_code": "1", "quantity": 2},
+            {"line": 32, "subcustomer": "A002", "item_code": "000001", "quantity": 3},
+            {"line": 33, "subcustomer": "A002", "item_code": "999", "quantity": 1},
+            {"line": 34, "subcustomer": "A002", "item_code": "2", "quantity": "a"},
+            {"line": 35, "subcustomer": "A003", "item_code": "3", "quantity": 1},
+        ]
+        res = self.try_user_operation(lambda: self._post_bulk_order(lines))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(res.json["status"], "warning")
+        self.assertEqual(
+            [error["line"] for error in res.json["errors"]], [33, 34, 35])
+        order = db.session.get(Order, res.json["order_id"])
+        self.assertEqual(len(order.suborders), 4)
+        self.assertEqual(len(order.order_products), 31)
+        suborder = [s for s in order.suborders if s.subcustomer.username == "A002"][0]
+        self.assertEqual(suborder.order_products[0].quantity, 5)
+        self.assertEqual(
+            sum(op.price * op.quantity for op in order.order_products), 350)
+
+    def test_create_bulk_order_queries_dont_grow(self):
+        self.try_add_entities(
+            [
+                Product(id=f"{i:06d}", name=f"Product {i}", price=10, weight=1)
+                for i in range(1, 101)
+            ]
+        )
+        def get_lines(count):
+            return [
+                {"subcustomer": f"B{i // 10:03d}, Subcustomer, P@ssw0rd",
+                 "item_code": str(i + 1), "quantity": 1}
+                for i in range(count)
+            ]
+        self.try_user_operation(lambda: self._post_bulk_order(get_lines(10)))
+        with self.count_queries() as statements:
+            res = self._post_bulk_order(get_lines(20))
+        self.assertEqual(res.status_code, 200)
+        with self.count_queries() as more_statements:
+            res = self._post_bulk_order(get_lines(50))
+        self.assertEqual(res.status_code, 200)
+        count = lambda s: len([i for i in s if not i.startswith("INSERT")])
+        self.assertEqual(count(statements), count(more_statements))
+
+    def test_import_order_file(self):
+        file = BytesIO(
+            b"Subcustomer,Product,Quantity\n"
+            b'"A001, Subcustomer1, P@ssw0rd",0000,1\n'
+            b",0001,2\n"
+            b"A002,0002,1\n"
+        )
+        res = self.try_user_operation(
+            lambda: self.client.post(
+                "/api/v1/order/import", data={"file": (BytesIO(file.getvalue()), "order.csv")}
+            )
+        )
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(
+            [s["subcustomer"] for s in res.json["suborders"]],
+            ["A001, Subcustomer1, P@ssw0rd", "A002"],
+        )
+        self.assertEqual(
+            res.json["suborders"][0]["items"],
+            [
+                {"line": 2, "item_code": "0000", "quantity": "1"},
+                {"line": 3, "item_code": "0001", "quantity": "2"},
+            ],
+        )
+        self.assertEqual(list(res.json["products"]), ["0000"])
+        self.assertEqual(res.json["products"]["0000"]["name"], "Test product")
+
     def test_handle_wrong_subcustomer_data(self):
         self.try_add_entities(
             [Product(id="0001", name="Product 1", price=10, weight=10)]
@@ -784,6 +916,54 @@ class TestOrdersApi(BaseTestCase):
         res = self.client.get("/api/v1/order?status=pending")
         self.assertEqual(res.json[0]["status"], "pending")
 
+    def test_get_order_not_modified(self):
+        gen_id = f"{__name__}-{int(datetime.now().timestamp())}"
+        order = Order(id=gen_id, user=self.user)
+        suborder = Suborder(order=order)
+        self.try_add_entities([
+            order, suborder,
+            OrderProduct(suborder=suborder, product_id="0000", price=10, quantity=10)
+        ])
+        res = self.try_user_operation(
+            lambda: self.client.get(f"/api/v1/order/{gen_id}"))
+        etag = res.headers["ETag"]
+        with self.count_queries() as statements:
+            res = self.client.get(f"/api/v1/order/{gen_id}",
+                                  headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(len([s for s in statements if "FROM orders" in s]), 0)
+
+        order.suborders[0].order_products[0].quantity = 20
+        db.session.commit()
+        res = self.client.get(f"/api/v1/order/{gen_id}",
+                              headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertNotEqual(res.headers["ETag"], etag)
+        self.assertEqual(res.json["order_products"][0]["quantity"], 20)
+        etag = res.headers["ETag"]
+
+        self.try_add_entity(Setting(key="check_outsiders", value="0"))
+        res = self.client.get(f"/api/v1/order/{gen_id}",
+                              headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        etag = res.headers["ETag"]
+
+        db.session.get(Currency, "EUR").rate = 0.6
+        db.session.commit()
+        res = self.client.get(f"/api/v1/order/{gen_id}",
+                              headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        etag = res.headers["ETag"]
+
+        # Versions evicted from the cache don't let earlier ETags match
+        cache.clear()
+        res = self.client.get(f"/api/v1/order/{gen_id}",
+                              headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        res = self.client.get(f"/api/v1/order/{gen_id}",
+                              headers={"If-None-Match": res.headers["ETag"]})
+        self.assertEqual(res.status_code, 304)
+
     def test_get_order_products(self):
         gen_id = f"{__name__}-{int(datetime.now().timestamp())}"
         subcustomer = Subcustomer()
@@ -1,4 +1,8 @@
 from datetime import datetime
+from io import BytesIO
+
+import openpyxl
+
 from app.orders.models.order import Order
 from app.orders.models.order_product import OrderProduct
 from app.orders.models.order_status import OrderStatus
@@ -101,6 +105,19 @@ class TestOrdersClient(BaseTestCase):
             lambda: self.client.get(f'/orders/{order.id}/excel')
         )
         self.assertEqual(res.status_code, 200)
+        ws = openpyxl.load_workbook(BytesIO(res.data)).worksheets[0]
+        self.assertEqual(ws['B2'].value, order.id)
+        self.assertEqual(ws['A10'].value, 'Код товара')
+        self.assertEqual(ws['B12'].value, 'user1: None')
+        self.assertEqual(ws['B12'].fill.start_color.rgb, '00FFFF00')
+        self.assertEqual(ws['H12'].value, '=SUM(H13:H14)')
+        self.assertEqual([ws.cell(13, column).value for column in range(1, 7)],
+                         ['0000', None, None, 10, 10, 100])
+        self.assertEqual(ws['B14'].value, 'Local shipping')
+        self.assertIn('B12:C12', ws.merged_cells)
+        # Product rows are styled as the last template row
+        self.assertTrue(ws['B13'].alignment.wrap_text)
+        self.assertTrue(ws['B12'].alignment.wrap_text)
 
     def test_admin_get_distribution_list(self):
         # Create test orders with necessary data for distribution list
@@ -1,4 +1,6 @@
 from datetime import datetime
+import gzip
+import json
 
 from tests import BaseTestCase, db
 from app.models import Country
@@ -76,6 +78,63 @@ class TestProductsApi(BaseTestCase):
         self.assertEqual(res.status_code, 404)
         self.assertEqual(res.data, b"No product with code <999> was found")
 
+    def test_get_products_not_modified(self):
+        res = self.try_user_operation(lambda: self.client.get("/api/v1/product"))
+        etag = res.headers["ETag"]
+        res = self.client.get("/api/v1/product", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 304)
+        res = self.client.get("/api/v1/product/0000", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+
+        self.try_add_entities([Product(id="0001", name="Product 1", price=10, weight=10)])
+        res = self.client.get("/api/v1/product", headers={"If-None-Match": etag})
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.json), 2)
+
+    def test_get_catalog_snapshot(self):
+        res = self.try_user_operation(lambda: self.client.get("/api/v1/product"))
+        self.assertEqual([p["id"] for p in res.json], ["0000"])
+        with self.count_queries() as statements:
+            res = self.client.get("/api/v1/product",
+                                  headers={"Accept-Encoding": "gzip, deflate"})
+        self.assertEqual([s for s in statements if "FROM products" in s], [])
+        self.assertEqual(res.headers["Content-Encoding"], "gzip")
+        self.assertIn("Accept-Encoding", res.headers["Vary"])
+        self.assertEqual(
+            [p["id"] for p in json.loads(gzip.decompress(res.data))], ["0000"])
+        # Both encodings of the catalog share the weak validator
+        self.assertTrue(res.headers["ETag"].startswith("W/"))
+        res = self.client.get("/api/v1/product", headers={"If-None-Match": res.headers["ETag"]})
+        self.assertEqual(res.status_code, 304)
+
+        product = db.session.get(Product, "0000")
+        product.name = "New name"
+        db.session.commit()
+        res = self.client.get("/api/v1/product")
+        self.assertEqual(res.json[0]["name"], "New name")
+
+    def test_get_product_by_normalized_id(self):
+        self.try_add_entities([
+            Product(id="000123", name="Product 123", price=10, weight=10),
+            Product(id="0001234", name="Product 1234", price=10, weight=10)
+        ])
+        self.assertEqual(Product.get_product_by_id("123").id, "000123")
+        self.assertEqual(Product.get_product_by_id(" 01234").id, "0001234")
+        self.assertIsNone(Product.get_product_by_id("23"))
+        self.assertEqual(
+            {key: [p.id for p in products]
+             for key, products in Product.get_products_by_ids(["0123", "23"]).items()},
+            {"123": ["000123"], "23": []})
+
+        product = Product.get_product_by_id("123")
+        product.id = "000321"
+        db.session.commit()
+        self.assertEqual(product.normalized_id, "321")
+        res = self.try_user_operation(lambda: self.client.get("/api/v1/product/321"))
+        self.assertEqual([p["id"] for p in res.json], ["000321"])
+        res = self.client.get("/api/v1/product/123")
+        self.assertEqual(res.status_code, 404)
+
     def test_search_product(self):
         self.try_add_entities(
             [
@@ -114,6 +173,53 @@ class TestProductsApi(BaseTestCase):
             ],
         )
 
+    def test_search_product_ranking(self):
+        self.try_add_entities([
+            Product(id="0012", name="Vitamin C", name_english="Vitamin C", price=1),
+            Product(id="0001", name="Toothpaste", name_english="Vitamins", price=1),
+            Product(id="0100", name="Vit", price=1, available=False),
+            Product(id="0010", name="0001 Soap", price=1),
+        ])
+        res = self.try_user_operation(
+            lambda: self.client.get("/api/v1/product/search/VITAMIN"))
+        self.assertEqual([p["id"] for p in res.json], ["0001", "0012"])
+        res = self.client.get("/api/v1/product/search/0001")
+        self.assertEqual([p["id"] for p in res.json], ["0001", "0010"])
+        res = self.client.get("/api/v1/product/search/1")
+        self.assertEqual([p["id"] for p in res.json], ["0001", "0010", "0012"])
+        with self.count_queries() as statements:
+            res = self.client.get("/api/v1/product/search/00?limit=2")
+        self.assertEqual([p["id"] for p in res.json], ["0000", "0001"])
+        self.assertEqual(
+            [s for s in statements if "FROM products" in s], [])
+
+        self.try_add_entities([Product(id="0002", name="Vitamin D", price=1)])
+        res = self.client.get("/api/v1/product/search/vitamin d")
+        self.assertEqual([p["id"] for p in res.json], ["0002"])
+
+    def test_admin_get_products_pages(self):
+        self.try_add_entities([
+            Product(id=f"{i:04}", name=f"Product {i}", price=1, weight=1)
+            for i in range(1, 5)
+        ])
+        url = "/api/v1/admin/product?draw=1&columns[0][data]=id&columns[0][name]=id" \
+              "&columns[0][search][value]=&search[value]=&length=2&cursor="
+        res = self.try_admin_operation(lambda: self.client.get(url))
+        self.assertEqual([p["id"] for p in res.json["data"]], ["0000", "0001"])
+        self.assertEqual(res.json["recordsTotal"], 5)
+        self.assertEqual(len(res.json["data"][0]["shipping"]), 0)
+        res = self.client.get(url + res.json["cursor"])
+        self.assertEqual([p["id"] for p in res.json["data"]], ["0002", "0003"])
+        res = self.client.get(url + res.json["cursor"])
+        self.assertEqual([p["id"] for p in res.json["data"]], ["0004"])
+        self.assertIsNone(res.json["cursor"])
+
+        res = self.client.get("/api/v1/admin/product?page=1")
+        self.assertEqual(len(res.json["results"]), 5)
+        self.assertFalse(res.json["pagination"]["more"])
+        res = self.client.get("/api/v1/admin/product?page=2")
+        self.assertEqual(res.json["results"], [])
+
     def test_create_product(self):
         gen_id = f"{__name__}-{int(datetime.now().timestamp())}"
         res = self.try_admin_operation(
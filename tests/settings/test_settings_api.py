@@ -0,0 +1,66 @@
+from time import monotonic
+from unittest.mock import patch
+
+from sqlalchemy import update
+
+from app.settings.models.setting import Setting
+from app.tools import _get_change_version_key
+from app.users.models.role import Role
+from app.users.models.user import User
+from tests import BaseTestCase, cache, db
+
+class TestSettingsApi(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        admin_role = Role(name='admin')
+        self.user = User(username='user1_test_settings_api',
+            email='user1_test_settings_api@name.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True)
+        self.admin = User(username='root_test_settings_api',
+            email='root_test_settings_api@name.com',
+            password_hash='pbkdf2:sha256:150000$bwYY0rIO$320d11e791b3a0f1d0742038ceebf879b8182898cbefee7bf0e55b9c9e9e5576',
+            enabled=True, roles=[admin_role])
+        self.try_add_entities([
+            self.user, self.admin, admin_role,
+            Setting(key='check_outsiders', value='0', default_value='0')
+        ])
+
+    def test_get_setting_from_memory(self):
+        self.assertEqual(Setting.get('check_outsiders'), '0')
+        with self.count_queries() as statements:
+            self.assertEqual(Setting.get('check_outsiders'), '0')
+            self.assertIsNone(Setting.get('no_such_setting'))
+        self.assertEqual(len(statements), 0)
+
+    def test_save_setting_invalidates(self):
+        self.assertEqual(Setting.get('check_outsiders'), '0')
+        res = self.try_admin_operation(
+            lambda: self.client.post('/api/v1/admin/setting/check_outsiders',
+                                     json={'value': '1'}))
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(Setting.get('check_outsiders'), '1')
+
+    def test_reload_on_change_by_other_process(self):
+        self.assertEqual(Setting.get('check_outsiders'), '0')
+        # Another process changed the setting
+        with db.engine.begin() as connection:
+            connection.execute(Setting.__table__.update().values(value='1'))
+        cache.delete(_get_change_version_key('Setting'))
+        self.assertEqual(Setting.get('check_outsiders'), '0')
+        with patch('app.local_cache.monotonic', return_value=monotonic() + 60):
+            self.assertEqual(Setting.get('check_outsiders'), '1')
+
+    def test_read_own_changes(self):
+        self.assertEqual(Setting.get('check_outsiders'), '0')
+        db.session.get(Setting, 'check_outsiders').value = '1'
+        self.assertEqual(Setting.get('check_outsiders'), '1')
+        db.session.flush()
+        self.assertEqual(Setting.get('check_outsiders'), '1')
+        db.session.rollback()
+        self.assertEqual(Setting.get('check_outsiders'), '0')
+        db.session.execute(update(Setting).values(value='2'))
+        self.assertEqual(Setting.get('check_outsiders'), '2')
+        db.session.commit()
+        self.assertEqual(Setting.get('check_outsiders'), '2')
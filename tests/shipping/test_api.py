@@ -1,5 +1,7 @@
 from datetime import datetime
+from time import sleep
 from typing import Any
+from unittest.mock import patch
 
 from app.models import Country
 from app.models.address import Address
@@ -47,6 +49,17 @@ class FakeShippingError(Shipping):
     def get_shipping_items(self, items: list[str]) -> list[ShippingItem]:
         return []
 
+
+class SlowShipping(Shipping):
+    __mapper_args__ = {"polymorphic_identity": "slow_shipping"}  # type: ignore
+
+    type = "Slow"
+    _remote_availability_check = True
+
+    def can_ship(self, country, weight, products=[]) -> bool:
+        sleep(1)
+        return True
+
     
 class TestShippingAPI(BaseTestCase):
     def setUp(self):
@@ -201,3 +214,57 @@ class TestShippingAPI(BaseTestCase):
         self.assertIn('Shipping1', data['error'])
         # Shipping method must still exist
         self.assertIsNotNone(db.session.get(Shipping, 1))
+
+    def test_get_shipping_methods_within_deadline(self):
+        self.try_add_entities([
+            SlowShipping(id=2, name='Slow'),
+            FakeShipping(id=3, name='Shipping3')
+        ])
+        self.app.config['SHIPPING_CHECK_TIMEOUTS'] = {'slow_shipping': 0.2}
+        try:
+            res = self.try_user_operation(lambda: self.client.get('/api/v1/shipping'))
+        finally:
+            del self.app.config['SHIPPING_CHECK_TIMEOUTS']
+        self.assertEqual([shipping['id'] for shipping in res.json], [1, 3])
+        self.assertIn('shipping-2;dur=', res.headers['Server-Timing'])
+        self.assertLess(
+            int(res.headers['Server-Timing'].split('shipping-2;dur=')[1].split(',')[0]), 1000)
+        # Incomplete result isn't cached
+        res = self.client.get('/api/v1/shipping')
+        self.assertEqual([shipping['id'] for shipping in res.json], [1, 3, 2])
+
+    def test_get_shipping_methods_local_checks_inline(self):
+        self.try_add_entities([FakeShipping(id=3, name='Shipping3')])
+        with patch('app.shipping.availability._get_executor') as get_executor:
+            res = self.try_user_operation(lambda: self.client.get('/api/v1/shipping'))
+        self.assertEqual([shipping['id'] for shipping in res.json], [1, 3])
+        get_executor.assert_not_called()
+
+    def test_get_shipping_methods_failed_remote_check(self):
+        self.try_add_entities([SlowShipping(id=2, name='Slow')])
+        with patch.object(SlowShipping, 'can_ship', side_effect=Exception('Bug')), \
+             self.assertLogs('check_availability()', level='ERROR'):
+            res = self.try_user_operation(lambda: self.client.get('/api/v1/shipping'))
+        self.assertEqual([shipping['id'] for shipping in res.json], [1])
+
+    def test_get_shipping_methods_for_products(self):
+        self.try_add_entities([
+            FakeShipping(id=3, name='Shipping3'),
+            p.Product(id='0001', name='Restricted product', price=10, weight=10)
+        ])
+        product = db.session.get(p.Product, '0001')
+        product.available_shipping = [db.session.get(Shipping, 3)]
+        db.session.commit()
+        res = self.try_user_operation(
+            lambda: self.client.get('/api/v1/shipping?products=0000,0001'))
+        self.assertEqual([shipping['id'] for shipping in res.json], [3])
+        with self.count_queries() as statements:
+            self.assertEqual(p.Product.get_shipping_mask(['0000']) >> 1 & 1, 1)
+            self.assertEqual(p.Product.get_shipping_mask(['0000', '1']) >> 1 & 1, 0)
+            self.assertEqual(p.Product.get_shipping_mask(['9999']), 0)
+        self.assertEqual(len(statements), 0)
+
+        product.available_shipping = []
+        db.session.commit()
+        res = self.client.get('/api/v1/shipping?products=0000,1')
+        self.assertEqual([shipping['id'] for shipping in res.json], [1, 3])
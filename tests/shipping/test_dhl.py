@@ -50,6 +50,20 @@ class TestShippingDHL(BaseTestCase):
         rate = dhl.get_shipping_cost('ua', 100000)
         self.assertEqual(rate, 1397500)
 
+    def test_get_rate_from_compiled_tariff(self):
+        dhl = DHL()
+        self.assertEqual(dhl.get_shipping_cost('de', 500), 100)
+        with self.count_queries() as statements:
+            self.assertEqual(dhl.get_shipping_cost('de', 499), 10)
+            self.assertEqual(dhl.get_shipping_cost('cz', 10000), 13975)
+            self.assertTrue(dhl.can_ship(db.session.get(Country, 'de'), 1000))
+        self.assertEqual(len([s for s in statements if 'dhl' in s]), 0)
+
+        rate = db.session.get(DHLRate, (7, 10))
+        rate.rate = 200
+        db.session.commit()
+        self.assertEqual(dhl.get_shipping_cost('de', 500), 200)
+
     # def test_get_rates(self):
     #     res = self.try_admin_operation(lambda:
     #         self.client.get('/api/v1/admin/shipping/dhl/rate')
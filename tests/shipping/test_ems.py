@@ -1,4 +1,5 @@
 from datetime import datetime
+import re
 from unittest.mock import patch
 from tests import BaseTestCase, db
 from app.models import Country
@@ -10,7 +11,32 @@ from app.shipping.models.box import Box
 from app.shipping.models.shipping import Shipping
 from app.shipping.models.shipping_contact import ShippingContact
 from app.users.models import Role, User
-from common.exceptions import OrderError
+from app.shipping.methods.ems.jobs import prefetch_ems_rates
+from app.shipping.methods.ems.models import EMSRate
+from common.exceptions import HTTPError, OrderError
+
+# Charges recorded from EMS charge list API
+EMS_CHARGE_LIST = {
+    'country_info': {'weight_limit': '30'},
+    'charge_info': [
+        {'code_name2': '500', 'charge': '20000'},
+        {'code_name2': '1000', 'charge': '26500'},
+        {'code_name2': '2000', 'charge': '37000'},
+        {'code_name2': '30000', 'charge': '250000'},
+        {'code_name2': '31000', 'charge': '260000'}
+    ]
+}
+
+def get_recorded_charges(url, **_kwargs):
+    if '/country/UA' in url:
+        return EMS_CHARGE_LIST
+    # Prices calculated by EMS for the brackets except 2kg one
+    price = re.search('/calc_price/n_code/UA/weight/(500|1000|30000)/', url)
+    if price:
+        charge = next(charge['charge'] for charge in EMS_CHARGE_LIST['charge_info']
+                      if charge['code_name2'] == price.group(1))
+        return {'post_price': charge, 'extra_shipping_charge': '1500'}
+    raise HTTPError(404)
 
 class TestShippingEMS(BaseTestCase):
     def setUp(self):
@@ -39,6 +65,39 @@ class TestShippingEMS(BaseTestCase):
         rate = ems.get_shipping_cost('ua', 100)
         self.assertIsInstance(rate, int)
 
+    @patch('app.shipping.methods.ems.models.ems.get_json')
+    def test_prefetched_rates(self, get_json_mock):
+        get_json_mock.side_effect = get_recorded_charges
+        self.try_add_entity(EMS(id=5))
+        self.assertEqual(prefetch_ems_rates(), 2)
+        self.assertEqual(EMSRate.query.filter_by(service='EMS', country_id='UA').count(), 4)
+
+        get_json_mock.reset_mock()
+        ems = EMS()
+        self.assertEqual(ems.get_shipping_cost('ua', 100), 21500)
+        self.assertEqual(ems.get_shipping_cost('ua', 500), 21500)
+        self.assertEqual(ems.get_shipping_cost('ua', 501), 28000)
+        self.assertEqual(ems.get_shipping_cost('ua', 29999), 251500)
+        self.assertTrue(ems.can_ship(db.session.get(Country, 'ua'), 1500))
+        get_json_mock.assert_not_called()
+
+        # Countries, weights and brackets without prices are quoted by EMS
+        get_json_mock.side_effect = None
+        get_json_mock.return_value = {'post_price': '300000', 'extra_shipping_charge': '1000'}
+        self.assertEqual(ems.get_shipping_cost('ua', 1500), 301000)
+        self.assertEqual(ems.get_shipping_cost('ua', 35000), 301000)
+        self.assertEqual(ems.get_shipping_cost('cz', 1000), 301000)
+        self.assertEqual(get_json_mock.call_count, 3)
+
+    @patch('app.shipping.methods.ems.models.ems.get_json')
+    def test_prefetch_keeps_rates_on_failure(self, get_json_mock):
+        get_json_mock.side_effect = get_recorded_charges
+        self.try_add_entity(EMS(id=5))
+        prefetch_ems_rates(['EMS'])
+        get_json_mock.side_effect = HTTPError(500)
+        self.assertEqual(prefetch_ems_rates(['EMS']), 0)
+        self.assertEqual(EMS().get_shipping_cost('ua', 1000), 28000)
+
     @patch('app.shipping.methods.ems.models.ems.EMS.print')
     def test_print_label(self, po_mock):
         po_mock.return_value = {}
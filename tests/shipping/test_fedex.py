@@ -1,3 +1,4 @@
+from datetime import datetime
 from unittest.mock import patch, MagicMock
 from tests import BaseTestCase, db
 from app.currencies.models.currency import Currency
@@ -6,7 +7,9 @@ from app.models.country import Country
 from app.users.models.role import Role
 from app.users.models.user import User
 from app.orders.models.order import Order
+from app.shipping.methods.fedex.jobs import warm_up_fedex_availability
 from app.shipping.methods.fedex.models.fedex import Fedex
+from app.shipping.methods.fedex.models.fedex_availability import FedexAvailability
 from app.shipping.methods.fedex.models.fedex_setting import FedexSetting
 from app.shipping.models.box import default_box
 from app.shipping.models.shipping_contact import ShippingContact
@@ -26,6 +29,14 @@ _RATE_RESPONSE = {
     }
 }
 
+def get_transit_times(url, raw_data, **_kwargs):
+    if '"countryCode": "CZ"' in raw_data:
+        return {'errors': [{'code': 'SERVICE.UNAVAILABLE.ERROR'}]}
+    return {'output': {'transitTimes': [{'transitTimeDetails': [
+        {'serviceType': 'INTERNATIONAL_ECONOMY'},
+        {'serviceType': 'FEDEX_INTERNATIONAL_PRIORITY'}
+    ]}]}}
+
 class TestShippingFedex(BaseTestCase):
     def setUp(self):
         super().setUp()
@@ -87,6 +98,56 @@ class TestShippingFedex(BaseTestCase):
         res = fedex.can_ship(germany, 1, [])
         self.assertTrue(res)
 
+    @patch.object(Fedex, '_Fedex__get_json', side_effect=get_transit_times)
+    def test_is_shippable_cached(self, get_json_mock):
+        fedex = Fedex()
+        self.try_add_entities([fedex])
+        fedex.settings.service_type = 'FEDEX_INTERNATIONAL_PRIORITY'
+        germany = db.session.get(Country, 'de')
+        czech = db.session.get(Country, 'cz')
+        self.assertTrue(fedex.can_ship(germany, 500, []))
+        self.assertTrue(fedex.can_ship(germany, 1000, []))
+        self.assertEqual(get_json_mock.call_count, 1)
+        self.assertTrue(fedex.can_ship(germany, 4000, []))
+        self.assertEqual(get_json_mock.call_count, 2)
+        # Unavailable lanes are stored too
+        self.assertFalse(fedex.can_ship(czech, 1000, []))
+        self.assertFalse(fedex.can_ship(czech, 1000, []))
+        self.assertEqual(get_json_mock.call_count, 3)
+        availability = db.session.get(FedexAvailability, ('cz', '100', 1000))
+        self.assertEqual(availability.get_services(), [])
+        # Expired lanes are checked again
+        availability.expires_at = datetime(2020, 1, 1)
+        db.session.commit()
+        self.assertFalse(fedex.can_ship(czech, 1000, []))
+        self.assertEqual(get_json_mock.call_count, 4)
+        # Caller's changes are kept
+        fedex.name = 'Changed'
+        self.assertTrue(fedex.can_ship(germany, 30000, []))
+        self.assertEqual(get_json_mock.call_count, 5)
+        self.assertEqual(fedex.name, 'Changed')
+
+    @patch.object(Fedex, '_Fedex__get_json', side_effect=get_transit_times)
+    def test_warm_up_availability(self, get_json_mock):
+        weight_classes = patch.dict(self.app.config,
+                                    {'FEDEX_AVAILABILITY_WEIGHT_CLASSES': [1000, 30000]})
+        weight_classes.start()
+        self.addCleanup(weight_classes.stop)
+        fedex = Fedex()
+        self.try_add_entities([fedex])
+        fedex.settings.service_type = 'INTERNATIONAL_ECONOMY'
+        db.session.commit()
+        self.assertEqual(warm_up_fedex_availability(), 8)
+        self.assertEqual(warm_up_fedex_availability(), 0)
+        get_json_mock.reset_mock()
+        self.assertTrue(fedex.can_ship(db.session.get(Country, 'us'), 20000, []))
+        self.assertFalse(fedex.can_ship(db.session.get(Country, 'cz'), 500, []))
+        get_json_mock.assert_not_called()
+        self.assertEqual(warm_up_fedex_availability(refresh=True), 8)
+        result = self.app.test_cli_runner().invoke(
+            args=['warm-up-fedex-availability', '--refresh'])
+        self.assertEqual(result.output, "8 lanes are checked\n")
+
     def test_print_label(self):
         fedex = Fedex()
         self.try_add_entities([fedex])
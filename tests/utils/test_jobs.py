@@ -79,4 +79,19 @@ class TestJobs(BaseTestCase):
         ))
         jobs.import_products()
         product = db.session.get(p.Product, '000')
-        self.assertEqual(product.vendor_id, '000')
\ No newline at end of file
+        self.assertEqual(product.vendor_id, '000')
+    def test_backfill_totals(self):
+        from app.currencies.models import Currency
+        from app.payments.models.payment import Payment, PaymentStatus
+        from app.users.models.user import User
+        user = User(username='user_test_jobs', email='user_test_jobs@name.com',
+                    password_hash='', enabled=True)
+        self.try_add_entities([user, Currency(code='USD', rate=0.5)])
+        self.try_add_entity(Payment(user=user, currency_code='USD',
+                                    status=PaymentStatus.pending))
+        db.session.execute(
+            Payment.__table__.update().values(amount_sent_original=None))
+        db.session.commit()
+        self.assertEqual(jobs.backfill_totals(),
+                         {'orders': 0, 'payments': 1, 'invoices': 0})
+        self.assertEqual(jobs.backfill_totals()['payments'], 0)
@@ -0,0 +1,46 @@
+from time import monotonic
+from unittest.mock import patch
+
+from sqlalchemy import select, update
+
+from tests import BaseTestCase
+
+from app import cache, db, local_cache
+from app.models import Country
+from app.tools import _get_change_version_key
+
+def _load_countries():
+    return {country.id: country.name
+            for country in db.session.execute(select(Country)).scalars()}
+
+local_cache.register('test_countries', _load_countries, Country)
+
+class TestLocalCache(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        self.try_add_entities([Country(id='c1', name='Country 1')])
+        local_cache.invalidate('test_countries')
+
+    def test_reload_on_change(self):
+        self.assertEqual(local_cache.get('test_countries'), {'c1': 'Country 1'})
+        with self.count_queries() as statements:
+            local_cache.get('test_countries')
+        self.assertEqual(statements, [])
+
+        self.try_add_entity(Country(id='c2', name='Country 2'))
+        self.assertEqual(len(local_cache.get('test_countries')), 2)
+        db.session.execute(update(Country).values(name='Country'))
+        db.session.commit()
+        self.assertEqual(local_cache.get('test_countries'),
+                         {'c1': 'Country', 'c2': 'Country'})
+
+    def test_reload_on_change_by_another_process(self):
+        local_cache.get('test_countries')
+        # Another process changes countries and their version
+        with db.engine.begin() as connection:
+            connection.execute(Country.__table__.update().values(name='Country'))
+        cache.delete(_get_change_version_key('Country'))
+        self.assertEqual(local_cache.get('test_countries'), {'c1': 'Country 1'})
+        with patch('app.local_cache.monotonic', return_value=monotonic() + 60):
+            self.assertEqual(local_cache.get('test_countries'), {'c1': 'Country'})
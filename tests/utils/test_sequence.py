@@ -0,0 +1,27 @@
+from unittest.mock import patch
+
+from tests import BaseTestCase
+
+from app import db
+from app.models.sequence import Sequence, _reserved
+
+class TestSequence(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        db.create_all()
+        block_size = patch.dict(self.app.config, {'SEQUENCE_BLOCK_SIZE': 3})
+        block_size.start()
+        self.addCleanup(block_size.stop)
+        self.addCleanup(_reserved.clear)
+
+    def test_allocate_reserved(self):
+        self.assertEqual(list(Sequence.allocate('test')), [1])
+        self.assertEqual(list(Sequence.allocate('test', 2)), [2, 3])
+        self.assertEqual(len(_reserved), 0)
+        self.assertEqual(list(Sequence.allocate('test')), [4])
+        self.assertEqual(db.session.get(Sequence, 'test').value, 6)
+
+    def test_allocate_without_reserve(self):
+        self.assertEqual(list(Sequence.allocate('test', 2, reserve=False)), [1, 2])
+        self.assertEqual(len(_reserved), 0)
+        self.assertEqual(db.session.get(Sequence, 'test').value, 2)